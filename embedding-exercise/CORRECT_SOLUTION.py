@@ -119,6 +119,22 @@ def rank_words_by_similarity_compact(target, words):
     return {word: rank for rank, (word, sim) in enumerate(similarities, start=1)}
 
 
+# ========================================
+# ALTERNATIVE: Vectorized Solution
+# ========================================
+
+def rank_words_by_similarity_vectorized(target, words):
+    """
+    Vectorized version: one encode call for all words and one matrix product.
+
+    rank_by_similarity() (provided) computes every cosine similarity at once
+    and returns the same {word: rank} dictionary as the loop above.
+    """
+    target_emb = compute_embedding(target)
+    word_embs = model.encode(list(words))
+    return rank_by_similarity(target_emb, word_embs, words)
+
+
 # ========================================
 # Demo and Explanation
 # ========================================
@@ -0,0 +1,205 @@
+"""
+Admission control for the model-bound routes.
+
+Every request to a model-bound route needs one of max_concurrent slots.
+When all slots are taken, requests wait in a FIFO queue of at most
+max_queue entries; a request arriving at a full queue is turned away at
+once (429), and one that waits longer than queue_timeout gives up (503).
+Both answers carry a Retry-After estimate based on the recent service time,
+so a classroom of simultaneous submissions sees "queued, position 7"
+instead of every request slowing down together.
+
+Requests that stream their response can enqueue() in the request thread,
+which rejects immediately, and wait() for their slot in the thread doing
+the work, reporting queue positions as they go.
+"""
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional
+
+from metrics import REGISTRY
+
+ADMISSION_REJECTED = REGISTRY.counter(
+    'admission_rejected', 'Requests turned away by admission control', ['reason'])
+ADMISSION_QUEUE_WAIT = REGISTRY.histogram(
+    'admission_queue_wait_seconds', 'Time admitted requests waited for a slot')
+
+# Weight of the latest request in the service-time estimate
+_SERVICE_TIME_ALPHA = 0.2
+
+
+class AdmissionRejected(Exception):
+    """
+    No slot for the request.
+
+    Args:
+        message: Explanation for the client
+        status_code: 429 (queue full) or 503 (waited too long)
+        retry_after: Suggested seconds before retrying
+        queue_position: Position the request had (or would have had) in the queue
+    """
+
+    def __init__(self, message: str, status_code: int, retry_after: int, queue_position: int):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.queue_position = queue_position
+
+
+class _Ticket:
+    __slots__ = ('enqueued', 'admitted', 'started')
+
+    def __init__(self):
+        self.enqueued = time.monotonic()
+        self.admitted = False
+        self.started = None
+
+
+class AdmissionController:
+    """
+    Bounded concurrency plus a bounded FIFO queue.
+
+    Args:
+        max_concurrent: Requests served at the same time
+        max_queue: Requests allowed to wait for a slot (0 = reject when busy)
+        queue_timeout: Seconds a request may wait before it is rejected
+        service_time: Initial guess of seconds per request, for Retry-After
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: float = 30.0,
+                 service_time: float = 1.0):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.service_time = service_time
+        self.active = 0
+        self.admitted = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+        self._waiting = deque()
+        self._cond = threading.Condition()
+
+    def estimated_wait(self, position: int) -> float:
+        """Seconds until the request at queue position (1 = next) gets a slot"""
+        return math.ceil(position / self.max_concurrent) * self.service_time
+
+    def _retry_after(self, position: int) -> int:
+        return max(1, math.ceil(self.estimated_wait(position)))
+
+    def _admit(self, ticket: _Ticket) -> None:
+        self.active += 1
+        self.admitted += 1
+        ticket.admitted = True
+        ticket.started = time.monotonic()
+        ADMISSION_QUEUE_WAIT.observe(ticket.started - ticket.enqueued)
+
+    def enqueue(self) -> _Ticket:
+        """
+        Take a slot, or a place in the queue.
+
+        Raises:
+            AdmissionRejected: The queue is full (429)
+        """
+        ticket = _Ticket()
+        with self._cond:
+            if self.active < self.max_concurrent and not self._waiting:
+                self._admit(ticket)
+                return ticket
+            if len(self._waiting) >= self.max_queue:
+                self.rejected_full += 1
+                ADMISSION_REJECTED.inc(reason='queue_full')
+                position = len(self._waiting) + 1
+                raise AdmissionRejected('The server is busy grading other submissions, please try again shortly',
+                                        429, self._retry_after(position), position)
+            self._waiting.append(ticket)
+            return ticket
+
+    def wait(self, ticket: _Ticket, on_queued: Optional[Callable[[int, float], None]] = None) -> None:
+        """
+        Block until ticket has a slot.
+
+        Args:
+            ticket: From enqueue()
+            on_queued: Called with (position, estimated seconds) whenever the position changes
+
+        Raises:
+            AdmissionRejected: No slot within queue_timeout (503)
+
+        If anything else raises (on_queued included), the ticket leaves the
+        queue, or gives its slot back, before the exception propagates, so the
+        requests behind it keep moving.
+        """
+        try:
+            self._wait(ticket, on_queued)
+        except BaseException:
+            with self._cond:
+                admitted = ticket.admitted
+                if not admitted and ticket in self._waiting:
+                    self._waiting.remove(ticket)
+                    self._cond.notify_all()
+            if admitted:
+                self.release(ticket)
+            raise
+
+    def _wait(self, ticket: _Ticket, on_queued: Optional[Callable[[int, float], None]]) -> None:
+        deadline = ticket.enqueued + self.queue_timeout
+        reported = None
+        while True:
+            with self._cond:
+                if ticket.admitted:
+                    return
+                position = self._waiting.index(ticket) + 1
+                if position == 1 and self.active < self.max_concurrent:
+                    self._waiting.popleft()
+                    self._admit(ticket)
+                    self._cond.notify_all()
+                    return
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._waiting.remove(ticket)
+                    self._cond.notify_all()
+                    self.rejected_timeout += 1
+                    ADMISSION_REJECTED.inc(reason='timeout')
+                    raise AdmissionRejected(f'Still queued after {self.queue_timeout:g} seconds, please try again',
+                                            503, self._retry_after(len(self._waiting) + 1), position)
+                if position == reported:
+                    self._cond.wait(min(remaining, 1.0))
+                    continue
+            # Report outside the lock, then re-check before sleeping
+            reported = position
+            if on_queued is not None:
+                on_queued(position, self.estimated_wait(position))
+
+    def release(self, ticket: _Ticket) -> None:
+        """Give the slot back and update the service-time estimate"""
+        with self._cond:
+            self.active -= 1
+            elapsed = time.monotonic() - ticket.started
+            self.service_time += _SERVICE_TIME_ALPHA * (elapsed - self.service_time)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, on_queued: Optional[Callable[[int, float], None]] = None) -> Iterator[_Ticket]:
+        """enqueue(), wait() and release() around the with-block"""
+        ticket = self.enqueue()
+        self.wait(ticket, on_queued)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                'max_concurrent': self.max_concurrent,
+                'max_queue': self.max_queue,
+                'active': self.active,
+                'queued': len(self._waiting),
+                'admitted': self.admitted,
+                'rejected_queue_full': self.rejected_full,
+                'rejected_timeout': self.rejected_timeout,
+                'service_time_seconds': round(self.service_time, 3),
+            }
@@ -0,0 +1,235 @@
+"""
+Approximate nearest-neighbour search over the vocabulary embedding matrix.
+
+IVFIndex is an inverted-file index: spherical k-means splits the (L2
+normalised) vocabulary into n_lists clusters, and a query only scores the
+words in the n_probe clusters whose centroids are closest to it. With
+n_lists around sqrt(V), a top-k query touches roughly n_probe * sqrt(V)
+rows instead of all V. n_probe is chosen per call, so each endpoint can
+trade recall for latency; evaluate() reports recall@k against exact search
+to pick it.
+
+Only the centroids and the inverted lists are saved; the vectors themselves
+stay in the (memory-mapped) embedding matrix the index was built over.
+"""
+import json
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Bump when the saved layout changes; old index files are then rebuilt
+INDEX_VERSION = 1
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def exact_top_k(matrix: np.ndarray, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Brute-force top-k rows of matrix by dot product with query (best first)"""
+    scores = np.asarray(matrix @ query)
+    return _top_k(np.arange(len(scores)), scores, k)
+
+
+def _top_k(ids: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    k = min(k, len(scores))
+    if k <= 0:
+        return ids[:0], scores[:0]
+    if k < len(scores):
+        best = np.argpartition(-scores, k - 1)[:k]
+    else:
+        best = np.arange(len(scores))
+    # Highest score first; ties by row id so results are deterministic
+    best = best[np.lexsort((ids[best], -scores[best]))]
+    return ids[best], scores[best]
+
+
+class IVFIndex:
+    """
+    Inverted-file (IVF) index for top-k cosine similarity.
+
+    Args:
+        matrix: (V, dim) normalised vectors the index answers queries over
+        centroids: (n_lists, dim) normalised cluster centroids
+        list_ids: Row ids grouped by cluster
+        list_offsets: Cluster c holds list_ids[list_offsets[c]:list_offsets[c + 1]]
+        n_probe: Default number of clusters scanned per query
+    """
+
+    def __init__(self, matrix: np.ndarray, centroids: np.ndarray, list_ids: np.ndarray,
+                 list_offsets: np.ndarray, n_probe: int = 8):
+        self.matrix = matrix
+        self.centroids = centroids
+        self.list_ids = list_ids
+        self.list_offsets = list_offsets
+        self.n_probe = n_probe
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+    def __len__(self) -> int:
+        return len(self.list_ids)
+
+    @staticmethod
+    def _assign(matrix: np.ndarray, centroids: np.ndarray, chunk_size: int) -> np.ndarray:
+        labels = np.empty(len(matrix), dtype=np.int32)
+        for start in range(0, len(matrix), chunk_size):
+            block = np.asarray(matrix[start:start + chunk_size], dtype=np.float32)
+            labels[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        return labels
+
+    @classmethod
+    def build(cls, matrix: np.ndarray, n_lists: Optional[int] = None, n_iter: int = 15,
+              sample_size: Optional[int] = None, n_probe: int = 8, seed: int = 0,
+              chunk_size: int = 16384) -> 'IVFIndex':
+        """
+        Cluster matrix with spherical k-means and build the inverted lists.
+
+        Args:
+            matrix: (V, dim) normalised vectors (a memmap is fine; it is read in chunks)
+            n_lists: Number of clusters (default about sqrt(V))
+            n_iter: k-means iterations
+            sample_size: Rows used to train the centroids (default 64 per cluster)
+            n_probe: Default clusters scanned per query
+            seed: Random seed for the training sample and initial centroids
+            chunk_size: Rows scored per step when assigning the full matrix
+        """
+        count = len(matrix)
+        n_lists = max(1, min(count, n_lists or int(round(np.sqrt(count)))))
+        rng = np.random.default_rng(seed)
+        sample_size = min(count, sample_size or 64 * n_lists)
+        sample_rows = np.sort(rng.choice(count, size=sample_size, replace=False))
+        sample = np.asarray(matrix[sample_rows], dtype=np.float32)
+
+        centroids = sample[rng.choice(sample_size, size=n_lists, replace=False)].copy()
+        for _ in range(n_iter):
+            labels = cls._assign(sample, centroids, chunk_size)
+            counts = np.bincount(labels, minlength=n_lists)
+            # Per-cluster sums with one sort and reduceat (much faster than np.add.at)
+            order = np.argsort(labels, kind='stable')
+            filled = np.flatnonzero(counts)
+            sums = np.zeros_like(centroids)
+            sums[filled] = np.add.reduceat(sample[order], (np.cumsum(counts) - counts)[filled], axis=0)
+            empty = np.flatnonzero(counts == 0)
+            if len(empty):
+                # Restart empty clusters from random sample points
+                sums[empty] = sample[rng.choice(sample_size, size=len(empty), replace=False)]
+            centroids = _normalize(sums).astype(np.float32)
+
+        labels = cls._assign(matrix, centroids, chunk_size)
+        list_ids = np.argsort(labels, kind='stable').astype(np.int64)
+        list_offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=n_lists), out=list_offsets[1:])
+        return cls(matrix, centroids, list_ids, list_offsets, n_probe=n_probe)
+
+    def _candidates(self, query: np.ndarray, n_probe: int) -> np.ndarray:
+        n_probe = max(1, min(n_probe, self.n_lists))
+        centroid_scores = self.centroids @ query
+        if n_probe < self.n_lists:
+            probed = np.argpartition(-centroid_scores, n_probe - 1)[:n_probe]
+        else:
+            probed = np.arange(self.n_lists)
+        return np.concatenate([self.list_ids[self.list_offsets[c]:self.list_offsets[c + 1]]
+                               for c in probed.tolist()])
+
+    def search(self, query: np.ndarray, k: int = 10,
+               n_probe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Approximate top-k rows for one normalised query.
+
+        Returns:
+            tuple: (row ids, similarities), most similar first
+        """
+        query = np.asarray(query, dtype=np.float32)
+        # Sorted row ids read the (memory-mapped) matrix front to back
+        candidates = np.sort(self._candidates(query, n_probe or self.n_probe))
+        scores = np.asarray(self.matrix[candidates] @ query)
+        return _top_k(candidates, scores, k)
+
+    def exact_neighbours(self, queries: np.ndarray, k: int = 10) -> List[set]:
+        """Brute-force top-k row ids for each query, as sets for recall_at_k"""
+        return [set(exact_top_k(self.matrix, query, k)[0].tolist())
+                for query in np.asarray(queries, dtype=np.float32)]
+
+    def recall_at_k(self, queries: np.ndarray, k: int = 10, n_probe: Optional[int] = None,
+                    exact: Optional[List[set]] = None) -> float:
+        """
+        Fraction of the exact top-k neighbours that search() also returns.
+
+        Args:
+            queries: (Q, dim) normalised query vectors
+            k: Neighbours per query
+            n_probe: Clusters scanned per query (default self.n_probe)
+            exact: exact_neighbours(queries, k), if already computed
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        if exact is None:
+            exact = self.exact_neighbours(queries, k)
+        found = sum(len(expected.intersection(self.search(query, k, n_probe)[0].tolist()))
+                    for query, expected in zip(queries, exact))
+        total = sum(len(expected) for expected in exact)
+        return found / total if total else 1.0
+
+    def evaluate(self, queries: np.ndarray, k: int = 10,
+                 n_probes: Iterable[int] = (1, 2, 4, 8, 16, 32)) -> List[Dict]:
+        """
+        Recall@k and mean latency for several n_probe settings, plus exact search.
+
+        Args:
+            queries: (Q, dim) normalised query vectors (e.g. a sample of the vocabulary)
+            k: Neighbours per query
+            n_probes: n_probe values to measure
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        started = time.perf_counter()
+        exact = self.exact_neighbours(queries, k)
+        exact_ms = 1000 * (time.perf_counter() - started) / max(1, len(queries))
+
+        report = []
+        for n_probe in dict.fromkeys(min(n, self.n_lists) for n in n_probes):
+            started = time.perf_counter()
+            recall = self.recall_at_k(queries, k, n_probe, exact=exact)
+            elapsed_ms = 1000 * (time.perf_counter() - started) / max(1, len(queries))
+            report.append({
+                'n_probe': n_probe,
+                'recall_at_k': round(recall, 4),
+                'avg_ms': round(elapsed_ms, 4),
+                'speedup': round(exact_ms / elapsed_ms, 2) if elapsed_ms else None,
+            })
+        report.append({'n_probe': 'exact', 'recall_at_k': 1.0, 'avg_ms': round(exact_ms, 4), 'speedup': 1.0})
+        return report
+
+    def save(self, path: str, fingerprint: str = '') -> None:
+        """Atomically write the centroids and inverted lists (not the vectors)"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        meta = {
+            'version': INDEX_VERSION,
+            'count': len(self.list_ids),
+            'dim': int(self.centroids.shape[1]),
+            'n_probe': self.n_probe,
+            'fingerprint': fingerprint,
+        }
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, centroids=self.centroids, list_ids=self.list_ids,
+                     list_offsets=self.list_offsets, meta=np.array(json.dumps(meta)))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, matrix: np.ndarray, fingerprint: str = '') -> Optional['IVFIndex']:
+        """Load an index saved for matrix; None if missing or built for other vectors"""
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                meta = json.loads(str(data['meta']))
+                if (meta.get('version') != INDEX_VERSION or meta.get('fingerprint') != fingerprint
+                        or meta.get('count') != len(matrix) or meta.get('dim') != matrix.shape[1]):
+                    return None
+                return cls(matrix, data['centroids'], data['list_ids'], data['list_offsets'],
+                           n_probe=meta.get('n_probe', 8))
+        except (OSError, ValueError, KeyError):
+            return None
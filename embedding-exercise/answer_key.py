@@ -0,0 +1,179 @@
+"""
+Precompiled expected answers for the grading test cases.
+
+The expected ranking of every test target (plus any number of extra
+targets) is computed once, offline, and saved together with the model id,
+a hash of the word list and the similarity scores. The server loads the
+file in milliseconds instead of re-running the model on every boot, and
+refuses to grade when the file was built for a different model or word
+list, so the grading key can never change silently.
+
+    python answer_key.py                       # the TEST_CASES targets
+    python answer_key.py --extra-targets 500   # plus 500 random vocabulary words
+    python answer_key.py --targets music,river --out /tmp/answer_key.npz
+"""
+import argparse
+import json
+import os
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from embedding_store import vocabulary_hash
+
+# Bump when the file layout changes; older files are then rejected
+ANSWER_KEY_VERSION = 1
+
+
+class AnswerKeyMismatch(Exception):
+    """The answer key was built for another model, word list or set of targets"""
+
+
+class AnswerKey:
+    """
+    Expected {word: rank} answers for a fixed word list and model.
+
+    Args:
+        model_id: Identifier of the model (and precision) the answers came from
+        vocab_hash: vocabulary_hash() of the word list, duplicates included
+        targets: Target words, one row each
+        ranks: (len(targets), unique words) int32 expected rank of each word
+        scores: (len(targets), unique words) float32 similarity of each word
+        created: Unix time the key was built
+    """
+
+    def __init__(self, model_id: str, vocab_hash: str, targets: List[str], ranks: np.ndarray,
+                 scores: np.ndarray, created: Optional[float] = None):
+        self.model_id = model_id
+        self.vocab_hash = vocab_hash
+        self.targets = list(targets)
+        self.target_rows: Dict[str, int] = {target: row for row, target in enumerate(self.targets)}
+        self.ranks = ranks
+        self.scores = scores
+        self.created = created
+
+    @classmethod
+    def build(cls, model_id: str, word_list: List[str], targets: List[str],
+              rank: Callable[[str, List[str]], Dict[str, int]],
+              similarities: Callable[[str, List[str]], np.ndarray]) -> 'AnswerKey':
+        """
+        Compute the answers for targets.
+
+        Args:
+            model_id: Identifier stored in the key and checked at load time
+            word_list: The list handed to students (duplicates allowed)
+            targets: Target words
+            rank: Reference ranking, e.g. generate_correct_answer
+            similarities: Similarity of target to each word of a list
+        """
+        words = list(dict.fromkeys(word_list))
+        targets = list(dict.fromkeys(targets))
+        ranks = np.empty((len(targets), len(words)), dtype=np.int32)
+        scores = np.empty((len(targets), len(words)), dtype=np.float32)
+        for row, target in enumerate(targets):
+            expected = rank(target, word_list)
+            ranks[row] = np.fromiter((expected[word] for word in words), dtype=np.int32, count=len(words))
+            scores[row] = similarities(target, words)
+        return cls(model_id, vocabulary_hash(word_list), targets, ranks, scores, created=time.time())
+
+    def check(self, model_id: str, word_list: List[str], targets: List[str]) -> None:
+        """
+        Raise AnswerKeyMismatch unless the key fits this model, word list and targets.
+        """
+        if self.model_id != model_id:
+            raise AnswerKeyMismatch(f'built for model {self.model_id!r}, server uses {model_id!r}')
+        if self.vocab_hash != vocabulary_hash(word_list):
+            raise AnswerKeyMismatch(f'built for word list {self.vocab_hash}, '
+                                    f'server has {vocabulary_hash(word_list)}')
+        missing = [target for target in targets if target not in self.target_rows]
+        if missing:
+            raise AnswerKeyMismatch(f"no answers for target(s) {', '.join(missing[:5])}")
+
+    def expected(self, target: str, word_list: List[str]) -> Dict[str, int]:
+        """Expected {word: rank} for target (word_list must be the list the key was built for)"""
+        words = list(dict.fromkeys(word_list))
+        ranks = self.ranks[self.target_rows[target]]
+        order = np.argsort(ranks, kind='stable')
+        return {words[i]: int(ranks[i]) for i in order.tolist()}
+
+    def save(self, path: str) -> None:
+        """Atomically write the key as .npz (meta JSON, ranks and scores)"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        meta = {
+            'version': ANSWER_KEY_VERSION,
+            'model_id': self.model_id,
+            'vocab_hash': self.vocab_hash,
+            'targets': self.targets,
+            'created': self.created,
+        }
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, ranks=self.ranks, scores=self.scores, meta=np.array(json.dumps(meta)))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'AnswerKey':
+        """
+        Read a key written by save().
+
+        Raises:
+            OSError: The file is missing or unreadable
+            AnswerKeyMismatch: The file has another layout version or is malformed
+        """
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                meta = json.loads(str(data['meta']))
+                ranks, scores = data['ranks'], data['scores']
+            if meta.get('version') != ANSWER_KEY_VERSION:
+                raise AnswerKeyMismatch(f"answer key version {meta.get('version')}, expected {ANSWER_KEY_VERSION}")
+            if ranks.shape != scores.shape or len(ranks) != len(meta['targets']):
+                raise AnswerKeyMismatch('answer key arrays do not match its targets')
+            return cls(meta['model_id'], meta['vocab_hash'], meta['targets'], ranks, scores, meta.get('created'))
+        except (KeyError, ValueError, TypeError, AttributeError) as e:
+            # A missing field or a meta record of the wrong type
+            raise AnswerKeyMismatch(f'unreadable answer key: {e}')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Compile the expected answers used for grading')
+    parser.add_argument('--out', help='Output file (default: ANSWER_KEY_PATH)')
+    parser.add_argument('--extra-targets', type=int, default=0,
+                        help='Also precompute this many random vocabulary words as targets')
+    parser.add_argument('--targets', default='', help='Comma-separated extra targets')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for --extra-targets')
+    args = parser.parse_args()
+
+    # The server is imported without its startup warm-up, which is run below
+    # with the answer key disabled so every answer comes from the live model
+    os.environ['FAST_START'] = '1'
+    import word_game
+    out = args.out or word_game.ANSWER_KEY_PATH
+    if not out:
+        parser.error('Set --out or ANSWER_KEY_PATH')
+    word_game.ANSWER_KEY_PATH = None
+    word_game.warm_up()
+    if word_game._warm_up_state['state'] != 'ready':
+        raise SystemExit(f"Warm-up failed: {word_game._warm_up_state['error']}")
+    if word_game.embedding_store is None:
+        raise SystemExit('No embedding model available (install numpy and sentence-transformers)')
+
+    targets = [test_case['target'] for test_case in word_game.TEST_CASES]
+    targets += [target.strip().lower() for target in args.targets.split(',') if target.strip()]
+    if args.extra_targets:
+        chosen = set(targets)
+        pool = [word for word in dict.fromkeys(word_game.WORDS) if word not in chosen]
+        rng = np.random.default_rng(args.seed)
+        picked = rng.choice(len(pool), size=min(args.extra_targets, len(pool)), replace=False)
+        targets += [pool[i] for i in np.sort(picked).tolist()]
+
+    started = time.perf_counter()
+    key = AnswerKey.build(word_game.answer_model_id(), word_game.WORDS, targets,
+                          word_game.generate_correct_answer, word_game.embedding_store.similarities)
+    key.save(out)
+    print(f"✓ Wrote answers for {len(key.targets)} targets x {key.ranks.shape[1]} words to {out} "
+          f"in {time.perf_counter() - started:.2f}s (model {key.model_id}, word list {key.vocab_hash})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,276 @@
+"""
+Offline micro-benchmarks for the grading hot paths.
+
+A deterministic, hash-seeded stub (StubSentenceTransformer) replaces the
+sentence transformer: every text gets a fixed pseudo-random 384-dimensional
+vector derived from a hash of the text, through the same ``encode`` API and
+output shapes, so the benchmarks need neither torch nor a model download and
+produce identical rankings on every machine. The stub is installed as the
+``sentence_transformers`` module of this process only, before word_game is
+imported and warmed up.
+
+For each vocabulary size (100 to 100k synthetic words by default) it times
+compute_char_vector, cosine_similarity (character and embedding vectors),
+generate_correct_answer, the vectorized test-case scoring and, up to
+--max-grade-words, a whole grade_submission. Results can be saved as a
+baseline; --check compares against one and exits non-zero when a hot path got
+slower by more than --tolerance or a ranking checksum changed.
+
+    python benchmark.py --save benchmark_baseline.json
+    python benchmark.py --check benchmark_baseline.json
+    python benchmark.py --sizes 100,1000 --check benchmark_baseline.json
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import types
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+DEFAULT_SIZES = '100,1000,10000,100000'
+
+# The vectorized submission graded end to end by the grade_submission benchmark
+VECTORIZED_SOLUTION = '''
+def compute_embedding(word):
+    return model.encode([word])[0]
+
+def rank_words_by_similarity(target, words):
+    return rank_by_similarity(model.encode([target])[0], model.encode(words), words)
+'''
+
+
+class StubSentenceTransformer:
+    """
+    Deterministic stand-in for SentenceTransformer.
+
+    Each text maps to a standard-normal vector seeded by a BLAKE2 hash of the
+    text (and seed), so equal texts always get equal vectors.
+
+    Args:
+        model_name_or_path: Accepted for compatibility and ignored
+        dim: Embedding dimension (384 like all-MiniLM-L6-v2)
+        seed: Mixed into every hash, to get a different but fixed embedding space
+    """
+
+    def __init__(self, model_name_or_path: Optional[str] = None, dim: int = 384, seed: int = 0, **kwargs):
+        self.dim = dim
+        self.seed = seed
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def _vector(self, text: str) -> np.ndarray:
+        digest = hashlib.blake2b(text.encode('utf-8'), digest_size=8, key=str(self.seed).encode()).digest()
+        return np.random.default_rng(int.from_bytes(digest, 'little')).standard_normal(self.dim, dtype=np.float32)
+
+    def encode(self, sentences, batch_size: int = 32, show_progress_bar: bool = False,
+               convert_to_numpy: bool = True, normalize_embeddings: bool = False, **kwargs):
+        """Same shapes as SentenceTransformer.encode: (dim,) for a string, (n, dim) for a list"""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        vectors = np.empty((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            vectors[row] = self._vector(text)
+        if normalize_embeddings and len(texts):
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors[0] if single else vectors
+
+
+def install_stub() -> None:
+    """Make ``from sentence_transformers import SentenceTransformer`` return the stub in this process"""
+    module = types.ModuleType('sentence_transformers')
+    module.SentenceTransformer = StubSentenceTransformer
+    sys.modules['sentence_transformers'] = module
+
+
+def synthetic_words(count: int, seed: int = 0) -> List[str]:
+    """count distinct lower-case pseudo-words of 3-10 letters (the same list for the same seed)"""
+    rng = np.random.default_rng(seed)
+    letters = np.array(list('abcdefghijklmnopqrstuvwxyz'))
+    words, seen = [], set()
+    while len(words) < count:
+        lengths = rng.integers(3, 11, size=count)
+        for length in lengths.tolist():
+            word = ''.join(rng.choice(letters, size=length))
+            if word not in seen:
+                seen.add(word)
+                words.append(word)
+                if len(words) == count:
+                    break
+    return words
+
+
+def measure(func: Callable[[], object], min_time: float = 0.05, repeat: int = 5) -> Dict:
+    """Seconds per call of func: loops are calibrated to last min_time, best and median of repeat runs"""
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= 2 if elapsed == 0 else max(2, min(10, int(min_time / elapsed) + 1))
+    runs = [elapsed / number]
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        runs.append((time.perf_counter() - started) / number)
+    return {'best_s': min(runs), 'median_s': statistics.median(runs), 'loops': number}
+
+
+def _checksum(ranking: Dict[str, int]) -> str:
+    return hashlib.sha256(json.dumps(sorted(ranking.items())).encode('utf-8')).hexdigest()[:16]
+
+
+def _use_vocabulary(word_game, words: List[str]) -> None:
+    """Point word_game's word list and embedding store at words"""
+    from embedding_store import EmbeddingStore
+    word_game.WORDS = words
+    word_game.embedding_store = EmbeddingStore(word_game.sentence_model, words,
+                                               chunk_size=word_game.EMBEDDING_CHUNK_SIZE)
+
+
+def bench_size(word_game, size: int, max_grade_words: int, min_time: float, repeat: int) -> Dict:
+    """Time every hot path on a vocabulary of size words"""
+    from grading import GradingKey
+
+    words = synthetic_words(size)
+    started = time.perf_counter()
+    _use_vocabulary(word_game, words)
+    elapsed = time.perf_counter() - started
+    # Built once per size (stub encoding dominates), reported but never compared
+    results = {'embed_vocabulary': {'best_s': elapsed, 'median_s': elapsed, 'loops': 1}}
+    target = words[0]
+    model = word_game.sentence_model
+
+    # Character vectors: the whole vocabulary per call
+    results['compute_char_vector'] = measure(lambda: [word_game.compute_char_vector(w) for w in words],
+                                             min_time, repeat)
+    char_target = word_game.compute_char_vector(target)
+    char_vectors = [word_game.compute_char_vector(w) for w in words]
+    results['cosine_similarity_char'] = measure(
+        lambda: [word_game.cosine_similarity(char_target, v) for v in char_vectors], min_time, repeat)
+    embeddings = model.encode(words)
+    target_embedding = embeddings[0]
+    results['cosine_similarity_embedding'] = measure(
+        lambda: [word_game.cosine_similarity(target_embedding, v) for v in embeddings], min_time, repeat)
+
+    results['generate_correct_answer'] = measure(lambda: word_game.generate_correct_answer(target, words),
+                                                 min_time, repeat)
+    expected = word_game.generate_correct_answer(target, words)
+    results['grading_key'] = measure(lambda: GradingKey(words, expected), min_time, repeat)
+    key = GradingKey(words, expected)
+    # A near-miss submission: the expected ranking with neighbouring pairs swapped
+    student = dict(expected)
+    order = sorted(expected, key=expected.get)
+    for a, b in zip(order[0::4], order[1::4]):
+        student[a], student[b] = student[b], student[a]
+    results['score'] = measure(lambda: key.score(student), min_time, repeat)
+
+    if size <= max_grade_words:
+        test_cases = [{'target': t, 'description': f'Benchmark target {t}',
+                       'expected_output': word_game.generate_correct_answer(t, words),
+                       'grading_key': None} for t in words[:5]]
+        for test_case in test_cases:
+            test_case['grading_key'] = GradingKey(words, test_case['expected_output'])
+        body, _ = word_game.grade_submission(VECTORIZED_SOLUTION, test_cases=test_cases)
+        if body.get('passed') != len(test_cases):
+            raise RuntimeError(f"Benchmark submission failed at {size} words: {body.get('message')}")
+        results['grade_submission'] = measure(
+            lambda: word_game.grade_submission(VECTORIZED_SOLUTION, test_cases=test_cases), min_time, repeat)
+
+    return {
+        'words': size,
+        'checksum': _checksum(expected),
+        'timings': {name: {k: (round(v, 9) if k != 'loops' else v) for k, v in timing.items()}
+                    for name, timing in results.items()},
+    }
+
+
+def check(current: Dict, baseline: Dict, tolerance: float, floor: float) -> List[str]:
+    """Regressions of current against baseline: slower best times and changed checksums"""
+    problems = []
+    previous = {str(entry['words']): entry for entry in baseline['sizes']}
+    for entry in current['sizes']:
+        before = previous.get(str(entry['words']))
+        if before is None:
+            continue
+        if entry['checksum'] != before['checksum']:
+            problems.append(f"{entry['words']} words: generate_correct_answer ranking changed "
+                            f"({before['checksum']} -> {entry['checksum']})")
+        for name, timing in entry['timings'].items():
+            if name == 'embed_vocabulary' or name not in before['timings']:
+                continue
+            old, new = before['timings'][name]['best_s'], timing['best_s']
+            if new > old * (1 + tolerance) and new - old > floor:
+                problems.append(f"{entry['words']} words: {name} {old * 1e3:.3f} ms -> {new * 1e3:.3f} ms "
+                                f"({new / old - 1:+.0%})")
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark the grading hot paths with a stub embedding model')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help=f'Vocabulary sizes (default {DEFAULT_SIZES})')
+    parser.add_argument('--max-grade-words', type=int, default=10000,
+                        help='Largest vocabulary for the end-to-end grade_submission benchmark')
+    parser.add_argument('--min-time', type=float, default=0.05, help='Seconds per timing run')
+    parser.add_argument('--repeat', type=int, default=5, help='Timing runs per benchmark (the best is compared)')
+    parser.add_argument('--save', help='Write the results as a baseline JSON file')
+    parser.add_argument('--check', help='Compare with a baseline and exit 1 on regressions')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed slowdown of a best time (0.25 = 25%%)')
+    parser.add_argument('--floor-us', type=float, default=5.0,
+                        help='Ignore slowdowns smaller than this many microseconds')
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+
+    # The server module is imported offline: stub model, in-process grading,
+    # throwaway embedding cache and answers computed live
+    install_stub()
+    os.environ.update({'FAST_START': '1', 'GRADING_WORKERS': '0', 'ANSWER_KEY_PATH': '',
+                       'EMBEDDING_CACHE_DIR': tempfile.mkdtemp(prefix='benchmark-cache-')})
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import word_game
+    word_game.warm_up()
+    if word_game._warm_up_state['state'] != 'ready':
+        raise SystemExit(f"Warm-up failed: {word_game._warm_up_state['error']}")
+
+    report = {
+        'environment': {'python': platform.python_version(), 'numpy': np.__version__,
+                        'machine': platform.machine(), 'cpus': os.cpu_count(),
+                        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z')},
+        'sizes': [],
+    }
+    for size in sizes:
+        entry = bench_size(word_game, size, args.max_grade_words, args.min_time, args.repeat)
+        report['sizes'].append(entry)
+        print(f"{size:>7} words (ranking {entry['checksum']})")
+        for name, timing in entry['timings'].items():
+            print(f"  {name:<28} {timing['median_s'] * 1e3:>10.3f} ms  (best {timing['best_s'] * 1e3:.3f} ms)")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Baseline written to {args.save}")
+    if args.check:
+        with open(args.check) as f:
+            baseline = json.load(f)
+        problems = check(report, baseline, args.tolerance, args.floor_us / 1e6)
+        if problems:
+            print(f"⚠  {len(problems)} regression(s) against {args.check}:")
+            for problem in problems:
+                print(f"  {problem}")
+            sys.exit(1)
+        print(f"✓ No regressions against {args.check} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == '__main__':
+    main()
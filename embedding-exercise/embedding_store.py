@@ -0,0 +1,419 @@
+"""
+Vocabulary embedding store for the word similarity exercise.
+
+Encodes the whole (deduplicated) vocabulary in one batched call and keeps
+the result as an L2-normalised NumPy matrix plus a word -> row index, so
+ranking any target is a single matrix-vector product followed by an argsort.
+
+The matrix can be backed by an on-disk cache (EmbeddingCache) that is opened
+with memory mapping, so restarts and extra worker processes share pages
+instead of re-running the model.
+
+Large vocabularies are embedded in fixed-size chunks written straight into a
+preallocated (or, with a cache, memory-mapped) matrix, so peak memory is one
+chunk of model output on top of the matrix itself.
+
+The matrix can be stored as float16 or per-row scaled int8 (see
+quantization.py) to shrink both memory and the cache file.
+"""
+import hashlib
+import itertools
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from quantization import CompactMatrix, append_rows, compact, quantize_rows, storage_dtype
+
+# Bump when the on-disk layout changes; old caches are then ignored
+CACHE_VERSION = 2
+
+# Words embedded per model call when building the vocabulary matrix
+DEFAULT_CHUNK_SIZE = 2048
+
+# Out-of-vocabulary vectors kept by EmbeddingStore.vector() (LRU)
+DEFAULT_MAX_EXTRA = 1024
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalise each row of a 2-D array (zero rows stay zero)"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def vocabulary_hash(words: List[str]) -> str:
+    """Stable hash of an ordered word list"""
+    return hashlib.sha256('\n'.join(words).encode('utf-8')).hexdigest()[:16]
+
+
+def encode_chunks(words: List[str], encode: Callable[[List[str]], np.ndarray],
+                  chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Tuple[int, np.ndarray]]:
+    """Yield (start offset, embeddings) for consecutive chunks of words"""
+    chunk_size = max(1, chunk_size)
+    for start in range(0, len(words), chunk_size):
+        yield start, encode(words[start:start + chunk_size])
+
+
+def encode_into_matrix(words: List[str], encode: Callable[[List[str]], np.ndarray],
+                       chunk_size: int = DEFAULT_CHUNK_SIZE, precision: str = 'float32'):
+    """Embed words chunk by chunk into one preallocated matrix stored at precision"""
+    data = scales = None
+    for start, block in encode_chunks(words, encode, chunk_size):
+        if data is None:
+            data = np.empty((len(words), block.shape[1]), dtype=storage_dtype(precision))
+            scales = np.empty(len(words), dtype=np.float32) if precision == 'int8' else None
+        stored, block_scales = quantize_rows(block, precision)
+        data[start:start + len(block)] = stored
+        if scales is not None:
+            scales[start:start + len(block)] = block_scales
+    return compact(data, scales) if data is not None else encode(words)
+
+
+def _stored_arrays(matrix) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    if isinstance(matrix, CompactMatrix):
+        return matrix.data, matrix.scales
+    return matrix, None
+
+
+def model_revision(model) -> str:
+    """
+    Best-effort revision id for a SentenceTransformer model.
+
+    Uses EMBEDDING_MODEL_REVISION if set, otherwise the Hugging Face commit
+    hash recorded on the underlying transformers config.
+    """
+    revision = os.environ.get('EMBEDDING_MODEL_REVISION')
+    if revision:
+        return revision
+    try:
+        config = model[0].auto_model.config
+        return getattr(config, '_commit_hash', None) or 'unknown'
+    except Exception:
+        return 'unknown'
+
+
+class EmbeddingCache:
+    """
+    Versioned on-disk cache of normalised embeddings.
+
+    Layout: <cache_dir>/v<CACHE_VERSION>/<model name>/<revision>/
+    with ``vectors-<vocabulary hash>.npy`` (float32, one row per word) and
+    ``manifest.json`` (model, revision, vocabulary hash and the word order).
+    Entries are keyed by word, so a changed word list reuses rows for words
+    it still contains, re-embeds only new words and rewrites the file for
+    the new vocabulary. Reduced-precision caches live in a ``float16`` /
+    ``int8`` subdirectory; int8 adds ``scales-<vocabulary hash>.npy`` (one
+    float32 scale per row).
+
+    The manifest is replaced last and names the data files through the
+    vocabulary hash, so a crash part-way through a rewrite leaves the old
+    manifest with its own, untouched data files.
+
+    Args:
+        cache_dir: Root directory for cache files
+        model_name: Model identifier (e.g. 'all-MiniLM-L6-v2')
+        revision: Model revision; a different revision never shares a file
+        precision: 'float32', 'float16' or 'int8'
+    """
+
+    def __init__(self, cache_dir: str, model_name: str, revision: str = 'unknown',
+                 precision: str = 'float32'):
+        storage_dtype(precision)
+        self.model_name = model_name
+        self.revision = revision
+        self.precision = precision
+        safe_name = model_name.replace('/', '--')
+        self.path = os.path.join(cache_dir, f'v{CACHE_VERSION}', safe_name, revision)
+        if precision != 'float32':
+            self.path = os.path.join(self.path, precision)
+        self.manifest_path = os.path.join(self.path, 'manifest.json')
+        self.hits = 0
+        self.misses = 0
+
+    def _data_paths(self, vocab_hash: str) -> Tuple[str, str]:
+        """(vectors, scales) files of the cache for one vocabulary"""
+        return (os.path.join(self.path, f'vectors-{vocab_hash}.npy'),
+                os.path.join(self.path, f'scales-{vocab_hash}.npy'))
+
+    def _tmp_paths(self) -> Tuple[str, Optional[str]]:
+        pid = os.getpid()
+        return (os.path.join(self.path, f'vectors.{pid}.tmp'),
+                os.path.join(self.path, f'scales.{pid}.tmp') if self.precision == 'int8' else None)
+
+    def read(self) -> Tuple[List[str], Optional[np.ndarray]]:
+        """Open the cached matrix with memory mapping; ([], None) if missing or stale"""
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if (manifest.get('version') != CACHE_VERSION
+                    or manifest.get('model') != self.model_name
+                    or manifest.get('revision') != self.revision
+                    or manifest.get('precision', 'float32') != self.precision):
+                return [], None
+            words = manifest['words']
+            vocab_hash = vocabulary_hash(words)
+            if manifest.get('vocab_hash') != vocab_hash:
+                return [], None
+            vectors_path, scales_path = self._data_paths(vocab_hash)
+            data = np.load(vectors_path, mmap_mode='r')
+            if (data.shape != (len(words), manifest.get('dim'))
+                    or data.dtype != storage_dtype(self.precision)):
+                return [], None
+            scales = None
+            if self.precision == 'int8':
+                scales = np.load(scales_path, mmap_mode='r')
+                if scales.shape != (len(words),):
+                    return [], None
+            return words, compact(data, scales)
+        except (OSError, ValueError, KeyError):
+            return [], None
+
+    def _manifest(self, words: List[str], dim: int) -> Dict:
+        return {
+            'version': CACHE_VERSION,
+            'model': self.model_name,
+            'revision': self.revision,
+            'precision': self.precision,
+            'dim': int(dim),
+            'count': len(words),
+            'vocab_hash': vocabulary_hash(words),
+            'words': words,
+        }
+
+    def _commit(self, words: List[str], dim: int, tmp_vectors: str, tmp_scales: Optional[str]) -> None:
+        """Make the temporary files the cache for words; the manifest switches over last"""
+        vocab_hash = vocabulary_hash(words)
+        vectors_path, scales_path = self._data_paths(vocab_hash)
+        os.replace(tmp_vectors, vectors_path)
+        if tmp_scales is not None:
+            os.replace(tmp_scales, scales_path)
+        tmp_manifest = f'{self.manifest_path}.{os.getpid()}.tmp'
+        with open(tmp_manifest, 'w', encoding='utf-8') as f:
+            json.dump(self._manifest(words, dim), f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_manifest, self.manifest_path)
+        self._remove_stale(vocab_hash)
+
+    def _remove_stale(self, vocab_hash: str) -> None:
+        """Delete data files of earlier vocabularies (open memory maps of them stay valid)"""
+        keep = {os.path.basename(path) for path in self._data_paths(vocab_hash)}
+        for name in os.listdir(self.path):
+            if name.startswith(('vectors-', 'scales-')) and name.endswith('.npy') and name not in keep:
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except OSError:
+                    pass
+
+    def write(self, words: List[str], matrix: np.ndarray) -> None:
+        """Atomically replace the cache contents with float rows (stored at self.precision)"""
+        os.makedirs(self.path, exist_ok=True)
+        data, scales = quantize_rows(matrix, self.precision)
+        tmp_vectors, tmp_scales = self._tmp_paths()
+        with open(tmp_vectors, 'wb') as f:
+            np.save(f, data)
+        if tmp_scales is not None:
+            with open(tmp_scales, 'wb') as f:
+                np.save(f, scales)
+        self._commit(words, data.shape[1], tmp_vectors, tmp_scales)
+
+    def load_matrix(self, words: List[str], encode: Callable[[List[str]], np.ndarray],
+                    chunk_size: int = DEFAULT_CHUNK_SIZE) -> np.ndarray:
+        """
+        Return a memory-mapped matrix for words, embedding only cache misses.
+
+        Misses are embedded chunk_size words at a time and written straight
+        into a memory-mapped temporary file, which then atomically replaces
+        the cache, so the full matrix never has to fit in memory twice.
+
+        Args:
+            words: Deduplicated vocabulary, in row order
+            encode: Function returning normalised embeddings for a list of words
+            chunk_size: Words per encode call
+        """
+        cached_words, cached = self.read()
+        if cached is not None and cached_words == words:
+            self.hits += len(words)
+            return cached
+
+        cached_rows = {word: row for row, word in enumerate(cached_words)}
+        missing = [word for word in words if word not in cached_rows]
+        self.hits += len(words) - len(missing)
+        self.misses += len(missing)
+        if not words:
+            return encode(words)
+
+        chunks = encode_chunks(missing, encode, chunk_size)
+        first = next(chunks, None)
+        dim = first[1].shape[1] if first is not None else cached.shape[1]
+        dtype = storage_dtype(self.precision)
+        quantized = self.precision == 'int8'
+
+        tmp_vectors, tmp_scales = self._tmp_paths()
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            data = np.lib.format.open_memmap(tmp_vectors, mode='w+', dtype=dtype, shape=(len(words), dim))
+            scales = (np.lib.format.open_memmap(tmp_scales, mode='w+', dtype=np.float32, shape=(len(words),))
+                      if quantized else None)
+        except OSError as e:
+            print(f"⚠  Could not write embedding cache: {e}")
+            tmp_vectors = None
+            data = np.empty((len(words), dim), dtype=dtype)
+            scales = np.empty(len(words), dtype=np.float32) if quantized else None
+
+        if cached is not None and len(missing) < len(words):
+            # Kept rows are copied in their stored form, never re-quantized
+            cached_data, cached_scales = _stored_arrays(cached)
+            kept = np.fromiter((row for row, word in enumerate(words) if word in cached_rows), dtype=np.int64)
+            source = np.fromiter((cached_rows[words[row]] for row in kept.tolist()), dtype=np.int64,
+                                 count=len(kept))
+            for start in range(0, len(kept), chunk_size):
+                data[kept[start:start + chunk_size]] = cached_data[source[start:start + chunk_size]]
+                if scales is not None:
+                    scales[kept[start:start + chunk_size]] = cached_scales[source[start:start + chunk_size]]
+            del cached_data, cached_scales
+        del cached
+
+        if missing:
+            targets = np.fromiter((row for row, word in enumerate(words) if word not in cached_rows),
+                                  dtype=np.int64, count=len(missing))
+            for start, block in itertools.chain([first], chunks):
+                stored, block_scales = quantize_rows(block, self.precision)
+                data[targets[start:start + len(block)]] = stored
+                if scales is not None:
+                    scales[targets[start:start + len(block)]] = block_scales
+
+        if tmp_vectors is None:
+            return compact(data, scales)
+        data.flush()
+        if scales is not None:
+            scales.flush()
+        del data, scales
+        # Mapped before the commit renames them, so the result never depends on
+        # what another process writes to the cache directory afterwards
+        mapped = compact(np.load(tmp_vectors, mmap_mode='r'),
+                         np.load(tmp_scales, mmap_mode='r') if tmp_scales else None)
+        try:
+            self._commit(words, dim, tmp_vectors, tmp_scales)
+        except OSError as e:
+            print(f"⚠  Could not write embedding cache: {e}")
+        return mapped
+
+
+class EmbeddingStore:
+    """
+    Precomputed, normalised embeddings for a fixed vocabulary.
+
+    Args:
+        model: Anything with a SentenceTransformer-style ``encode(list)`` method
+        words: Vocabulary to embed (duplicates are embedded once)
+        batch_size: Batch size passed through to ``model.encode``
+        cache: Optional on-disk cache the matrix is loaded from / saved to
+        chunk_size: Words embedded per ``model.encode`` call while building the matrix
+        precision: Storage precision without a cache ('float32', 'float16' or
+            'int8'); with a cache, the cache's precision is used
+        max_extra: Out-of-vocabulary vectors remembered by vector() (LRU eviction)
+    """
+
+    def __init__(self, model, words: Iterable[str], batch_size: int = 256,
+                 cache: Optional[EmbeddingCache] = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 precision: str = 'float32', max_extra: int = DEFAULT_MAX_EXTRA):
+        self.model = model
+        self.batch_size = batch_size
+        self.cache = cache
+        self.precision = cache.precision if cache is not None else precision
+        self.words: List[str] = list(dict.fromkeys(words))
+        self.index: Dict[str, int] = {word: row for row, word in enumerate(self.words)}
+        if cache is not None:
+            self.matrix = cache.load_matrix(self.words, self._encode, chunk_size)
+        else:
+            self.matrix = encode_into_matrix(self.words, self._encode, chunk_size, self.precision)
+        # Targets outside the vocabulary are encoded once and remembered, up
+        # to max_extra of them, so arbitrary user input cannot grow it forever
+        self.max_extra = max_extra
+        self._extra: 'OrderedDict[str, np.ndarray]' = OrderedDict()
+        self._extra_lock = threading.Lock()
+
+    def _encode(self, words: List[str]) -> np.ndarray:
+        if not words:
+            return np.zeros((0, 0), dtype=np.float32)
+        embeddings = self.model.encode(words, batch_size=self.batch_size, convert_to_numpy=True)
+        return normalize_rows(embeddings)
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def __contains__(self, word: str) -> bool:
+        return word in self.index
+
+    def vector(self, word: str) -> np.ndarray:
+        """Return the normalised embedding for a word"""
+        row = self.index.get(word)
+        if row is not None:
+            return self.matrix[row]
+        with self._extra_lock:
+            vector = self._extra.get(word)
+            if vector is not None:
+                self._extra.move_to_end(word)
+                return vector
+        vector = self._encode([word])[0]
+        with self._extra_lock:
+            self._extra[word] = vector
+            self._extra.move_to_end(word)
+            while len(self._extra) > self.max_extra:
+                self._extra.popitem(last=False)
+        return vector
+
+    def rows(self, word_list: List[str]) -> np.ndarray:
+        """Map words to matrix rows, embedding any that are not in the vocabulary"""
+        missing = [word for word in word_list if word not in self.index]
+        if missing:
+            self.add(missing)
+        return np.fromiter((self.index[word] for word in word_list), dtype=np.int64, count=len(word_list))
+
+    def add(self, words: List[str]) -> None:
+        """Append new words to the vocabulary with a single batched encode"""
+        new_words = [word for word in dict.fromkeys(words) if word not in self.index]
+        if not new_words:
+            return
+        embeddings = self._encode(new_words)
+        self.matrix = append_rows(self.matrix, embeddings)
+        for word in new_words:
+            self.index[word] = len(self.words)
+            self.words.append(word)
+            self._extra.pop(word, None)
+
+    def similarities(self, target: str, word_list: List[str] = None) -> np.ndarray:
+        """
+        Cosine similarity between target and each word.
+
+        Args:
+            target: Word to compare against
+            word_list: Words to score (defaults to the whole vocabulary, in order)
+
+        Returns:
+            numpy array of similarities aligned with word_list
+        """
+        target_vec = self.vector(target)
+        if word_list is None:
+            return self.matrix @ target_vec
+        return self.matrix[self.rows(word_list)] @ target_vec
+
+    def rank(self, target: str, word_list: List[str]) -> Dict[str, int]:
+        """
+        Rank word_list by similarity to target.
+
+        Matches the reference solution exactly: a stable sort (highest first)
+        with rank 1 = most similar, and later duplicates overwriting earlier ones.
+        """
+        sims = self.similarities(target, word_list)
+        order = np.argsort(-sims, kind='stable')
+        ranking_dict = {}
+        for rank, position in enumerate(order.tolist(), start=1):
+            ranking_dict[word_list[position]] = rank
+        return ranking_dict
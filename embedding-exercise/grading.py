@@ -0,0 +1,368 @@
+"""
+Vectorized grading engine.
+
+Expected rankings are stored as integer rank arrays aligned to a fixed
+vocabulary order. A student's {word: rank} dict is converted once into the
+same layout and every metric (exact matches, rank closeness, top-10 overlap,
+Spearman and Kendall correlation) is computed with NumPy, so grading cost
+grows gently with vocabulary size instead of with Python dict lookups.
+
+ResultCache sits in front of grading: identical submissions (after
+normalising away comments and trailing whitespace) graded against the same
+test set and model return the stored result instantly.
+"""
+import hashlib
+import io
+import json
+import math
+import re
+import threading
+import tokenize
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+def average_ranks(values: np.ndarray) -> np.ndarray:
+    """Ranks 1..n with ties sharing their average rank"""
+    _, inverse, counts = np.unique(values, return_inverse=True, return_counts=True)
+    ends = np.cumsum(counts)
+    averages = ends - (counts - 1) / 2.0
+    return averages[inverse]
+
+
+def spearman(x: np.ndarray, y: np.ndarray, y_ranks: Optional[np.ndarray] = None) -> float:
+    """
+    Spearman rank correlation (Pearson correlation of average ranks).
+
+    y_ranks may pass average_ranks(y) when it was computed ahead of time.
+    """
+    if len(x) < 2:
+        return 1.0
+    rx = average_ranks(x)
+    ry = average_ranks(y) if y_ranks is None else y_ranks.copy()
+    rx -= rx.mean()
+    ry -= ry.mean()
+    denominator = np.sqrt((rx * rx).sum() * (ry * ry).sum())
+    if denominator == 0:
+        return 0.0
+    return float((rx * ry).sum() / denominator)
+
+
+def _count_inversions(values: np.ndarray) -> int:
+    """Pairs i < j with values[i] > values[j], by vectorized bottom-up merge sort"""
+    n = len(values)
+    if n < 2:
+        return 0
+    arr = np.unique(values, return_inverse=True)[1].astype(np.int64).reshape(-1)
+    span = int(arr.max()) + 1
+    positions = np.arange(n)
+    merged_position = np.empty(n, dtype=np.int64)
+    inversions = 0
+    width = 1
+    while width < n:
+        # Offsetting each block by block * span keeps blocks apart, so one
+        # stable sort merges every pair of (already sorted) halves at once
+        keyed = arr + (positions // (2 * width)) * span
+        order = np.argsort(keyed, kind='stable')
+        merged_position[order] = positions
+        # A right-half element moves left past exactly the left-half elements
+        # greater than it (stability keeps equal ones ahead of it)
+        is_right = (positions // width) % 2 == 1
+        inversions += int((positions[is_right] - merged_position[is_right]).sum())
+        arr = keyed[order] % span
+        width *= 2
+    return inversions
+
+
+def _tied_pairs(sorted_values: np.ndarray, same: Optional[np.ndarray] = None) -> int:
+    """Pairs of equal elements of a sorted array (or of runs marked by same[i]: i+1 equals i)"""
+    if same is None:
+        same = sorted_values[1:] == sorted_values[:-1]
+    starts = np.flatnonzero(np.concatenate(([True], ~same)))
+    counts = np.diff(np.append(starts, len(sorted_values))).astype(np.int64)
+    return int((counts * (counts - 1) // 2).sum())
+
+
+# Up to this many words Kendall's tau compares all pairs directly: the n x n
+# sign matrices are small, and cheaper than the merge sort's per-pass overhead
+_PAIRWISE_MAX = 128
+
+
+def _kendall_tau_pairwise(x: np.ndarray, y: np.ndarray) -> float:
+    """Kendall's tau-b in O(n^2) from the signs of all pairwise differences"""
+    x_signs = np.sign(x[:, None] - x[None, :])
+    y_signs = np.sign(y[:, None] - y[None, :])
+    denominator = np.sqrt(float(np.count_nonzero(x_signs)) * float(np.count_nonzero(y_signs)))
+    if denominator == 0:
+        return 0.0
+    return float((x_signs * y_signs).sum() / denominator)
+
+
+def kendall_tau(x: np.ndarray, y: np.ndarray) -> float:
+    """Kendall's tau-b in O(n log n) (Knight's algorithm)"""
+    n = len(x)
+    if n < 2:
+        return 1.0
+    if n <= _PAIRWISE_MAX:
+        return _kendall_tau_pairwise(x, y)
+    order = np.lexsort((y, x))
+    x_sorted = x[order]
+    y_sorted = y[order]
+    total = n * (n - 1) // 2
+    # Sorted by (x, y), so equal x and equal (x, y) pairs are adjacent runs
+    x_same = x_sorted[1:] == x_sorted[:-1]
+    x_ties = _tied_pairs(x_sorted, x_same)
+    joint_ties = _tied_pairs(x_sorted, x_same & (y_sorted[1:] == y_sorted[:-1]))
+    y_ties = _tied_pairs(np.sort(y_sorted))
+    discordant = _count_inversions(y_sorted)
+    concordant = total - x_ties - y_ties + joint_ties - discordant
+    denominator = np.sqrt(float(total - x_ties) * float(total - y_ties))
+    if denominator == 0:
+        return 0.0
+    return float((concordant - discordant) / denominator)
+
+
+class GradingKey:
+    """
+    Expected ranking for one target, aligned to a fixed vocabulary order.
+
+    Args:
+        word_list: The list handed to the student (duplicates allowed; a word
+            listed twice counts twice in the per-word averages, exactly as the
+            original per-word loop did)
+        expected: Expected {word: rank} dict
+    """
+
+    def __init__(self, word_list: List[str], expected: Dict[str, int]):
+        self.words: List[str] = list(dict.fromkeys(word_list))
+        self.index: Dict[str, int] = {word: i for i, word in enumerate(self.words)}
+        counts = {}
+        for word in word_list:
+            counts[word] = counts.get(word, 0) + 1
+        self.weights = np.array([counts[word] for word in self.words], dtype=np.float64)
+        self.total_weight = float(self.weights.sum())
+        self.expected = expected
+        self.expected_ranks = np.array([expected[word] for word in self.words], dtype=np.int64)
+        self.expected_average_ranks = average_ranks(self.expected_ranks)
+        expected_order = np.argsort(self.expected_ranks, kind='stable')
+        self.expected_top = [self.words[i] for i in expected_order[:10].tolist()]
+
+    def align(self, student_result: Dict) -> np.ndarray:
+        """Student {word: rank} -> rank array in vocabulary order (one pass over the dict)"""
+        ranks = np.empty(len(self.words), dtype=np.float64)
+        positions = np.fromiter((self.index[word] for word in student_result), dtype=np.int64,
+                                count=len(student_result))
+        ranks[positions] = np.fromiter(student_result.values(), dtype=np.float64, count=len(student_result))
+        return ranks
+
+    def score(self, student_result: Dict, top_n: int = 10, show_n: int = 5) -> Dict:
+        """
+        All grading metrics for a validated student result.
+
+        The student result must contain exactly the vocabulary words.
+        """
+        student_ranks = self.align(student_result)
+        expected_ranks = self.expected_ranks
+
+        exact_accuracy = float((self.weights * (student_ranks == expected_ranks)).sum() / self.total_weight)
+        avg_rank_diff = float((self.weights * np.abs(student_ranks - expected_ranks)).sum() / self.total_weight)
+        rank_closeness = max(0, 1 - (avg_rank_diff / 50))  # 50 positions off = 0% closeness
+
+        # One stable sort in the student's dict order gives both top 10 and top 5,
+        # with ties broken exactly as sorted(student_result.items()) would
+        dict_words = list(student_result)
+        dict_ranks = np.fromiter(student_result.values(), dtype=np.float64, count=len(dict_words))
+        dict_order = np.argsort(dict_ranks, kind='stable')[:max(top_n, show_n)]
+        student_top = [(dict_words[i], student_result[dict_words[i]]) for i in dict_order.tolist()]
+
+        top_overlap = len({word for word, _ in student_top[:top_n]} & set(self.expected_top[:top_n]))
+
+        return {
+            'exact_accuracy': exact_accuracy,
+            'rank_closeness': rank_closeness,
+            'top_10_accuracy': top_overlap / top_n,
+            'avg_rank_diff': avg_rank_diff,
+            'spearman': spearman(student_ranks, expected_ranks, self.expected_average_ranks),
+            'kendall_tau': kendall_tau(student_ranks, expected_ranks.astype(np.float64)),
+            'student_top': student_top[:show_n],
+            'expected_top': [(word, self.expected[word]) for word in self.expected_top[:show_n]],
+        }
+
+
+def passes(metrics: Dict) -> bool:
+    """Whether a test case passes, given GradingKey.score() metrics"""
+    return (metrics['exact_accuracy'] > 0.5 or metrics['rank_closeness'] > 0.8
+            or metrics['top_10_accuracy'] >= 0.8)
+
+
+def wilson_interval(successes: int, n: int, z: float = 1.96) -> Tuple[float, float]:
+    """Wilson score interval for a pass rate (stays inside [0, 1], sensible for small n)"""
+    if n == 0:
+        return 0.0, 1.0
+    p = successes / n
+    denominator = 1 + z * z / n
+    centre = (p + z * z / (2 * n)) / denominator
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denominator
+    return max(0.0, centre - half), min(1.0, centre + half)
+
+
+def mean_interval(values: List[float], z: float = 1.96) -> Tuple[float, float, float]:
+    """Mean with a normal-approximation confidence interval (mean, low, high)"""
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        return float('nan'), float('nan'), float('nan')
+    mean = float(values.mean())
+    if len(values) < 2:
+        return mean, mean, mean
+    half = z * float(values.std(ddof=1)) / math.sqrt(len(values))
+    return mean, mean - half, mean + half
+
+
+def summarize_results(test_results: List[Dict], z: float = 1.96) -> Dict:
+    """
+    Aggregate accuracy over many graded targets with confidence bounds.
+
+    Reports the pass rate with a Wilson interval and the mean of each metric
+    with a normal-approximation interval; test cases that errored count as
+    failed with zero scores.
+    """
+    n = len(test_results)
+    passed = sum(1 for result in test_results if result.get('passed'))
+    low, high = wilson_interval(passed, n, z)
+    summary = {
+        'targets': n,
+        'confidence': round(math.erf(z / math.sqrt(2)), 3),
+        'pass_rate': {'estimate': round(passed / n, 4) if n else 0.0, 'low': round(low, 4), 'high': round(high, 4)},
+    }
+    for name in ('exact_accuracy', 'rank_closeness', 'top_10_accuracy', 'spearman'):
+        mean, low, high = mean_interval([result.get(name, 0.0) for result in test_results], z)
+        summary[name] = {'mean': round(mean, 3), 'low': round(low, 3), 'high': round(high, 3)}
+    return summary
+
+
+# Source mentioning these may print or rank differently on every run, so it is never cached
+_NONDETERMINISTIC = re.compile(r'\b(random|time|datetime|secrets|uuid|urandom)\b')
+
+
+def normalize_source(code: str) -> str:
+    """
+    Canonical form of student code for cache keys.
+
+    Drops comments and trailing whitespace and unifies line endings, but keeps
+    every line in place so line numbers in tracebacks stay correct, and leaves
+    lines inside multi-line strings alone, since their whitespace is data.
+    Code that cannot be tokenized only gets its line endings unified.
+    """
+    lines = code.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    in_string = set()
+    try:
+        tokens = list(tokenize.generate_tokens(io.StringIO('\n'.join(lines)).readline))
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        return '\n'.join(lines)
+    for token in tokens:
+        if token.type == tokenize.COMMENT:
+            row, col = token.start
+            lines[row - 1] = lines[row - 1][:col]
+        elif token.end[0] > token.start[0]:
+            # Only strings span lines (f-strings come in several tokens on 3.12+)
+            in_string.update(range(token.start[0], token.end[0]))
+    return '\n'.join(line if row in in_string else line.rstrip()
+                     for row, line in enumerate(lines, start=1)).rstrip('\n')
+
+
+class ResultCache:
+    """
+    Content-addressed LRU cache of grading results.
+
+    Args:
+        version: Test-set and model version string mixed into every key
+        max_entries: Maximum number of cached results
+        max_bytes: Cap on the total JSON size of cached results
+    """
+
+    def __init__(self, version: str, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024):
+        self.version = version
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[str, Tuple[Dict, int, int, float]]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.evictions = 0
+        self.saved_seconds = 0.0
+
+    def key(self, code: str, variant: str = '') -> Optional[str]:
+        """Cache key for code (graded as variant, e.g. a set of targets), or None if it must not be cached"""
+        normalized = normalize_source(code)
+        if _NONDETERMINISTIC.search(normalized):
+            return None
+        digest = hashlib.sha256()
+        digest.update(self.version.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(variant.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(normalized.encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key: Optional[str]) -> Optional[Tuple[Dict, int]]:
+        with self._lock:
+            if key is None:
+                self.skipped += 1
+                return None
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            body, status_code, _, seconds = entry
+            self.hits += 1
+            self.saved_seconds += seconds
+            return body, status_code
+
+    def put(self, key: Optional[str], body: Dict, status_code: int, seconds: float) -> None:
+        """Store a result that took seconds to compute"""
+        if key is None:
+            return
+        size = len(json.dumps(body, default=str))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._entries[key] = (body, status_code, size, seconds)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, _, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'uncacheable': self.skipped,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'saved_seconds': round(self.saved_seconds, 3),
+            }
+
+
+def test_set_version(test_cases: List[Dict], words: List[str], model_version: str) -> str:
+    """Version string covering the word list, expected answers and model"""
+    digest = hashlib.sha256()
+    digest.update(model_version.encode('utf-8'))
+    digest.update(json.dumps(words).encode('utf-8'))
+    for test_case in test_cases:
+        digest.update(json.dumps([test_case['target'], test_case['expected_output']], sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()[:16]
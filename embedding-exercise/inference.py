@@ -0,0 +1,332 @@
+"""
+Inference helpers around the sentence transformer model.
+
+CachingModel is a drop-in stand-in for SentenceTransformer that is injected
+into student code as ``model``. It returns the same ``encode`` results, but
+serves repeated texts from a bounded LRU cache shared across submissions and
+coalesces uncached texts into batched forward passes.
+
+BatchScheduler sits between the cache and the model: encode calls from
+concurrent requests and worker threads are queued for up to a few
+milliseconds (or until enough texts arrive) and run as one batch.
+"""
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+from metrics import BATCH_BUCKETS, REGISTRY
+
+# encode() keyword arguments that do not change the returned embedding
+_PASSIVE_KWARGS = {'batch_size', 'show_progress_bar', 'convert_to_numpy', 'device'}
+
+ENCODE_CALLS = REGISTRY.counter(
+    'model_encode_calls', 'model.encode calls reaching the model (batched = coalesced by the scheduler)', ['path'])
+ENCODE_BATCH_SIZE = REGISTRY.histogram(
+    'model_encode_batch_size', 'Texts per batched model.encode call', buckets=BATCH_BUCKETS)
+ENCODE_SECONDS = REGISTRY.histogram('model_encode_seconds', 'Duration of model.encode calls', ['path'])
+ENCODE_QUEUE_WAIT = REGISTRY.histogram(
+    'model_encode_queue_wait_seconds', 'Time an encode request waited for its batch')
+ENCODE_CACHE_LOOKUPS = REGISTRY.counter(
+    'encode_cache_lookups', 'Texts looked up in the shared encode cache', ['result'])
+
+# How often a caller waiting for its batch checks that the scheduler thread is alive
+_LIVENESS_INTERVAL = 1.0
+
+
+class CachingModel:
+    """
+    Memoizing, auto-batching proxy for a SentenceTransformer model.
+
+    Args:
+        model: The wrapped SentenceTransformer
+        max_size: Maximum number of cached embeddings (LRU eviction)
+        prefetch: Words that are likely to be requested together (the
+            exercise vocabulary). The first cache miss on any of them encodes
+            every uncached one in a single batch, so a per-word loop over
+            WORDS costs one forward pass instead of one per word.
+        batch_size: Batch size used for the coalesced encode calls
+    """
+
+    def __init__(self, model, max_size: int = 10000, prefetch: Optional[Iterable[str]] = None,
+                 batch_size: int = 256):
+        self.model = model
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.prefetch = list(dict.fromkeys(prefetch or []))
+        self._prefetch_set = set(self.prefetch)
+        self._cache: 'OrderedDict[tuple, np.ndarray]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.batches = 0
+
+    def __getattr__(self, name):
+        # Everything except encode() behaves exactly like the wrapped model
+        return getattr(self.model, name)
+
+    def _cacheable(self, sentences, kwargs) -> bool:
+        # Any other option (convert_to_tensor, prompt, precision, ...) can change
+        # the result, so such calls always go to the model, even for one string
+        if not kwargs.get('convert_to_numpy', True):
+            return False
+        if not all(key in _PASSIVE_KWARGS or key == 'normalize_embeddings' for key in kwargs):
+            return False
+        if isinstance(sentences, str):
+            return True
+        if not isinstance(sentences, (list, tuple)) or not sentences:
+            return False
+        return all(isinstance(s, str) for s in sentences)
+
+    def _encode_batch(self, texts: List[str], normalize: bool) -> np.ndarray:
+        self.batches += 1
+        return np.asarray(self.model.encode(
+            texts, batch_size=self.batch_size, convert_to_numpy=True, normalize_embeddings=normalize
+        ))
+
+    def _store(self, key: tuple, vector: np.ndarray) -> None:
+        self._cache[key] = vector
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+
+    def prefill(self, model=None) -> None:
+        """
+        Encode every uncached prefetch word into the cache in one batch.
+
+        Args:
+            model: Encode with this model instead of the wrapped one (e.g. the
+                bare SentenceTransformer, so no scheduler thread is started
+                before the grading workers are forked)
+        """
+        with self._lock:
+            missing = [word for word in self.prefetch if (word, False) not in self._cache]
+        if not missing:
+            return
+        vectors = np.asarray((model or self.model).encode(
+            missing, batch_size=self.batch_size, convert_to_numpy=True, normalize_embeddings=False
+        ))
+        with self._lock:
+            self.batches += 1
+            for text, vector in zip(missing, vectors):
+                self._store((text, False), vector)
+
+    def encode(self, sentences, **kwargs):
+        """Same signature and results as SentenceTransformer.encode"""
+        if not self._cacheable(sentences, kwargs):
+            return self.model.encode(sentences, **kwargs)
+
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        normalize = bool(kwargs.get('normalize_embeddings', False))
+
+        found = {}
+        with self._lock:
+            for text in dict.fromkeys(texts):
+                vector = self._cache.get((text, normalize))
+                if vector is not None:
+                    self._cache.move_to_end((text, normalize))
+                    found[text] = vector
+            missing = [text for text in dict.fromkeys(texts) if text not in found]
+            hits = len(texts) - sum(1 for text in texts if text not in found)
+            self.hits += hits
+            self.misses += len(missing)
+            ENCODE_CACHE_LOOKUPS.inc(hits, result='hit')
+            ENCODE_CACHE_LOOKUPS.inc(len(missing), result='miss')
+            if missing and self._prefetch_set.intersection(missing):
+                missing += [word for word in self.prefetch
+                            if word not in found and word not in missing
+                            and (word, normalize) not in self._cache]
+
+        if missing:
+            vectors = self._encode_batch(missing, normalize)
+            with self._lock:
+                for text, vector in zip(missing, vectors):
+                    self._store((text, normalize), vector)
+                    found[text] = vector
+
+        # Copies, so student code cannot mutate cached embeddings
+        result = np.stack([found[text] for text in texts])
+        return result[0] if single else result
+
+    def cache_info(self) -> dict:
+        """Hit/miss statistics for the shared cache"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'batches': self.batches,
+            'size': len(self._cache),
+            'max_size': self.max_size,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class _EncodeRequest:
+    __slots__ = ('texts', 'normalize', 'enqueued', 'done', 'result', 'error')
+
+    def __init__(self, texts: List[str], normalize: bool):
+        self.texts = texts
+        self.normalize = normalize
+        self.enqueued = time.monotonic()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class BatchScheduler:
+    """
+    Cross-request dynamic micro-batching for ``model.encode``.
+
+    A background thread collects queued encode requests until max_batch_size
+    texts are waiting or max_wait_ms has passed since the first one, runs them
+    as a single batch and hands each caller its own rows back.
+
+    Args:
+        model: The wrapped SentenceTransformer
+        max_batch_size: Flush a batch once this many texts are queued
+        max_wait_ms: Longest time the first request in a batch waits for company
+    """
+
+    def __init__(self, model, max_batch_size: int = 64, max_wait_ms: float = 5.0):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._pid = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.requests = 0
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def _running(self) -> bool:
+        return self._pid == os.getpid() and self._thread.is_alive()
+
+    def _ensure_running(self) -> None:
+        # The thread does not survive fork(), so each process starts its own
+        # (and a thread that died is replaced, keeping the queued requests)
+        if self._running():
+            return
+        with self._start_lock:
+            if self._running():
+                return
+            if self._pid != os.getpid():
+                self._queue: 'queue.Queue[_EncodeRequest]' = queue.Queue()
+            self._thread = threading.Thread(target=self._loop, name='batch-scheduler', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def encode(self, sentences, **kwargs):
+        """Same signature and results as SentenceTransformer.encode"""
+        batchable = (
+            isinstance(sentences, (list, tuple)) and sentences
+            and all(isinstance(s, str) for s in sentences)
+            and kwargs.get('convert_to_numpy', True)
+            and all(key in _PASSIVE_KWARGS or key == 'normalize_embeddings' for key in kwargs)
+        )
+        if not batchable:
+            ENCODE_CALLS.inc(path='direct')
+            with ENCODE_SECONDS.time(path='direct'):
+                return self.model.encode(sentences, **kwargs)
+
+        self._ensure_running()
+        request = _EncodeRequest(list(sentences), bool(kwargs.get('normalize_embeddings', False)))
+        self._queue.put(request)
+        while not request.done.wait(_LIVENESS_INTERVAL):
+            if not self._thread.is_alive():
+                raise RuntimeError('The batch scheduler stopped before running this encode call')
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _collect(self, batch: List[_EncodeRequest]) -> None:
+        """Add queued requests to batch until it is full or max_wait_ms has passed"""
+        batch.append(self._queue.get())
+        size = len(batch[0].texts)
+        deadline = time.monotonic() + self.max_wait_ms / 1000.0
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request.texts)
+
+    def _loop(self) -> None:
+        while True:
+            batch = []
+            try:
+                self._collect(batch)
+                started = time.monotonic()
+                for normalize in (False, True):
+                    group = [request for request in batch if request.normalize == normalize]
+                    if group:
+                        self._run(group, normalize, started)
+            except Exception as e:
+                # Whatever failed, no caller is left waiting and the loop goes on
+                for request in batch:
+                    if not request.done.is_set():
+                        request.error = e
+                        request.done.set()
+
+    def _run(self, group: List[_EncodeRequest], normalize: bool, started: float) -> None:
+        texts = [text for request in group for text in request.texts]
+        ENCODE_CALLS.inc(path='batched')
+        ENCODE_BATCH_SIZE.observe(len(texts))
+        try:
+            with ENCODE_SECONDS.time(path='batched'):
+                vectors = np.asarray(self.model.encode(
+                    texts, batch_size=max(len(texts), 1), convert_to_numpy=True,
+                    normalize_embeddings=normalize
+                ))
+        except Exception as e:
+            for request in group:
+                request.error = e
+                request.done.set()
+            return
+
+        with self._stats_lock:
+            self.batches += 1
+            self.items += len(texts)
+            self.requests += len(group)
+            self.largest_batch = max(self.largest_batch, len(texts))
+            for request in group:
+                waited = started - request.enqueued
+                ENCODE_QUEUE_WAIT.observe(waited)
+                self.total_wait += waited
+                self.max_wait = max(self.max_wait, waited)
+
+        offset = 0
+        for request in group:
+            request.result = vectors[offset:offset + len(request.texts)]
+            offset += len(request.texts)
+            request.done.set()
+
+    def stats(self) -> dict:
+        """Scheduler settings plus batch-size and queue-wait statistics"""
+        with self._stats_lock:
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait_ms,
+                'batches': self.batches,
+                'requests': self.requests,
+                'items': self.items,
+                'avg_batch_size': round(self.items / self.batches, 2) if self.batches else 0.0,
+                'largest_batch': self.largest_batch,
+                'avg_queue_wait_ms': round(1000 * self.total_wait / self.requests, 3) if self.requests else 0.0,
+                'max_queue_wait_ms': round(1000 * self.max_wait, 3),
+            }
@@ -0,0 +1,449 @@
+"""
+Concurrent load test for the grading server (a generalised test_solution.sh).
+
+N client threads, each holding one keep-alive HTTP connection, replay a
+weighted mix of submissions against /api/submit_solution (or the streaming
+endpoint) for a fixed time or number of requests:
+
+    correct  CORRECT_SOLUTION.py (encodes word by word)
+    wrong    valid code that ranks alphabetically (fails every test)
+    slow     the correct solution with a sleep per test case
+    print    the correct solution printing a line per word
+    syntax   code that does not compile
+
+Every submission is made unique so the result cache does not answer it
+(--cache-hits to allow that). The run reports throughput, latency
+percentiles per kind, status and error rates, and the CPU and memory use of
+the server processes (Linux /proc), and writes it all to a JSON file that
+--baseline compares against a previous run.
+
+    python load_test.py --start --workers 2 --clients 16 --duration 30 --out run.json
+    python load_test.py --url http://127.0.0.1:5000 --mix correct=8,syntax=1 --baseline run.json
+"""
+import argparse
+import http.client
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_MIX = 'correct=6,wrong=2,slow=1,print=1,syntax=1'
+
+# Server responses counted as load shedding rather than errors
+SHED_STATUSES = (429, 503)
+
+
+def _submissions() -> Dict[str, Tuple[str, Tuple[int, str]]]:
+    """kind -> (source code, expected (HTTP status, body status))"""
+    with open(os.path.join(HERE, 'CORRECT_SOLUTION.py')) as f:
+        correct = f.read()
+    return {
+        'correct': (correct, (200, 'success')),
+        'wrong': ('''
+def compute_embedding(word):
+    return model.encode([word])[0]
+
+def rank_words_by_similarity(target, words):
+    return {word: rank for rank, word in enumerate(sorted(set(words)), start=1)}
+''', (200, 'partial')),
+        'slow': (correct + '''
+import time as _time
+_rank = rank_words_by_similarity
+
+def rank_words_by_similarity(target, words):
+    _time.sleep(0.5)
+    return _rank(target, words)
+''', (200, 'success')),
+        'print': (correct + '''
+_rank = rank_words_by_similarity
+
+def rank_words_by_similarity(target, words):
+    ranking = _rank(target, words)
+    for word, rank in ranking.items():
+        print(f"{target}: {word} -> {rank}")
+    return ranking
+''', (200, 'success')),
+        'syntax': ('''
+def compute_embedding(word)
+    return model.encode([word])[0]
+''', (400, 'error')),
+    }
+
+
+def parse_mix(mix: str, kinds) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in kinds:
+            raise ValueError(f"Unknown submission kind {name!r}, expected one of {', '.join(kinds)}")
+        weights[name] = float(weight or 1)
+    if not any(weights.values()):
+        raise ValueError('The mix needs at least one positive weight')
+    return weights
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Linear-interpolated percentile (q in 0-100) of values"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100.0
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def latency_summary(latencies: List[float]) -> Dict:
+    return {
+        'count': len(latencies),
+        'mean_ms': round(1000 * sum(latencies) / len(latencies), 2) if latencies else None,
+        **{f'p{q}_ms': round(1000 * percentile(latencies, q), 2) if latencies else None for q in (50, 95, 99)},
+        'max_ms': round(1000 * max(latencies), 2) if latencies else None,
+    }
+
+
+class Client(threading.Thread):
+    """One simulated student: a keep-alive connection sending submissions back to back"""
+
+    def __init__(self, host: str, port: int, path: str, stream: bool, pick, stop_at: float,
+                 budget, results: List[Dict], lock: threading.Lock, timeout: float, unique: bool):
+        super().__init__(daemon=True)
+        self.host, self.port, self.path, self.stream = host, port, path, stream
+        self.pick, self.stop_at, self.budget = pick, stop_at, budget
+        self.results, self.lock, self.timeout, self.unique = results, lock, timeout, unique
+        self.connections = 0
+        self.conn = None
+
+    def _connection(self) -> http.client.HTTPConnection:
+        # http.client drops the socket after a response that closes the
+        # connection (e.g. from an HTTP/1.0 server); count every reconnect
+        if self.conn is None or self.conn.sock is None:
+            if self.conn is not None:
+                self.conn.close()
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self.conn.connect()
+            self.connections += 1
+        return self.conn
+
+    def _send(self, body: bytes) -> Tuple[int, Dict, float]:
+        conn = self._connection()
+        started = time.perf_counter()
+        conn.request('POST', self.path, body=body, headers={'Content-Type': 'application/json'})
+        response = conn.getresponse()
+        raw = response.read()
+        elapsed = time.perf_counter() - started
+        if self.stream and response.status == 200:
+            # The last Server-Sent Event carries the graded result
+            events = [json.loads(line[6:]) for line in raw.decode('utf-8').splitlines() if line.startswith('data: ')]
+            result = events[-1] if events else {'status_code': 0, 'body': {}}
+            return result['status_code'], result['body'], elapsed
+        try:
+            return response.status, json.loads(raw or b'{}'), elapsed
+        except ValueError:
+            return response.status, {}, elapsed
+
+    def run(self) -> None:
+        for n in itertools.count():
+            if time.monotonic() >= self.stop_at or not self.budget():
+                break
+            kind, code, expected = self.pick()
+            if self.unique:
+                # A changed statement (not a comment) defeats the result cache
+                code = f'{code}\n_load_test_nonce = {id(self)}{n}\n'
+            record = {'kind': kind, 'started': time.monotonic()}
+            try:
+                status, body, elapsed = self._send(json.dumps({'code': code}).encode('utf-8'))
+                record.update(status=status, seconds=elapsed, cached=bool(body.get('cached')),
+                              expected=(status, body.get('status')) == expected)
+            except (OSError, http.client.HTTPException, ValueError) as e:
+                record.update(status=None, seconds=None, error=f'{type(e).__name__}: {e}', expected=False)
+                if self.conn is not None:
+                    self.conn.close()
+                self.conn = None
+            with self.lock:
+                self.results.append(record)
+        if self.conn is not None:
+            self.conn.close()
+
+
+class ResourceSampler(threading.Thread):
+    """Samples CPU time and memory of a process and its descendants from /proc"""
+
+    def __init__(self, pid: int, interval: float = 0.5):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples: List[Dict] = []
+        self._stop_event = threading.Event()
+        self._ticks = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+    def _tree(self) -> List[int]:
+        children: Dict[int, List[int]] = {}
+        for entry in os.listdir('/proc'):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    fields = f.read().rsplit(')', 1)[1].split()
+            except OSError:
+                continue
+            children.setdefault(int(fields[1]), []).append(int(entry))
+        tree, pending = [], [self.pid]
+        while pending:
+            pid = pending.pop()
+            tree.append(pid)
+            pending.extend(children.get(pid, []))
+        return tree
+
+    def sample(self) -> Optional[Dict]:
+        cpu = rss = pss = 0.0
+        processes = 0
+        for pid in self._tree():
+            try:
+                with open(f'/proc/{pid}/stat') as f:
+                    fields = f.read().rsplit(')', 1)[1].split()
+                cpu += (int(fields[11]) + int(fields[12])) / self._ticks
+                rss += int(fields[21]) * os.sysconf('SC_PAGE_SIZE')
+                with open(f'/proc/{pid}/smaps_rollup') as f:
+                    for line in f:
+                        if line.startswith('Pss:'):
+                            pss += int(line.split()[1]) * 1024
+                processes += 1
+            except (OSError, IndexError, ValueError):
+                continue
+        if not processes:
+            return None
+        return {'time': time.monotonic(), 'cpu_seconds': cpu, 'rss_bytes': rss, 'pss_bytes': pss,
+                'processes': processes}
+
+    def run(self) -> None:
+        while not self._stop_event.is_set():
+            sample = self.sample()
+            if sample is not None:
+                self.samples.append(sample)
+            self._stop_event.wait(self.interval)
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+        sample = self.sample()
+        if sample is not None:
+            self.samples.append(sample)
+
+    def summary(self) -> Optional[Dict]:
+        if len(self.samples) < 2:
+            return None
+        first, last = self.samples[0], self.samples[-1]
+        wall = last['time'] - first['time']
+        cpu = last['cpu_seconds'] - first['cpu_seconds']
+        return {
+            'cpu_seconds': round(cpu, 2),
+            'avg_cpu_cores': round(cpu / wall, 2) if wall > 0 else None,
+            'peak_rss_mb': round(max(s['rss_bytes'] for s in self.samples) / 2**20, 1),
+            # Proportional set size counts pages shared between forked workers once
+            'peak_pss_mb': round(max(s['pss_bytes'] for s in self.samples) / 2**20, 1),
+            'peak_processes': max(s['processes'] for s in self.samples),
+        }
+
+
+def _get_json(host: str, port: int, path: str, timeout: float = 5.0) -> Tuple[int, Dict]:
+    conn = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        conn.request('GET', path)
+        response = conn.getresponse()
+        return response.status, json.loads(response.read() or b'{}')
+    finally:
+        conn.close()
+
+
+def start_server(port: int, workers: int, timeout: float) -> subprocess.Popen:
+    """Start serve.py on port and wait until /api/ready answers 200"""
+    process = subprocess.Popen([sys.executable, os.path.join(HERE, 'serve.py'), '--port', str(port),
+                                '--workers', str(workers)], cwd=HERE)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f'Server exited with code {process.returncode}')
+        try:
+            status, _ = _get_json('127.0.0.1', port, '/api/ready')
+            if status == 200:
+                return process
+        except (OSError, http.client.HTTPException, ValueError):
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise SystemExit(f'Server not ready after {timeout:g}s')
+
+
+def summarize(results: List[Dict], wall: float, connections: int) -> Dict:
+    done = [r for r in results if r['status'] is not None]
+    shed = [r for r in done if r['status'] in SHED_STATUSES]
+    served = [r for r in done if r['status'] not in SHED_STATUSES]
+    statuses: Dict[str, int] = {}
+    for r in results:
+        key = str(r['status']) if r['status'] is not None else 'transport_error'
+        statuses[key] = statuses.get(key, 0) + 1
+    by_kind = {}
+    for kind in sorted({r['kind'] for r in results}):
+        rows = [r for r in served if r['kind'] == kind]
+        by_kind[kind] = dict(latency_summary([r['seconds'] for r in rows]),
+                             unexpected=sum(1 for r in rows if not r['expected']))
+    total = len(results)
+    return {
+        'requests': total,
+        'wall_seconds': round(wall, 3),
+        'throughput_rps': round(len(served) / wall, 3) if wall > 0 else None,
+        'latency': latency_summary([r['seconds'] for r in served]),
+        'by_kind': by_kind,
+        'statuses': statuses,
+        'error_rate': round((total - len(done)) / total, 4) if total else 0.0,
+        'shed_rate': round(len(shed) / total, 4) if total else 0.0,
+        'unexpected_rate': round(sum(1 for r in served if not r['expected']) / len(served), 4) if served else 0.0,
+        'cached_responses': sum(1 for r in served if r.get('cached')),
+        'connections_opened': connections,
+        'errors': sorted({r['error'] for r in results if r.get('error')})[:10],
+    }
+
+
+def compare(current: Dict, baseline: Dict) -> List[str]:
+    """Lines describing how the headline numbers moved against a baseline run"""
+    lines = []
+    for label, path in (('throughput (req/s)', ('throughput_rps',)), ('p50 (ms)', ('latency', 'p50_ms')),
+                        ('p95 (ms)', ('latency', 'p95_ms')), ('p99 (ms)', ('latency', 'p99_ms')),
+                        ('error rate', ('error_rate',)), ('shed rate', ('shed_rate',))):
+        now, before = current, baseline
+        for key in path:
+            now = (now or {}).get(key)
+            before = (before or {}).get(key)
+        if now is None or before is None:
+            continue
+        change = f' ({(now - before) / before:+.1%})' if before else ''
+        lines.append(f'{label:>20}: {before} -> {now}{change}')
+    return lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Load-test the grading server with a mix of submissions')
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='Server to test')
+    parser.add_argument('--start', action='store_true', help='Start serve.py on the --url port first')
+    parser.add_argument('--workers', type=int, default=1, help='Server processes for --start')
+    parser.add_argument('--server-pid', type=int, help='Sample resource use of this (already running) server')
+    parser.add_argument('--clients', type=int, default=8, help='Concurrent clients')
+    parser.add_argument('--duration', type=float, default=30.0, help='Seconds to send requests for')
+    parser.add_argument('--requests', type=int, default=0, help='Stop after this many requests (0 = use --duration)')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'Weights per submission kind (default {DEFAULT_MIX})')
+    parser.add_argument('--stream', action='store_true', help='Use /api/submit_solution/stream')
+    parser.add_argument('--cache-hits', action='store_true', help='Send identical code so the result cache can answer')
+    parser.add_argument('--timeout', type=float, default=60.0, help='Per-request timeout in seconds')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the submission mix')
+    parser.add_argument('--out', help='Write the JSON report here')
+    parser.add_argument('--baseline', help='Compare against an earlier --out report')
+    args = parser.parse_args()
+
+    url = urlsplit(args.url)
+    host, port = url.hostname or '127.0.0.1', url.port or 80
+    submissions = _submissions()
+    try:
+        weights = parse_mix(args.mix, submissions)
+    except ValueError as e:
+        parser.error(str(e))
+
+    server = start_server(port, args.workers, timeout=300) if args.start else None
+    try:
+        status, ready = _get_json(host, port, '/api/ready')
+        if status != 200:
+            raise SystemExit(f"Server at {args.url} is not ready: {ready.get('state')}")
+        server_pid = server.pid if server is not None else args.server_pid
+        sampler = ResourceSampler(server_pid) if server_pid and os.path.isdir('/proc') else None
+
+        rng = random.Random(args.seed)
+        rng_lock = threading.Lock()
+        kinds = list(weights)
+        counter = itertools.count()
+
+        def pick():
+            with rng_lock:
+                kind = rng.choices(kinds, weights=[weights[k] for k in kinds])[0]
+            code, expected = submissions[kind]
+            return kind, code, expected
+
+        def budget() -> bool:
+            return not args.requests or next(counter) < args.requests
+
+        results: List[Dict] = []
+        lock = threading.Lock()
+        stop_at = time.monotonic() + (args.duration if not args.requests else float('inf'))
+        path = '/api/submit_solution/stream' if args.stream else '/api/submit_solution'
+        clients = [Client(host, port, path, args.stream, pick, stop_at, budget, results, lock,
+                          args.timeout, unique=not args.cache_hits) for _ in range(max(1, args.clients))]
+
+        print(f"Load test: {len(clients)} clients, {args.requests or f'{args.duration:g}s'}, mix {args.mix}")
+        if sampler is not None:
+            sampler.start()
+        started = time.monotonic()
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        wall = time.monotonic() - started
+        if sampler is not None:
+            sampler.stop()
+
+        report = {
+            'config': {key: getattr(args, key) for key in ('url', 'workers', 'clients', 'duration', 'requests',
+                                                           'mix', 'stream', 'cache_hits', 'seed')},
+            'environment': {'python': platform.python_version(), 'cpus': os.cpu_count(),
+                            'created': time.strftime('%Y-%m-%dT%H:%M:%S%z')},
+            'summary': summarize(results, wall, sum(client.connections for client in clients)),
+            'server_resources': sampler.summary() if sampler is not None else None,
+        }
+        try:
+            report['server_stats'] = _get_json(host, port, '/api/grading_stats')[1]
+        except (OSError, http.client.HTTPException, ValueError):
+            report['server_stats'] = None
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    summary = report['summary']
+    latency = summary['latency']
+    print(f"✓ {summary['requests']} requests in {summary['wall_seconds']}s: {summary['throughput_rps']} req/s, "
+          f"p50 {latency['p50_ms']} ms, p95 {latency['p95_ms']} ms, p99 {latency['p99_ms']} ms")
+    print(f"  statuses {summary['statuses']}, error rate {summary['error_rate']:.1%}, "
+          f"shed {summary['shed_rate']:.1%}, unexpected results {summary['unexpected_rate']:.1%}, "
+          f"{summary['connections_opened']} connections")
+    for kind, stats in summary['by_kind'].items():
+        print(f"  {kind:>8}: {stats['count']} served, p50 {stats['p50_ms']} ms, p95 {stats['p95_ms']} ms, "
+              f"{stats['unexpected']} unexpected")
+    if report['server_resources']:
+        resources = report['server_resources']
+        print(f"  server: {resources['avg_cpu_cores']} CPU cores on average, peak PSS {resources['peak_pss_mb']} MB "
+              f"across {resources['peak_processes']} processes")
+    if summary['errors']:
+        print(f"⚠  Transport errors: {'; '.join(summary['errors'])}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f'Compared with {args.baseline}:')
+        for line in compare(summary, baseline['summary']):
+            print(line)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'✓ Report written to {args.out}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Hashed character n-gram embeddings, used when no sentence transformer model
+is available.
+
+Each word is lower-cased, wrapped in boundary markers ("<cat>") and split
+into character n-grams; every n-gram is hashed into one of ``dim`` buckets
+with a random sign (the hashing trick). Hashing is done for a whole batch of
+words at once on a padded code-point matrix, so encoding the vocabulary is a
+handful of NumPy operations rather than a Counter per word, and the result
+plugs into EmbeddingStore like a real model: ranking a target is a single
+matrix-vector product. Needs only NumPy (no torch).
+"""
+from typing import List, Tuple, Union
+
+import numpy as np
+
+# Code points are shifted so that 0 (padding) and the boundary markers never
+# collide with a real character
+_PAD, _BOS, _EOS, _SHIFT = 0, 1, 2, 3
+_PRIME = np.uint64(0x100000001B3)
+_MASK_SHIFT = np.uint64(29)
+_SIGN_SHIFT = np.uint64(63)
+
+
+def _code_matrix(words: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """(len(words), max_len + 2) code points with boundary markers, plus word lengths"""
+    lengths = np.fromiter((len(word) for word in words), dtype=np.int64, count=len(words))
+    codes = np.zeros((len(words), int(lengths.max(initial=0)) + 2), dtype=np.uint64)
+    flat = np.frombuffer(''.join(words).encode('utf-32-le'), dtype=np.uint32)
+    rows = np.repeat(np.arange(len(words)), lengths)
+    starts = np.cumsum(lengths) - lengths
+    cols = np.arange(len(flat)) - np.repeat(starts, lengths) + 1
+    codes[rows, cols] = flat.astype(np.uint64) + _SHIFT
+    codes[:, 0] = _BOS
+    codes[np.arange(len(words)), lengths + 1] = _EOS
+    return codes, lengths
+
+
+class HashedNgramEncoder:
+    """
+    SentenceTransformer-compatible encoder built from hashed character n-grams.
+
+    Args:
+        dim: Number of hash buckets (embedding width)
+        ngram_range: Smallest and largest n-gram length; unigrams skip the
+            boundary markers, longer n-grams include them
+    """
+
+    def __init__(self, dim: int = 1024, ngram_range: Tuple[int, int] = (1, 3)):
+        self.dim = dim
+        self.ngram_range = ngram_range
+
+    def _hash_batch(self, words: List[str]) -> np.ndarray:
+        codes, lengths = _code_matrix([word.lower() for word in words])
+        width = codes.shape[1]
+        rows, buckets, signs = [], [], []
+        for n in range(self.ngram_range[0], self.ngram_range[1] + 1):
+            if n > width:
+                break
+            positions = np.arange(width - n + 1)
+            if n == 1:
+                valid = (positions >= 1) & (positions[None, :] <= lengths[:, None])
+            else:
+                valid = positions[None, :] + n <= lengths[:, None] + 2
+            # FNV-style rolling hash over each window, seeded by n so that
+            # e.g. the unigram "a" and the bigram "<a" land independently
+            h = np.full((len(words), len(positions)), n, dtype=np.uint64)
+            with np.errstate(over='ignore'):
+                for k in range(n):
+                    h = (h ^ codes[:, k:k + len(positions)]) * _PRIME
+                h ^= h >> _MASK_SHIFT
+                h *= _PRIME
+            h = h[valid]
+            rows.append(np.nonzero(valid)[0])
+            buckets.append((h % np.uint64(self.dim)).astype(np.int64))
+            signs.append(1.0 - 2.0 * (h >> _SIGN_SHIFT).astype(np.float64))
+        rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+        buckets = np.concatenate(buckets) if buckets else np.zeros(0, dtype=np.int64)
+        signs = np.concatenate(signs) if signs else np.zeros(0)
+        counts = np.bincount(rows * self.dim + buckets, weights=signs, minlength=len(words) * self.dim)
+        return counts.reshape(len(words), self.dim).astype(np.float32)
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 4096,
+               convert_to_numpy: bool = True, normalize_embeddings: bool = False,
+               **kwargs) -> np.ndarray:
+        """Same call shape as SentenceTransformer.encode; returns float32 vectors"""
+        single = isinstance(sentences, str)
+        words = [sentences] if single else [str(s) for s in sentences]
+        batch_size = max(1, batch_size or len(words))
+        if words:
+            matrix = np.vstack([self._hash_batch(words[i:i + batch_size])
+                                for i in range(0, len(words), batch_size)])
+        else:
+            matrix = np.zeros((0, self.dim), dtype=np.float32)
+        if normalize_embeddings:
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            matrix = matrix / norms
+        return matrix[0] if single else matrix
@@ -0,0 +1,265 @@
+"""
+Opt-in performance report for one graded submission.
+
+SubmissionProfiler is used by grade_submission when a student asks for
+``"profile": true``. It hands the student code a CountingModel instead of
+the shared ``model`` (same results, but every encode call and its size is
+recorded), runs exec and the student's function under cProfile (not the
+grader's own scoring), and tracks peak memory with tracemalloc. report()
+turns that into the 'performance' section of the response: wall time per
+test case, encode call counts and sizes, peak memory, the hottest functions
+(and the student's own functions with their call counts) and hints such as
+"encode all words in one call".
+
+Profiling slows the submission down, so its timings are only comparable
+with other profiled runs. tracemalloc has a single peak per process: it is
+exact in a grading worker, but when profiled submissions overlap in-process
+they share it, and their reports say so with peak_memory_shared. Likewise
+only one thread of a process can be under cProfile at a time (Python 3.12
+refuses a second one), so calls made while another is being profiled run
+unprofiled and the report says so with functions_incomplete.
+"""
+import cProfile
+import functools
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Set
+
+# tracemalloc is process-wide; it runs while any profiled submission does
+_tracing_lock = threading.Lock()
+_tracing_profilers: Set['SubmissionProfiler'] = set()
+# Held while a thread is under cProfile; never waited for, since the profiled
+# call may be student code that does not return
+_cprofile_lock = threading.Lock()
+
+
+class CountingModel:
+    """
+    Pass-through proxy for the student-facing model that records encode calls.
+
+    Args:
+        model: The model to forward to (CachingModel or SentenceTransformer)
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.calls = 0
+        self.texts = 0
+        self.largest_call = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        # Everything except encode() is the underlying model's
+        return getattr(self.model, name)
+
+    def encode(self, sentences, **kwargs):
+        """Same signature and results as SentenceTransformer.encode"""
+        if isinstance(sentences, str):
+            size = 1
+        else:
+            sentences = sentences if hasattr(sentences, '__len__') else list(sentences)
+            size = len(sentences)
+        started = time.perf_counter()
+        try:
+            return self.model.encode(sentences, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.calls += 1
+                self.texts += size
+                self.largest_call = max(self.largest_call, size)
+                self.seconds += elapsed
+
+    def summary(self) -> Dict:
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'texts': self.texts,
+                'avg_texts_per_call': round(self.texts / self.calls, 2) if self.calls else 0.0,
+                'largest_call': self.largest_call,
+                'seconds': round(self.seconds, 4),
+            }
+
+
+class SubmissionProfiler:
+    """
+    Collects the performance report of one submission.
+
+    Use as a context manager around the grading; the student code must be
+    given ``profiler.model``, exec run through ``profiler.run()`` and the
+    student's function called through ``profiler.wrap()``.
+
+    Args:
+        model: The student-facing model to wrap in a CountingModel
+        top_n: Number of hottest functions to report
+    """
+
+    def __init__(self, model, top_n: int = 10):
+        self.model = CountingModel(model) if model is not None else None
+        self.top_n = top_n
+        self.test_cases: List[Dict] = []
+        self.phases: Dict[str, float] = {}
+        self._profiles: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+        self._started = None
+        self._wall = None
+        self._peak = None
+        self._baseline = 0
+        # Set when another profiled submission ran at the same time
+        self._peak_shared = False
+        # Set when a call ran unprofiled because cProfile was in use
+        self._functions_incomplete = False
+
+    def __enter__(self) -> 'SubmissionProfiler':
+        with _tracing_lock:
+            if not _tracing_profilers and not tracemalloc.is_tracing():
+                tracemalloc.start()
+            if _tracing_profilers:
+                # Resetting the peak would lose the running profilers' peaks,
+                # so all of them report the shared one instead
+                self._peak_shared = True
+                for other in _tracing_profilers:
+                    other._peak_shared = True
+            else:
+                tracemalloc.reset_peak()
+            _tracing_profilers.add(self)
+            self._baseline = tracemalloc.get_traced_memory()[0]
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._wall = time.perf_counter() - self._started
+        with _tracing_lock:
+            self._peak = max(0, tracemalloc.get_traced_memory()[1] - self._baseline)
+            _tracing_profilers.discard(self)
+            if not _tracing_profilers:
+                tracemalloc.stop()
+
+    def run(self, phase: str, func: Callable, *args, **kwargs):
+        """
+        Call func under cProfile in the current thread, adding its wall time to phase.
+
+        If another thread of this process is under cProfile, func runs
+        unprofiled (only its wall time is recorded).
+        """
+        profile = self._start_profile()
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            if profile is not None:
+                profile.disable()
+                _cprofile_lock.release()
+            with self._lock:
+                if profile is not None:
+                    self._profiles.append(profile)
+                self.phases[phase] = self.phases.get(phase, 0.0) + elapsed
+
+    def _start_profile(self) -> Optional[cProfile.Profile]:
+        """An enabled cProfile.Profile, or None when cProfile is in use elsewhere"""
+        if _cprofile_lock.acquire(blocking=False):
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+                return profile
+            except ValueError:
+                # Another profiling tool (e.g. a debugger) owns the hook
+                _cprofile_lock.release()
+        with self._lock:
+            self._functions_incomplete = True
+        return None
+
+    def wrap(self, func: Callable, phase: str = 'student_function') -> Callable:
+        """func, profiled on every call (from any thread)"""
+        @functools.wraps(func)
+        def profiled(*args, **kwargs):
+            return self.run(phase, func, *args, **kwargs)
+        return profiled
+
+    def record_test_case(self, target: str, seconds: float, passed: bool) -> None:
+        with self._lock:
+            self.test_cases.append({'target': target, 'seconds': round(seconds, 4), 'passed': passed})
+
+    def _stats(self) -> Dict[tuple, tuple]:
+        """Merged cProfile entries of every profiled thread, without the profiler's own"""
+        with self._lock:
+            profiles = list(self._profiles)
+        if not profiles:
+            return {}
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        return {key: value for key, value in stats.stats.items()
+                if key[0] != __file__ and not key[2].startswith("<method 'disable' of '_lsprof")}
+
+    def hot_functions(self, stats: Dict[tuple, tuple]) -> List[Dict]:
+        """The top_n functions by own time"""
+        rows = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:self.top_n]
+        return [_stat_row(key, value) for key, value in rows]
+
+    def student_functions(self, stats: Dict[tuple, tuple]) -> List[Dict]:
+        """Functions defined in the submitted code, by cumulative time"""
+        rows = [(key, value) for key, value in stats.items() if key[0] == STUDENT_FILENAME]
+        rows.sort(key=lambda item: item[1][3], reverse=True)
+        return [_stat_row(key, value) for key, value in rows[:self.top_n]]
+
+    def report(self, test_case_count: int) -> Dict:
+        """The 'performance' section of the response"""
+        encode = self.model.summary() if self.model is not None else None
+        with self._lock:
+            test_cases = sorted(self.test_cases, key=lambda case: case['seconds'], reverse=True)
+            phases = {phase: round(seconds, 4) for phase, seconds in self.phases.items()}
+        stats = self._stats()
+        return {
+            'wall_seconds': round(self._wall, 4) if self._wall is not None else None,
+            'phases': phases,
+            'test_cases': test_cases,
+            'encode': encode,
+            'peak_memory_mb': round(self._peak / 2**20, 3) if self._peak is not None else None,
+            'peak_memory_shared': self._peak_shared,
+            'functions_incomplete': self._functions_incomplete,
+            'your_functions': self.student_functions(stats),
+            'hot_functions': self.hot_functions(stats),
+            'hints': _hints(encode, test_case_count),
+        }
+
+
+# Filename exec() gives the submitted code
+STUDENT_FILENAME = '<string>'
+
+
+def _stat_row(key: tuple, value: tuple) -> Dict:
+    (filename, line, name), (_, calls, own, cumulative, _) = key, value
+    return {
+        'function': _describe(filename, line, name),
+        'calls': calls,
+        'own_seconds': round(own, 4),
+        'cumulative_seconds': round(cumulative, 4),
+    }
+
+
+def _describe(filename: str, line: int, name: str) -> str:
+    if filename == '~':
+        return name  # built-in, e.g. "<built-in method numpy.core._multiarray_umath.dot>"
+    if filename == STUDENT_FILENAME:
+        return f'{name} (your code, line {line})'
+    return f'{name} ({os.path.basename(filename)}:{line})'
+
+
+def _hints(encode: Optional[Dict], test_case_count: int) -> List[str]:
+    """Advice on embedding usage derived from the encode counters"""
+    hints = []
+    if not encode or not encode['calls'] or not test_case_count:
+        return hints
+    calls_per_case = encode['calls'] / test_case_count
+    if calls_per_case > 10 and encode['avg_texts_per_call'] < 2:
+        hints.append(f"model.encode was called {encode['calls']} times with about one word each. "
+                     f"Encoding all words in one call (model.encode(words)) is much faster.")
+    if encode['texts'] > 2 * encode['calls'] and calls_per_case > 2:
+        hints.append('Several encode calls per test case: encode the target and the words together, once.')
+    return hints
@@ -0,0 +1,183 @@
+"""
+Reduced-precision storage for the vocabulary embedding matrix.
+
+'float16' halves the matrix; 'int8' stores each row as int8 codes plus one
+float32 scale (max |value| / 127), about a quarter of float32. CompactMatrix
+wraps the stored arrays and behaves like the float32 matrix where the rest of
+the code needs it: ``matrix @ vector`` runs on the stored codes chunk by
+chunk (int8 rows are scaled after the product), slicing returns another
+CompactMatrix view, and integer or fancy indexing returns dequantized
+float32 rows.
+
+rank_agreement_report() compares the rankings and grading outcome for the
+exercise's test cases against float32, to show that a precision is safe.
+"""
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+PRECISIONS = ('float32', 'float16', 'int8')
+
+_STORAGE_DTYPES = {'float32': np.float32, 'float16': np.float16, 'int8': np.int8}
+
+# Rows converted to float32 at a time inside matrix products
+_MATMUL_CHUNK = 8192
+
+
+def storage_dtype(precision: str):
+    if precision not in _STORAGE_DTYPES:
+        raise ValueError(f"Unknown precision {precision!r}, expected one of {', '.join(PRECISIONS)}")
+    return _STORAGE_DTYPES[precision]
+
+
+def quantize_rows(block: np.ndarray, precision: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Stored form of float rows: (data, per-row scales or None)"""
+    block = np.asarray(block, dtype=np.float32)
+    if precision != 'int8':
+        return block.astype(storage_dtype(precision)), None
+    scales = np.abs(block).max(axis=1) / 127.0 if block.size else np.zeros(len(block), dtype=np.float32)
+    safe = np.where(scales == 0, 1.0, scales).astype(np.float32)
+    codes = np.clip(np.rint(block / safe[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+class CompactMatrix:
+    """
+    Read-only (V, dim) matrix stored as float16 or scaled int8.
+
+    Args:
+        data: Stored values (float16, or int8 codes)
+        scales: Per-row float32 scales for int8 data, None for float16
+    """
+
+    def __init__(self, data: np.ndarray, scales: Optional[np.ndarray] = None):
+        self.data = data
+        self.scales = scales
+
+    @property
+    def precision(self) -> str:
+        return 'int8' if self.scales is not None else 'float16'
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.data.shape
+
+    @property
+    def ndim(self) -> int:
+        return 2
+
+    @property
+    def dtype(self):
+        return np.dtype(np.float32)
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def _dequantize(self, data: np.ndarray, scales: Optional[np.ndarray]) -> np.ndarray:
+        rows = np.asarray(data, dtype=np.float32)
+        if scales is not None:
+            rows = rows * (scales[..., None] if rows.ndim > 1 else scales)
+        return rows
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return CompactMatrix(self.data[key], self.scales[key] if self.scales is not None else None)
+        return self._dequantize(self.data[key], self.scales[key] if self.scales is not None else None)
+
+    def take(self, rows: np.ndarray) -> 'CompactMatrix':
+        """Selected rows, still in stored form"""
+        return CompactMatrix(self.data[rows], self.scales[rows] if self.scales is not None else None)
+
+    def __array__(self, dtype=None, copy=None):
+        rows = self._dequantize(self.data, self.scales)
+        return rows.astype(dtype) if dtype is not None else rows
+
+    def __matmul__(self, other) -> np.ndarray:
+        other = np.asarray(other, dtype=np.float32)
+        out = np.empty((len(self),) + other.shape[1:], dtype=np.float32)
+        for start in range(0, len(self), _MATMUL_CHUNK):
+            stop = start + _MATMUL_CHUNK
+            product = np.asarray(self.data[start:stop], dtype=np.float32) @ other
+            if self.scales is not None:
+                scales = self.scales[start:stop]
+                product *= scales[:, None] if product.ndim > 1 else scales
+            out[start:stop] = product
+        return out
+
+    def append(self, block: np.ndarray) -> 'CompactMatrix':
+        """A new matrix with float rows added at the end (stored at the same precision)"""
+        data, scales = quantize_rows(block, self.precision)
+        return CompactMatrix(
+            np.concatenate([self.data, data]),
+            np.concatenate([self.scales, scales]) if self.scales is not None else None,
+        )
+
+
+def compact(data: np.ndarray, scales: Optional[np.ndarray] = None):
+    """Wrap stored data for use as the vocabulary matrix (float32 data is returned as is)"""
+    if data.dtype == np.float32:
+        return data
+    return CompactMatrix(data, scales)
+
+
+def append_rows(matrix, block: np.ndarray):
+    """matrix with block's rows appended, keeping matrix's precision"""
+    if isinstance(matrix, CompactMatrix):
+        return matrix.append(block)
+    return np.vstack([matrix, block]) if len(matrix) else block
+
+
+def rank_agreement_report(words: List[str], test_cases: List[Dict], precision: str,
+                          reference: Callable[[str, List[str]], Dict[str, int]],
+                          quantized: Callable[[str, List[str]], Dict[str, int]]) -> Dict:
+    """
+    How much a precision changes the expected rankings of the test cases.
+
+    For every test target the float32 ranking (reference) is compared with
+    the ranking from the reduced-precision matrix: share of identical ranks,
+    largest rank shift, Spearman and Kendall correlation, top-10 overlap, and
+    whether a submission reproducing the float32 answer still passes when
+    graded against the reduced-precision answer (and vice versa).
+
+    Args:
+        words: The exercise word list
+        test_cases: Dicts with at least 'target'
+        precision: Name of the precision being checked
+        reference: Returns the float32 {word: rank} ranking for (target, words)
+        quantized: Same, using the reduced-precision matrix
+    """
+    from grading import GradingKey, kendall_tau, passes, spearman
+
+    cases = []
+    for test_case in test_cases:
+        target = test_case['target']
+        exact = reference(target, words)
+        approx = quantized(target, words)
+        exact_key = GradingKey(words, exact)
+        approx_key = GradingKey(words, approx)
+        exact_ranks = exact_key.expected_ranks.astype(np.float64)
+        approx_ranks = exact_key.align(approx)
+        metrics = approx_key.score(exact)
+        reverse = exact_key.score(approx)
+        cases.append({
+            'target': target,
+            'identical_ranks': round(float((exact_ranks == approx_ranks).mean()), 4),
+            'max_rank_shift': int(np.abs(exact_ranks - approx_ranks).max()) if len(exact_ranks) else 0,
+            'spearman': round(spearman(exact_ranks, approx_ranks), 6),
+            'kendall_tau': round(kendall_tau(exact_ranks, approx_ranks), 6),
+            'top_10_overlap': len(set(exact_key.expected_top) & set(approx_key.expected_top)),
+            'float32_answer_passes': passes(metrics),
+            'quantized_answer_passes': passes(reverse),
+        })
+    return {
+        'precision': precision,
+        'test_cases': cases,
+        'grading_unchanged': all(case['float32_answer_passes'] and case['quantized_answer_passes']
+                                 for case in cases),
+        'min_spearman': min((case['spearman'] for case in cases), default=1.0),
+        'max_rank_shift': max((case['max_rank_shift'] for case in cases), default=0),
+    }
@@ -0,0 +1,593 @@
+"""
+Sandboxing for grading student code.
+
+Output capture: print() from student code is routed to a per-thread,
+size-capped buffer instead of swapping the process-global sys.stdout, so
+concurrent submissions in a threaded server never see each other's output.
+The buffer can also stream chunks to a callback while the tests run.
+
+Process pool: workers are forked after the model and embedding matrix are
+loaded, so the weights are shared copy-on-write rather than reloaded. Each
+job gets a wall-clock timeout and optional CPU-time and memory limits; a
+worker that hangs, crashes or hits a limit is killed and replaced without
+restarting the server. A job can also call retire_worker() to have its
+worker replaced once the result is sent (e.g. because it left threads
+running that would eat the next job's CPU limit).
+
+Workers are never forked from the (multithreaded) server itself: a fork
+copies every lock in whatever state another thread holds it, and a child
+that then takes that lock (stdout, the metrics registry, the encode cache)
+deadlocks. Instead a ForkServer is forked once, while the server is still
+single-threaded, and forks every worker, including the replacements for
+recycled ones.
+"""
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from multiprocessing import reduction
+from multiprocessing.connection import Connection
+from typing import Any, Callable, Dict, Iterator, Optional
+
+try:
+    import resource
+except ImportError:  # Windows: no rlimits
+    resource = None
+
+
+class SandboxError(Exception):
+    """Base class for jobs that did not finish normally"""
+
+
+class SandboxTimeout(SandboxError):
+    """The job exceeded its wall-clock timeout"""
+
+
+class SandboxCrashed(SandboxError):
+    """The worker died while running the job (e.g. CPU or memory limit)"""
+
+
+class SandboxBusy(SandboxError):
+    """No worker became free in time"""
+
+
+# Maximum characters of console output kept per submission
+OUTPUT_LIMIT = 20000
+
+
+class OutputCapture:
+    """
+    Size-capped stdout buffer for one submission.
+
+    Args:
+        limit: Maximum characters kept; the rest is dropped and a marker added
+        on_write: Optional callback receiving output chunks as they are printed
+        flush_interval: Minimum seconds between streamed chunks
+    """
+
+    TRUNCATED_MARKER = '\n... output truncated ...\n'
+
+    def __init__(self, limit: int = OUTPUT_LIMIT, on_write: Optional[Callable[[str], None]] = None,
+                 flush_interval: float = 0.05):
+        self.limit = limit
+        self.on_write = on_write
+        self.flush_interval = flush_interval
+        self.truncated = False
+        self._parts = []
+        self._size = 0
+        self._pending = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def write(self, text: str) -> int:
+        if not isinstance(text, str):
+            text = str(text)
+        with self._lock:
+            if self.truncated:
+                return len(text)
+            room = self.limit - self._size
+            kept = text[:room]
+            if len(kept) < len(text):
+                kept += self.TRUNCATED_MARKER
+                self.truncated = True
+            self._parts.append(kept)
+            self._size += len(kept)
+            if self.on_write is not None:
+                self._pending.append(kept)
+                due = time.monotonic() - self._last_flush >= self.flush_interval
+                if self.truncated or ('\n' in kept and due):
+                    self._emit()
+        return len(text)
+
+    def _emit(self) -> None:
+        chunk = ''.join(self._pending)
+        self._pending = []
+        self._last_flush = time.monotonic()
+        if chunk:
+            self.on_write(chunk)
+
+    def flush(self) -> None:
+        if self.on_write is not None:
+            with self._lock:
+                self._emit()
+
+    def getvalue(self) -> str:
+        with self._lock:
+            return ''.join(self._parts)
+
+    def isatty(self) -> bool:
+        return False
+
+
+class _StdoutRouter:
+    """sys.stdout replacement that sends writes to the current thread's capture"""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._local = threading.local()
+
+    def current(self) -> Optional[OutputCapture]:
+        return getattr(self._local, 'capture', None)
+
+    def set(self, capture: Optional[OutputCapture]) -> None:
+        self._local.capture = capture
+
+    def write(self, text):
+        capture = self.current()
+        if capture is not None:
+            return capture.write(text)
+        return self._stream.write(text)
+
+    def flush(self):
+        capture = self.current()
+        if capture is not None:
+            return capture.flush()
+        return self._stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+def install_stdout_router() -> _StdoutRouter:
+    """Wrap sys.stdout once so captures can be set per thread"""
+    if not isinstance(sys.stdout, _StdoutRouter):
+        sys.stdout = _StdoutRouter(sys.stdout)
+    return sys.stdout
+
+
+@contextmanager
+def capture_output(limit: int = OUTPUT_LIMIT,
+                   on_write: Optional[Callable[[str], None]] = None) -> Iterator[OutputCapture]:
+    """Capture print() output of the current thread into an OutputCapture"""
+    router = install_stdout_router()
+    capture = OutputCapture(limit, on_write)
+    previous = router.current()
+    router.set(capture)
+    try:
+        yield capture
+    finally:
+        router.set(previous)
+        capture.flush()
+
+
+def bind_capture(func: Callable, capture: Optional[OutputCapture] = None) -> Callable:
+    """
+    Wrap func so that, in whatever thread it runs, print() goes to capture.
+
+    Defaults to the calling thread's current capture, so work handed to a
+    thread pool still lands in the submission's console output.
+    """
+    router = install_stdout_router()
+    if capture is None:
+        capture = router.current()
+
+    def run(*args, **kwargs):
+        previous = router.current()
+        router.set(capture)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            router.set(previous)
+
+    return run
+
+
+def fork_available() -> bool:
+    """True when worker processes can be forked (Linux, macOS)"""
+    return 'fork' in multiprocessing.get_all_start_methods()
+
+
+def _cpu_seconds_used() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _vm_size_bytes() -> int:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[0]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return 0
+
+
+def _apply_memory_limit(memory_mb: Optional[int]) -> None:
+    # RLIMIT_AS counts address space, so allow memory_mb on top of what the
+    # forked worker already maps (model weights, numpy, torch arenas)
+    if resource is None or not memory_mb:
+        return
+    base = _vm_size_bytes()
+    if not base:
+        return
+    limit = base + memory_mb * 1024 * 1024
+    try:
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    except (ValueError, OSError):
+        pass
+
+
+def _apply_cpu_limit(cpu_seconds: Optional[int]) -> None:
+    # RLIMIT_CPU is cumulative for the process, so it is re-armed per job;
+    # exceeding it delivers SIGXCPU, which terminates the worker
+    if resource is None or not cpu_seconds:
+        return
+    limit = int(_cpu_seconds_used()) + 1 + cpu_seconds
+    try:
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_CPU, (limit, hard))
+    except (ValueError, OSError):
+        pass
+
+
+# Set by retire_worker() during a job; reset before the next one
+_retire_requested = False
+
+
+def retire_worker() -> None:
+    """Have the pool replace the current worker after this job (no-op outside a worker)"""
+    global _retire_requested
+    _retire_requested = True
+
+
+def _worker_main(conn, handler: Callable[[Any], Any], initializer: Optional[Callable[[], None]],
+                 cpu_seconds: Optional[int], memory_mb: Optional[int]) -> None:
+    global _retire_requested
+    if initializer is not None:
+        initializer()
+    _apply_memory_limit(memory_mb)
+    # Connection.send is not thread-safe and events come from every test-case
+    # thread, so all sends (events and results) go through one lock
+    send_lock = threading.Lock()
+
+    def send(message) -> None:
+        with send_lock:
+            conn.send(message)
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        if message is None:
+            break
+        job_handler, job = message
+        _apply_cpu_limit(cpu_seconds)
+        _retire_requested = False
+        try:
+            result = ('ok', (job_handler or handler)(job, emit=lambda event: send(('event', event))))
+        except BaseException as e:  # SystemExit from student code included
+            result = ('error', f'{type(e).__name__}: {e}')
+        if _retire_requested:
+            result = ('retire', result)
+        try:
+            send(result)
+        except (EOFError, OSError):
+            break
+        if _retire_requested:
+            break
+
+
+def _run_forked_worker(server_conn, fd: int, args: tuple) -> None:
+    """Body of a worker forked by the fork server; never returns"""
+    code = 0
+    try:
+        server_conn.close()
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        _worker_main(Connection(fd), *args)
+    except BaseException:
+        code = 1
+    finally:
+        for stream in (sys.stdout, sys.stderr):
+            try:
+                stream.flush()
+            except Exception:
+                pass
+        os._exit(code)
+
+
+def _fork_server_main(conn, server_end, prepare: Optional[Callable[[], None]]) -> None:
+    # Inherited from the fork; holding it open would hide the server's exit
+    server_end.close()
+    # Ctrl-C reaches the whole process group; the server shuts this process down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    running = set()
+    # pid -> exit code, for workers that exited but were not asked about yet
+    exited: Dict[int, int] = {}
+    try:
+        if prepare is not None:
+            try:
+                prepare()
+            except Exception as e:
+                print(f"⚠  Fork server preparation failed: {type(e).__name__}: {e}")
+        while True:
+            try:
+                kind, value = conn.recv()
+            except (EOFError, OSError):
+                break
+            if kind == 'spawn':
+                fd = reduction.recv_handle(conn)
+                pid = os.fork()
+                if pid == 0:
+                    _run_forked_worker(conn, fd, value)
+                os.close(fd)
+                running.add(pid)
+                conn.send(pid)
+            elif kind == 'status':
+                if value in running:
+                    try:
+                        done, status = os.waitpid(value, os.WNOHANG)
+                    except ChildProcessError:
+                        done, status = value, 0
+                    if done:
+                        running.discard(value)
+                        exited[value] = os.waitstatus_to_exitcode(status)
+                # Reported once; the caller remembers it
+                conn.send(exited.pop(value, None))
+    finally:
+        # The server is gone: stop its workers too, even ones stuck in a job
+        for pid in running:
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except OSError:
+                pass
+
+
+class ForkServer:
+    """
+    Helper process that forks the grading workers.
+
+    Create it while the calling process is still single-threaded (before
+    request, warm-up or batch-scheduler threads start); it stays
+    single-threaded, so its forks never inherit a lock held by another thread.
+
+    Args:
+        prepare: Called once in the fork server before it forks any worker,
+            e.g. to load the model when the server itself loads it in a
+            background thread
+    """
+
+    def __init__(self, prepare: Optional[Callable[[], None]] = None):
+        ctx = multiprocessing.get_context('fork')
+        self._conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_fork_server_main, args=(child_conn, self._conn, prepare),
+                                   name='fork-server', daemon=True)
+        self.process.start()
+        child_conn.close()
+        self._lock = threading.Lock()
+
+    def _request(self, kind: str, value: Any, handle: Optional[int] = None) -> Any:
+        try:
+            with self._lock:
+                self._conn.send((kind, value))
+                if handle is not None:
+                    reduction.send_handle(self._conn, handle, self.process.pid)
+                return self._conn.recv()
+        except (EOFError, OSError):
+            raise SandboxCrashed('The grading fork server has exited')
+
+    def spawn(self, conn, args: tuple) -> '_ForkedProcess':
+        """Fork a worker running _worker_main(conn, *args); conn can be closed afterwards"""
+        return _ForkedProcess(self, self._request('spawn', args, conn.fileno()))
+
+    def status(self, pid: int) -> Optional[int]:
+        """Exit code of a worker that has exited since the last call, else None"""
+        return self._request('status', pid)
+
+    def close(self) -> None:
+        """Stop the fork server and any workers it still has"""
+        self._conn.close()
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(timeout=1)
+
+
+class _ForkedProcess:
+    """The part of multiprocessing.Process the pool uses, for a fork-server worker"""
+
+    def __init__(self, server: ForkServer, pid: int):
+        self.server = server
+        self.pid = pid
+        self.exitcode = None
+
+    def is_alive(self) -> bool:
+        if self.exitcode is None:
+            self.exitcode = self.server.status(self.pid)
+        return self.exitcode is None
+
+    def kill(self) -> None:
+        # Not reaped yet (exitcode unknown), so the pid cannot have been reused
+        if self.exitcode is None:
+            try:
+                os.kill(self.pid, signal.SIGKILL)
+            except OSError:
+                pass
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.is_alive() and (deadline is None or time.monotonic() < deadline):
+            time.sleep(0.01)
+
+
+class _Worker:
+    __slots__ = ('process', 'conn')
+
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+
+
+class GradingPool:
+    """
+    Pool of pre-forked worker processes that run ``handler(job, emit=...)``.
+
+    Args:
+        handler: Function run in the worker; its return value must be picklable.
+            It may call ``emit(event)`` to stream picklable progress events.
+        size: Number of worker processes
+        timeout: Wall-clock seconds allowed per job
+        cpu_seconds: CPU-time limit per job (None = unlimited)
+        memory_mb: Extra address space a worker may allocate (None = unlimited)
+        initializer: Called once in each worker after it is forked
+        queue_timeout: Seconds to wait for a free worker before SandboxBusy
+        fork_server: Forks the workers; by default one is started here, so the
+            pool must then be created while the process is single-threaded
+    """
+
+    def __init__(self, handler: Callable[[Any], Any], size: int = 2, timeout: float = 10.0,
+                 cpu_seconds: Optional[int] = None, memory_mb: Optional[int] = None,
+                 initializer: Optional[Callable[[], None]] = None, queue_timeout: float = 30.0,
+                 fork_server: Optional[ForkServer] = None):
+        self.handler = handler
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.initializer = initializer
+        self.queue_timeout = queue_timeout
+        self._own_fork_server = fork_server is None
+        self._fork_server = fork_server if fork_server is not None else ForkServer()
+        self._idle: 'queue.Queue[_Worker]' = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self.recycled = 0
+        for _ in range(self.size):
+            self._idle.put(self._spawn())
+
+    def _spawn(self) -> _Worker:
+        parent_conn, child_conn = multiprocessing.Pipe()
+        try:
+            process = self._fork_server.spawn(
+                child_conn, (self.handler, self.initializer, self.cpu_seconds, self.memory_mb))
+        except SandboxError:
+            parent_conn.close()
+            raise
+        finally:
+            child_conn.close()
+        return _Worker(process, parent_conn)
+
+    def _recycle(self, worker: _Worker) -> None:
+        if worker.process.is_alive():
+            worker.process.kill()
+        worker.process.join(timeout=5)
+        worker.conn.close()
+        with self._lock:
+            self.recycled += 1
+            if self._closed:
+                return
+        self._idle.put(self._spawn())
+
+    def run(self, job: Any, on_event: Optional[Callable[[Any], None]] = None,
+            handler: Optional[Callable[[Any], Any]] = None, timeout: Optional[float] = None) -> Any:
+        """
+        Run one job on a free worker and return the handler's result.
+
+        Events emitted by the handler are passed to on_event as they arrive.
+        handler replaces the pool's handler for this job (a module-level
+        function, since it is pickled by reference) and timeout its wall-clock
+        limit.
+
+        Raises:
+            SandboxBusy: No worker was free within queue_timeout
+            SandboxTimeout: The job ran longer than timeout (worker recycled)
+            SandboxCrashed: The worker died or the handler raised (worker recycled
+                if it died)
+
+        A worker whose job called retire_worker() is recycled after its result
+        is returned.
+        """
+        try:
+            worker = self._idle.get(timeout=self.queue_timeout)
+        except queue.Empty:
+            raise SandboxBusy('All grading workers are busy, please try again')
+
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        try:
+            worker.conn.send((handler, job))
+            while True:
+                if not worker.conn.poll(max(0.0, deadline - time.monotonic())):
+                    self._recycle(worker)
+                    raise SandboxTimeout(f'Code took longer than {timeout:g} seconds and was stopped')
+                kind, value = worker.conn.recv()
+                if kind != 'event':
+                    break
+                if on_event is not None:
+                    on_event(value)
+        except (EOFError, OSError):
+            worker.process.join(timeout=1)
+            exitcode = worker.process.exitcode
+            self._recycle(worker)
+            raise SandboxCrashed(_describe_exit(exitcode))
+
+        if kind == 'retire':
+            # The job asked for a fresh worker (e.g. it left threads running)
+            self._recycle(worker)
+            kind, value = value
+        else:
+            self._idle.put(worker)
+        if kind == 'error':
+            raise SandboxCrashed(value)
+        return value
+
+    def close(self) -> None:
+        """Stop all idle workers"""
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                worker.conn.send(None)
+            except (EOFError, OSError):
+                pass
+            worker.process.join(timeout=1)
+            if worker.process.is_alive():
+                worker.process.kill()
+            worker.conn.close()
+        if self._own_fork_server:
+            self._fork_server.close()
+
+
+def _describe_exit(exitcode: Optional[int]) -> str:
+    if exitcode is not None and exitcode < 0:
+        sig = -exitcode
+        if sig == getattr(signal, 'SIGXCPU', None):
+            return 'CPU time limit exceeded'
+        if sig == getattr(signal, 'SIGKILL', None):
+            return 'Worker was killed (memory limit exceeded?)'
+        return f'Worker was terminated by signal {sig}'
+    return 'Worker process crashed'
@@ -0,0 +1,123 @@
+"""
+Multi-process server for the word similarity platform.
+
+The parent process imports word_game, which loads the model and builds the
+embedding matrix, expected answers and game rank tables once. share_state()
+then moves the large arrays into a shared-memory block, and the parent forks
+SERVER_WORKERS processes that all accept connections on one listening
+socket. Workers map the shared arrays read-only and share the model weights
+copy-on-write, so each extra worker costs little more than its own Python
+heap. A worker that dies is replaced.
+
+Hot/cold game sessions live in a session-server process that every worker
+talks to, so a player can be served by any worker. The result cache is kept
+per worker (a repeated submission may be graded again by another worker).
+
+    python serve.py --workers 4 --port 5000
+"""
+import argparse
+import atexit
+import gc
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+from multiprocessing.connection import wait
+
+
+def _serve(sock: socket.socket, threaded: bool, sessions: tuple) -> None:
+    from werkzeug.serving import make_server
+    from sessions import SessionStoreClient
+    import word_game
+
+    word_game.game_sessions = SessionStoreClient(*sessions)
+    # Each worker grades in its own sandbox pool (GRADING_WORKERS per server worker)
+    word_game.start_grading_pool()
+    server = make_server(*sock.getsockname()[:2], word_game.app, threaded=threaded, fd=sock.fileno())
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        server.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default=os.environ.get('HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 5000)))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('SERVER_WORKERS', os.cpu_count() or 1)))
+    parser.add_argument('--no-threads', action='store_true', help='Serve one request at a time per worker')
+    args = parser.parse_args()
+
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        sys.exit('serve.py needs fork() (Linux or macOS); run word_game.py instead')
+    workers = max(1, args.workers)
+    # Split the grading sandboxes between the server workers unless configured
+    os.environ.setdefault('GRADING_WORKERS', str(max(1, (os.cpu_count() or 1) // workers)))
+
+    import word_game
+    if word_game._warm_up_state['state'] == 'idle':
+        word_game.warm_up()
+    if word_game._warm_up_state['state'] != 'ready':
+        sys.exit(f"Warm-up failed: {word_game._warm_up_state['error']}")
+    word_game.share_state()
+    # The session server takes over the (restored) sessions and their snapshots;
+    # it is forked before the listening socket exists
+    from sessions import SessionServer
+    session_server = SessionServer(word_game.game_sessions)
+    session_server.start()
+    atexit.unregister(word_game.game_sessions.snapshot)
+    sessions = (session_server.address, session_server.authkey)
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(128)
+
+    # Objects created so far are never collected, so the garbage collector does
+    # not write to (and un-share) their pages in the workers
+    gc.freeze()
+    ctx = multiprocessing.get_context('fork')
+
+
+    def spawn():
+        # Not daemonic: workers fork their own grading sandboxes
+        process = ctx.Process(target=_serve, args=(sock, not args.no_threads, sessions))
+        process.start()
+        return process
+
+    processes = [spawn() for _ in range(workers)]
+    print(f"✓ Serving on http://{args.host}:{args.port} with {workers} worker processes "
+          f"(pids {', '.join(str(p.pid) for p in processes)})")
+
+    stopping = []
+
+    def stop(*_):
+        stopping.append(True)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    try:
+        while not stopping:
+            wait([p.sentinel for p in processes], timeout=1.0)
+            for i, process in enumerate(processes):
+                if not process.is_alive() and not stopping:
+                    print(f"⚠  Worker {process.pid} exited with code {process.exitcode}; restarting")
+                    time.sleep(1.0)
+                    processes[i] = spawn()
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.kill()
+        session_server.close()
+        sock.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,393 @@
+"""
+Bounded, TTL-evicting store for hot/cold game sessions.
+
+Each player gets a small __slots__ record (target, guess history, attempt
+count and any custom code they loaded). The store evicts idle sessions after
+a TTL and least-recently-used sessions when either the session count or the
+estimated memory footprint passes its cap, and can snapshot itself to a
+local JSON file so sessions survive a restart.
+
+SessionServer serves one store from a process of its own so that several
+server processes (serve.py) share it through SessionStoreClient.
+"""
+import json
+import multiprocessing
+import os
+import secrets
+import signal
+import threading
+import time
+from collections import OrderedDict
+from multiprocessing.managers import BaseManager
+from typing import Dict, List, Optional, Tuple
+
+# Rough per-object costs used for the memory cap (CPython, 64-bit)
+_SESSION_OVERHEAD = 400
+_GUESS_OVERHEAD = 120
+
+
+class GameSession:
+    """One player's hot/cold state"""
+
+    __slots__ = ('session_id', 'target', 'guesses', 'attempts', 'similarity_code',
+                 'filter_code', 'last_seen', 'size')
+
+    def __init__(self, session_id: str, target: str):
+        self.session_id = session_id
+        self.target = target
+        # (word, similarity, rank) tuples, newest last, capped by the store
+        self.guesses: List[Tuple[str, float, int]] = []
+        self.attempts = 0
+        self.similarity_code: Optional[str] = None
+        self.filter_code: Optional[str] = None
+        self.last_seen = time.monotonic()
+        self.size = 0
+
+    def estimate_size(self) -> int:
+        size = _SESSION_OVERHEAD + len(self.session_id) + len(self.target)
+        size += len(self.similarity_code or '') + len(self.filter_code or '')
+        size += sum(_GUESS_OVERHEAD + len(word) for word, _, _ in self.guesses)
+        return size
+
+    def reset(self, target: str) -> None:
+        self.target = target
+        self.guesses = []
+        self.attempts = 0
+
+    def to_dict(self) -> Dict:
+        return {
+            'session_id': self.session_id,
+            'target': self.target,
+            'guesses': self.guesses,
+            'attempts': self.attempts,
+            'similarity_code': self.similarity_code,
+            'filter_code': self.filter_code,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'GameSession':
+        session = cls(data['session_id'], data['target'])
+        session.guesses = [tuple(guess) for guess in data.get('guesses', [])]
+        session.attempts = data.get('attempts', len(session.guesses))
+        session.similarity_code = data.get('similarity_code')
+        session.filter_code = data.get('filter_code')
+        return session
+
+
+class SessionStore:
+    """
+    LRU + TTL session store with a hard memory cap.
+
+    Args:
+        max_sessions: Maximum number of live sessions
+        ttl_seconds: Sessions idle longer than this are dropped
+        max_bytes: Cap on the estimated memory used by all sessions
+        max_history: Guesses kept per session (older ones are dropped)
+        snapshot_path: Optional JSON file used by snapshot() / restore()
+    """
+
+    def __init__(self, max_sessions: int = 10000, ttl_seconds: float = 3600,
+                 max_bytes: int = 32 * 1024 * 1024, max_history: int = 200,
+                 snapshot_path: Optional[str] = None):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.max_history = max_history
+        self.snapshot_path = snapshot_path
+        self._sessions: 'OrderedDict[str, GameSession]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._snapshot_thread = None
+        self.created = 0
+        self.expired = 0
+        self.evicted_lru = 0
+        self.evicted_memory = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _drop(self, session_id: str) -> None:
+        session = self._sessions.pop(session_id)
+        self._bytes -= session.size
+
+    def _expire(self, now: float) -> None:
+        # The OrderedDict is in last_seen order, so expired sessions are at the front
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_seen <= self.ttl_seconds:
+                break
+            self._drop(session_id)
+            self.expired += 1
+
+    def _enforce_caps(self) -> None:
+        while len(self._sessions) > self.max_sessions:
+            self._drop(next(iter(self._sessions)))
+            self.evicted_lru += 1
+        while self._bytes > self.max_bytes and len(self._sessions) > 1:
+            self._drop(next(iter(self._sessions)))
+            self.evicted_memory += 1
+
+    def get(self, session_id: Optional[str]) -> Optional[GameSession]:
+        """Return a live session and mark it as recently used"""
+        if not session_id:
+            return None
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.last_seen = now
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def create(self, target: str) -> GameSession:
+        """Start a new session with a fresh random id"""
+        session = GameSession(secrets.token_urlsafe(16), target)
+        with self._lock:
+            self.created += 1
+            self._insert(session)
+        return session
+
+    def get_or_create(self, session_id: Optional[str], target: str) -> GameSession:
+        return self.get(session_id) or self.create(target)
+
+    def _insert(self, session: GameSession) -> None:
+        session.size = session.estimate_size()
+        self._sessions[session.session_id] = session
+        self._sessions.move_to_end(session.session_id)
+        self._bytes += session.size
+        self._enforce_caps()
+
+    def reset(self, session: GameSession, target: Optional[str] = None, **code: Optional[str]) -> None:
+        """
+        Start a new round: target (default: the current one), no guesses, and
+        similarity_code / filter_code replaced when given.
+        """
+        unknown = set(code) - {'similarity_code', 'filter_code'}
+        if unknown:
+            raise TypeError(f'Unknown session fields: {sorted(unknown)}')
+        with self._lock:
+            # A copy of a stored session (e.g. from SessionStoreClient) changes the stored one
+            session = self._sessions.get(session.session_id, session)
+            for name, value in code.items():
+                setattr(session, name, value)
+            session.reset(session.target if target is None else target)
+            self.update(session)
+
+    def record_guess(self, session: GameSession, word: str, similarity: float, rank: int,
+                     target: Optional[str] = None) -> bool:
+        """
+        Append a guess, keeping at most max_history entries.
+
+        With target, the guess is dropped (returns False) if the session has
+        moved on to another target since it was scored.
+        """
+        with self._lock:
+            session = self._sessions.get(session.session_id, session)
+            if target is not None and session.target != target:
+                return False
+            session.attempts += 1
+            session.guesses.append((word, similarity, rank))
+            if len(session.guesses) > self.max_history:
+                del session.guesses[:len(session.guesses) - self.max_history]
+            self.update(session)
+            return True
+
+    def update(self, session: GameSession) -> None:
+        """Re-measure a session after it was changed"""
+        with self._lock:
+            if session.session_id not in self._sessions:
+                return
+            new_size = session.estimate_size()
+            self._bytes += new_size - session.size
+            session.size = new_size
+            self._enforce_caps()
+
+    def stats(self) -> Dict:
+        """Current size and eviction counters"""
+        with self._lock:
+            self._expire(time.monotonic())
+            return {
+                'sessions': len(self._sessions),
+                'max_sessions': self.max_sessions,
+                'estimated_bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl_seconds,
+                'created': self.created,
+                'expired': self.expired,
+                'evicted_lru': self.evicted_lru,
+                'evicted_memory': self.evicted_memory,
+            }
+
+    def snapshot(self) -> int:
+        """Write all live sessions to snapshot_path; returns the number saved"""
+        if not self.snapshot_path:
+            return 0
+        with self._lock:
+            self._expire(time.monotonic())
+            records = [session.to_dict() for session in self._sessions.values()]
+        directory = os.path.dirname(os.path.abspath(self.snapshot_path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f'{self.snapshot_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': 1, 'sessions': records}, f)
+        os.replace(tmp_path, self.snapshot_path)
+        return len(records)
+
+    def restore(self) -> int:
+        """Load sessions from snapshot_path (restored sessions start a fresh TTL)"""
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return 0
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            records = data.get('sessions', []) if data.get('version') == 1 else []
+        except (OSError, ValueError):
+            return 0
+        with self._lock:
+            for record in records:
+                try:
+                    self._insert(GameSession.from_dict(record))
+                except (KeyError, TypeError):
+                    continue
+            return len(self._sessions)
+
+    def start_snapshots(self, interval: float = 60.0) -> None:
+        """Snapshot in a background thread every interval seconds (started once)"""
+        if not self.snapshot_path or self._snapshot_thread is not None:
+            return
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.snapshot()
+                except OSError as e:
+                    print(f"⚠  Could not snapshot game sessions: {e}")
+
+        with self._lock:
+            if self._snapshot_thread is not None:
+                return
+            self._snapshot_thread = threading.Thread(target=loop, name='session-snapshots', daemon=True)
+        self._snapshot_thread.start()
+
+
+# The store served by SessionServer, inherited by its forked manager process
+_served_store: Optional[SessionStore] = None
+
+
+def _get_served_store() -> SessionStore:
+    return _served_store
+
+
+def _init_session_server() -> None:
+    # Ctrl+C stops the server processes; this one is shut down after them
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _served_store.start_snapshots()
+
+
+class _SessionManager(BaseManager):
+    pass
+
+
+_SessionManager.register('store', callable=_get_served_store, exposed=(
+    'get', 'create', 'get_or_create', 'reset', 'record_guess', 'stats', 'snapshot'))
+
+
+class SessionServer:
+    """
+    Serves a SessionStore to other processes (see SessionStoreClient).
+
+    start() forks a process that takes over the store, including any
+    sessions already restored into it, and runs its snapshots. The store
+    must not be used in this process afterwards.
+
+    Args:
+        store: The store to serve
+    """
+
+    def __init__(self, store: SessionStore):
+        self.store = store
+        self.authkey = secrets.token_bytes(32)
+        self.address = None
+        self._manager: Optional[_SessionManager] = None
+
+    def start(self) -> None:
+        global _served_store
+        _served_store = self.store
+        self._manager = _SessionManager(authkey=self.authkey, ctx=multiprocessing.get_context('fork'))
+        self._manager.start(initializer=_init_session_server)
+        self.address = self._manager.address
+
+    def client(self) -> 'SessionStoreClient':
+        return SessionStoreClient(self.address, self.authkey)
+
+    def close(self) -> None:
+        """Snapshot the served store (when it has a snapshot_path) and stop the server"""
+        if self._manager is None:
+            return
+        try:
+            self.client().snapshot()
+        except (OSError, EOFError) as e:
+            print(f"⚠  Could not snapshot game sessions: {e}")
+        finally:
+            self._manager.shutdown()
+            self._manager = None
+
+
+class SessionStoreClient:
+    """
+    SessionStore API for a store served by a SessionServer.
+
+    Sessions are returned as copies; reset() and record_guess() change the
+    served session and then refresh the copy they were given. Usable from
+    several threads at once.
+
+    Args:
+        address: SessionServer.address
+        authkey: SessionServer.authkey
+    """
+
+    def __init__(self, address, authkey: bytes):
+        manager = _SessionManager(address=address, authkey=authkey)
+        manager.connect()
+        self._store = manager.store()
+        self.ttl_seconds = self._store.stats()['ttl_seconds']
+
+    def __len__(self) -> int:
+        return self.stats()['sessions']
+
+    def _refresh(self, session: GameSession) -> None:
+        fresh = self._store.get(session.session_id)
+        if fresh is not None:
+            for name in GameSession.__slots__:
+                setattr(session, name, getattr(fresh, name))
+
+    def get(self, session_id: Optional[str]) -> Optional[GameSession]:
+        return self._store.get(session_id)
+
+    def create(self, target: str) -> GameSession:
+        return self._store.create(target)
+
+    def get_or_create(self, session_id: Optional[str], target: str) -> GameSession:
+        return self._store.get_or_create(session_id, target)
+
+    def reset(self, session: GameSession, target: Optional[str] = None, **code: Optional[str]) -> None:
+        self._store.reset(session, target, **code)
+        self._refresh(session)
+
+    def record_guess(self, session: GameSession, word: str, similarity: float, rank: int,
+                     target: Optional[str] = None) -> bool:
+        recorded = self._store.record_guess(session, word, similarity, rank, target)
+        if recorded:
+            self._refresh(session)
+        return recorded
+
+    def stats(self) -> Dict:
+        return self._store.stats()
+
+    def snapshot(self) -> int:
+        return self._store.snapshot()
+
+    def start_snapshots(self, interval: float = 60.0) -> None:
+        """Nothing to do: the SessionServer process takes the snapshots"""
@@ -0,0 +1,107 @@
+"""
+Read-only NumPy arrays shared between server processes.
+
+SharedArrays packs named arrays into a single multiprocessing.shared_memory
+block. publish() copies them in once (in the parent) and hands back
+read-only views backed by the block, so the private copies can be dropped
+before forking: every forked worker then maps the same physical pages
+instead of carrying its own copy, and cannot write to them.
+
+Arrays that are already memory-mapped from a file (the embedding cache) are
+shared through the page cache and should not be copied in again; see
+file_backed().
+"""
+from multiprocessing import shared_memory
+from typing import Dict, Iterator, Mapping, Optional
+
+import numpy as np
+
+# Every array starts on a cache-line boundary
+_ALIGN = 64
+# Closed blocks whose views were still in use
+_still_mapped = []
+
+
+def file_backed(array: np.ndarray) -> bool:
+    """True if array is (a view of) a file memory map, so already shared between processes"""
+    while array is not None:
+        if isinstance(array, np.memmap):
+            return True
+        array = array.base if isinstance(array.base, np.ndarray) else None
+    return False
+
+
+class SharedArrays:
+    """
+    Named read-only arrays in one shared-memory block.
+
+    Args:
+        block: The SharedMemory segment holding the data
+        layout: name -> (offset, dtype string, shape)
+        owner: Whether this process created the block (and removes it on close)
+    """
+
+    def __init__(self, block: shared_memory.SharedMemory, layout: Dict[str, tuple], owner: bool = False):
+        self.block = block
+        self.layout = layout
+        self.owner = owner
+        self._views: Dict[str, np.ndarray] = {}
+        for name, (offset, dtype, shape) in layout.items():
+            count = int(np.prod(shape))
+            if count:
+                # frombuffer holds an export of the buffer, so the block cannot be
+                # unmapped under a view that is still referenced
+                view = np.frombuffer(block.buf, dtype=np.dtype(dtype), count=count, offset=offset).reshape(shape)
+            else:
+                view = np.empty(shape, dtype=np.dtype(dtype))
+            view.flags.writeable = False
+            self._views[name] = view
+
+    @classmethod
+    def publish(cls, arrays: Mapping[str, np.ndarray], name: Optional[str] = None) -> 'SharedArrays':
+        """Copy arrays into a new shared-memory block and return read-only views of them"""
+        layout = {}
+        size = 0
+        for key, array in arrays.items():
+            array = np.asarray(array)
+            size = -(-size // _ALIGN) * _ALIGN
+            layout[key] = (size, array.dtype.str, array.shape)
+            size += array.nbytes
+        block = shared_memory.SharedMemory(name=name, create=True, size=max(1, size))
+        for key, array in arrays.items():
+            offset, dtype, shape = layout[key]
+            target = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf, offset=offset)
+            target[...] = array
+            del target
+        return cls(block, layout, owner=True)
+
+    @property
+    def nbytes(self) -> int:
+        return self.block.size
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self._views[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._views
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._views)
+
+    def __len__(self) -> int:
+        return len(self._views)
+
+    def close(self) -> None:
+        """Unmap the block (and remove it if this process published it)"""
+        if self.owner:
+            try:
+                self.block.unlink()
+            except FileNotFoundError:
+                pass
+        self._views.clear()
+        try:
+            self.block.close()
+        except BufferError:
+            # Views are still referenced elsewhere; the mapping goes away with the
+            # process, and the block is kept so its __del__ does not retry the close
+            _still_mapped.append(self.block)
@@ -0,0 +1,181 @@
+"""
+Precomputed target x vocabulary similarity and rank table for the hot/cold game.
+
+For every target the index keeps the similarity of each vocabulary word,
+the words pre-sorted by similarity and each word's rank, so checking a guess
+is a dictionary lookup plus an array index and listing the ranking returns a
+cached, already-sorted list.
+"""
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from quantization import CompactMatrix
+
+# Bytes per vocabulary word in one target row (similarities, order, ranks, sorted copy)
+_ROW_BYTES_PER_WORD = 4 + 8 + 4 + 4
+
+
+class _TargetRow:
+    __slots__ = ('similarities', 'order', 'ranks', 'sorted_desc', 'ranked_words')
+
+    def __init__(self, similarities: np.ndarray):
+        self.similarities = np.asarray(similarities, dtype=np.float32)
+        self.order = np.argsort(-self.similarities, kind='stable')
+        self.ranks = np.empty(len(self.order), dtype=np.int32)
+        self.ranks[self.order] = np.arange(1, len(self.order) + 1, dtype=np.int32)
+        # Sorted copy for binary search of out-of-vocabulary guesses
+        self.sorted_desc = self.similarities[self.order]
+        self.ranked_words = None
+
+    @classmethod
+    def from_arrays(cls, similarities: np.ndarray, order: np.ndarray, ranks: np.ndarray,
+                    sorted_desc: np.ndarray) -> '_TargetRow':
+        """Row over already computed arrays (e.g. read-only shared-memory views)"""
+        row = cls.__new__(cls)
+        row.similarities = similarities
+        row.order = order
+        row.ranks = ranks
+        row.sorted_desc = sorted_desc
+        row.ranked_words = None
+        return row
+
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        return self.similarities, self.order, self.ranks, self.sorted_desc
+
+
+class SimilarityIndex:
+    """
+    Similarity / rank table over a fixed vocabulary.
+
+    Args:
+        words: Vocabulary (deduplicated, order preserved)
+        row_fn: Returns similarities of target to every vocabulary word
+        pair_fn: Returns the similarity of one guess to a target (used for
+            guesses outside the vocabulary)
+        block_fn: Optional fast path returning a (len(targets), V) matrix for
+            many targets at once, used by precompute()
+        max_targets: Maximum number of target rows kept (LRU eviction)
+        max_bytes: Optional memory budget for the rows; lowers max_targets for
+            large vocabularies
+    """
+
+    def __init__(self, words: Iterable[str], row_fn: Callable[[str], np.ndarray],
+                 pair_fn: Callable[[str, str], float],
+                 block_fn: Optional[Callable[[List[str]], np.ndarray]] = None,
+                 max_targets: int = 4096, max_bytes: Optional[int] = None):
+        self.words: List[str] = list(dict.fromkeys(words))
+        self.index: Dict[str, int] = {word: i for i, word in enumerate(self.words)}
+        self.row_fn = row_fn
+        self.pair_fn = pair_fn
+        self.block_fn = block_fn
+        if max_bytes is not None:
+            max_targets = min(max_targets, max(1, max_bytes // (_ROW_BYTES_PER_WORD * max(1, len(self.words)))))
+        self.max_targets = max_targets
+        # Vocabulary embedding matrix (row i = words[i]) when built from a store
+        self.vectors: Optional[np.ndarray] = None
+        self._rows: 'OrderedDict[str, _TargetRow]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_store(cls, store, words: Optional[Iterable[str]] = None, **kwargs) -> 'SimilarityIndex':
+        """Build an index backed by an EmbeddingStore (defaults to its whole vocabulary)"""
+        words = list(dict.fromkeys(words if words is not None else store.words))
+        vocab_rows = store.rows(words)
+        # The vocabulary usually leads the store, so a view (no copy) of the
+        # possibly memory-mapped matrix is enough
+        if np.array_equal(vocab_rows, np.arange(len(words))):
+            vocab_matrix = store.matrix[:len(words)]
+        elif isinstance(store.matrix, CompactMatrix):
+            vocab_matrix = store.matrix.take(vocab_rows)
+        else:
+            vocab_matrix = store.matrix[vocab_rows]
+
+        # index.vectors is read at call time, so it can be swapped for a shared copy
+        def row_fn(target):
+            return index.vectors @ store.vector(target)
+
+        def block_fn(targets):
+            # store.vector() keeps unknown targets out of the (possibly memory-mapped) matrix
+            # vectors may be a quantized CompactMatrix, so it stays on the left
+            return (index.vectors @ np.stack([store.vector(target) for target in targets]).T).T
+
+        def pair_fn(target, guess):
+            return float(store.vector(target) @ store.vector(guess))
+
+        index = cls(words, row_fn, pair_fn, block_fn=block_fn, **kwargs)
+        index.vectors = vocab_matrix
+        return index
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def _put(self, target: str, row: _TargetRow) -> None:
+        self._rows[target] = row
+        self._rows.move_to_end(target)
+        while len(self._rows) > self.max_targets:
+            self._rows.popitem(last=False)
+
+    def precompute(self, targets: Iterable[str], chunk_size: int = 1024) -> None:
+        """Fill the table for many targets at once (one matrix product per chunk when possible)"""
+        targets = [target for target in dict.fromkeys(targets) if target not in self._rows]
+        for start in range(0, len(targets), chunk_size):
+            chunk = targets[start:start + chunk_size]
+            if self.block_fn is not None:
+                block = np.asarray(self.block_fn(chunk))
+                rows = [_TargetRow(block[i]) for i in range(len(chunk))]
+            else:
+                rows = [_TargetRow(self.row_fn(target)) for target in chunk]
+            with self._lock:
+                for target, row in zip(chunk, rows):
+                    self._put(target, row)
+
+    def row_arrays(self) -> Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+        """target -> (similarities, order, ranks, sorted_desc) for every precomputed row"""
+        with self._lock:
+            return {target: row.arrays() for target, row in self._rows.items()}
+
+    def replace_rows(self, rows: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]) -> None:
+        """Swap precomputed rows for equal arrays stored elsewhere (such as shared memory)"""
+        with self._lock:
+            for target, arrays in rows.items():
+                if target in self._rows:
+                    self._rows[target] = _TargetRow.from_arrays(*arrays)
+
+    def _row(self, target: str) -> _TargetRow:
+        with self._lock:
+            row = self._rows.get(target)
+            if row is not None:
+                self._rows.move_to_end(target)
+                return row
+        row = _TargetRow(self.row_fn(target))
+        with self._lock:
+            self._put(target, row)
+        return row
+
+    def lookup(self, target: str, guess: str) -> Tuple[float, int]:
+        """
+        Similarity and rank of guess for target.
+
+        Vocabulary words are O(1) table lookups; other guesses are scored once
+        and ranked by binary search over the pre-sorted similarities.
+        """
+        row = self._row(target)
+        position = self.index.get(guess)
+        if position is not None:
+            return float(row.similarities[position]), int(row.ranks[position])
+        similarity = float(self.pair_fn(target, guess))
+        better = int(np.searchsorted(-row.sorted_desc, -similarity, side='left'))
+        return similarity, better + 1
+
+    def ranked(self, target: str) -> List[Dict]:
+        """All vocabulary words for target, most similar first (cached)"""
+        row = self._row(target)
+        if row.ranked_words is None:
+            row.ranked_words = [
+                {'word': self.words[i], 'rank': rank, 'similarity': round(float(row.similarities[i]), 4)}
+                for rank, i in enumerate(row.order.tolist(), start=1)
+            ]
+        return row.ranked_words
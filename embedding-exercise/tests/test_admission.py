@@ -0,0 +1,108 @@
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionController, AdmissionRejected
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'condition not reached'
+        time.sleep(0.005)
+
+
+def start_waiter(controller, ticket, admitted, on_queued=None, errors=None):
+    def run():
+        try:
+            controller.wait(ticket, on_queued)
+        except BaseException as e:
+            if errors is not None:
+                errors.append(e)
+            return
+        admitted.append(ticket)
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_admits_immediately_while_slots_are_free():
+    controller = AdmissionController(2, max_queue=0)
+    with controller.slot(), controller.slot():
+        assert controller.stats()['active'] == 2
+        with pytest.raises(AdmissionRejected):
+            controller.enqueue()
+    assert controller.stats()['active'] == 0
+
+
+def test_queue_is_fifo():
+    controller = AdmissionController(1, max_queue=3, queue_timeout=10)
+    first = controller.enqueue()
+    tickets = [controller.enqueue() for _ in range(3)]
+    admitted = []
+    threads = [start_waiter(controller, ticket, admitted) for ticket in reversed(tickets)]
+    wait_for(lambda: controller.stats()['queued'] == 3)
+
+    controller.release(first)
+    for count in range(1, 4):
+        wait_for(lambda: len(admitted) == count)
+        assert controller.stats()['active'] == 1
+        controller.release(admitted[-1])
+    for thread in threads:
+        thread.join(timeout=5)
+    assert admitted == tickets
+    assert controller.stats()['admitted'] == 4
+
+
+def test_full_queue_is_rejected_with_429():
+    controller = AdmissionController(1, max_queue=1, service_time=2.0)
+    controller.enqueue()
+    controller.enqueue()
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.enqueue()
+    assert rejected.value.status_code == 429
+    assert rejected.value.queue_position == 2
+    assert rejected.value.retry_after == 4  # two rounds of one 2-second slot
+    assert controller.stats()['rejected_queue_full'] == 1
+
+
+def test_queue_timeout_is_rejected_with_503():
+    controller = AdmissionController(1, max_queue=2, queue_timeout=0.1)
+    controller.enqueue()
+    ticket = controller.enqueue()
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.wait(ticket)
+    assert rejected.value.status_code == 503
+    assert rejected.value.queue_position == 1
+    assert controller.stats()['queued'] == 0
+    assert controller.stats()['rejected_timeout'] == 1
+
+
+def test_failed_waiter_leaves_the_queue():
+    controller = AdmissionController(1, max_queue=2, queue_timeout=30)
+    first = controller.enqueue()
+    broken, behind = controller.enqueue(), controller.enqueue()
+
+    def on_queued(position, seconds):
+        raise RuntimeError('client went away')
+
+    with pytest.raises(RuntimeError):
+        controller.wait(broken, on_queued)
+    assert controller.stats()['queued'] == 1
+
+    # The request behind it is admitted as soon as the slot frees up, not after queue_timeout
+    admitted = []
+    start_waiter(controller, behind, admitted)
+    controller.release(first)
+    wait_for(lambda: admitted == [behind], timeout=2)
+
+
+def test_slot_is_released_when_the_block_raises():
+    controller = AdmissionController(1, max_queue=0)
+    with pytest.raises(ValueError):
+        with controller.slot():
+            raise ValueError
+    assert controller.stats()['active'] == 0
+    with controller.slot():
+        pass
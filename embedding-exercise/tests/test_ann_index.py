@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from ann_index import IVFIndex, _normalize, exact_top_k
+
+
+@pytest.fixture(scope='module')
+def corpus():
+    """5000 normalised vectors drawn around 60 random directions, seeded"""
+    rng = np.random.default_rng(0)
+    centres = _normalize(rng.standard_normal((60, 32)))
+    points = centres[rng.integers(0, 60, 5000)] + 0.2 * rng.standard_normal((5000, 32))
+    return _normalize(points).astype(np.float32)
+
+
+@pytest.fixture(scope='module')
+def index(corpus):
+    return IVFIndex.build(corpus)
+
+
+@pytest.fixture(scope='module')
+def queries(corpus):
+    rng = np.random.default_rng(1)
+    return corpus[rng.choice(len(corpus), size=200, replace=False)]
+
+
+def test_recall_at_default_n_probe(index, queries):
+    assert index.recall_at_k(queries, k=10) >= 0.95
+    # The corpus is hard enough that probing a single list misses neighbours
+    assert index.recall_at_k(queries, k=10, n_probe=1) < 0.9
+
+
+def test_default_n_probe_scans_a_fraction_of_the_corpus(index, queries):
+    scanned = np.mean([len(index._candidates(query, index.n_probe)) for query in queries])
+    assert scanned < 0.25 * len(index)
+
+
+def test_probing_every_list_is_exact(index, queries):
+    assert index.recall_at_k(queries, k=10, n_probe=index.n_lists) == 1.0
+
+
+def test_search_matches_exact_scores(index, corpus, queries):
+    ids, scores = index.search(queries[0], k=10, n_probe=index.n_lists)
+    exact_ids, exact_scores = exact_top_k(corpus, queries[0], 10)
+    assert ids.tolist() == exact_ids.tolist()
+    assert np.allclose(scores, exact_scores)
+
+
+def test_evaluate_reports_recall_at_k(index, queries):
+    report = index.evaluate(queries, k=10, n_probes=(1, 8))
+    assert [row['n_probe'] for row in report] == [1, 8, 'exact']
+    exact = index.exact_neighbours(queries, 10)
+    for row in report[:2]:
+        assert row['recall_at_k'] == round(index.recall_at_k(queries, 10, row['n_probe'], exact=exact), 4)
+    assert report[0]['recall_at_k'] <= report[1]['recall_at_k']
+
+
+def test_recall_with_no_queries(index):
+    assert index.recall_at_k(np.empty((0, 32), dtype=np.float32)) == 1.0
+
+
+def test_save_and_load_round_trip(index, corpus, queries, tmp_path):
+    path = str(tmp_path / 'index.npz')
+    index.save(path, fingerprint='abc')
+    loaded = IVFIndex.load(path, corpus, fingerprint='abc')
+    assert loaded is not None
+    assert loaded.search(queries[0])[0].tolist() == index.search(queries[0])[0].tolist()
+    assert IVFIndex.load(path, corpus, fingerprint='other') is None
@@ -0,0 +1,58 @@
+import json
+
+import numpy as np
+import pytest
+
+from answer_key import ANSWER_KEY_VERSION, AnswerKey, AnswerKeyMismatch
+
+WORDS = ['cat', 'dog', 'fish']
+
+
+def make_key():
+    ranks = np.array([[1, 2, 3], [3, 1, 2]], dtype=np.int32)
+    scores = np.array([[0.9, 0.5, 0.1], [0.1, 0.9, 0.5]], dtype=np.float32)
+    return AnswerKey('model', 'hash', ['kitten', 'puppy'], ranks, scores, created=1.0)
+
+
+def write_raw(path, meta, ranks=None, scores=None):
+    key = make_key()
+    with open(path, 'wb') as f:
+        np.savez(f, ranks=key.ranks if ranks is None else ranks,
+                 scores=key.scores if scores is None else scores, meta=np.array(json.dumps(meta)))
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / 'key.npz')
+    make_key().save(path)
+    key = AnswerKey.load(path)
+    assert (key.model_id, key.vocab_hash, key.targets, key.created) == ('model', 'hash', ['kitten', 'puppy'], 1.0)
+    assert key.expected('puppy', WORDS) == {'dog': 1, 'fish': 2, 'cat': 3}
+
+
+@pytest.mark.parametrize('meta', [
+    {'version': ANSWER_KEY_VERSION, 'model_id': 'model', 'vocab_hash': 'hash'},
+    {'version': ANSWER_KEY_VERSION, 'targets': ['kitten', 'puppy'], 'vocab_hash': 'hash'},
+    {'version': ANSWER_KEY_VERSION, 'targets': 2, 'model_id': 'model', 'vocab_hash': 'hash'},
+    ['not', 'a', 'record'],
+])
+def test_malformed_meta_is_a_mismatch(tmp_path, meta):
+    path = str(tmp_path / 'key.npz')
+    write_raw(path, meta)
+    with pytest.raises(AnswerKeyMismatch):
+        AnswerKey.load(path)
+
+
+def test_other_version_and_bad_shapes_are_mismatches(tmp_path):
+    path = str(tmp_path / 'key.npz')
+    meta = {'version': ANSWER_KEY_VERSION, 'model_id': 'model', 'vocab_hash': 'hash', 'targets': ['kitten']}
+    write_raw(path, meta)
+    with pytest.raises(AnswerKeyMismatch, match='do not match'):
+        AnswerKey.load(path)
+    write_raw(path, dict(meta, version=ANSWER_KEY_VERSION + 1))
+    with pytest.raises(AnswerKeyMismatch, match='version'):
+        AnswerKey.load(path)
+
+
+def test_missing_file_is_an_os_error(tmp_path):
+    with pytest.raises(OSError):
+        AnswerKey.load(str(tmp_path / 'missing.npz'))
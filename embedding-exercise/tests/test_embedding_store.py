@@ -0,0 +1,89 @@
+import os
+import zlib
+
+import numpy as np
+import pytest
+
+from embedding_store import EmbeddingCache, EmbeddingStore, normalize_rows, vocabulary_hash
+
+
+class FakeModel:
+    """Deterministic stand-in for SentenceTransformer: one random vector per text"""
+
+    def __init__(self, dim=16):
+        self.dim = dim
+        self.calls = []
+
+    def encode(self, sentences, **kwargs):
+        self.calls.append(list(sentences))
+        return np.stack([np.random.default_rng(zlib.crc32(text.encode())).standard_normal(self.dim)
+                         for text in sentences]).astype(np.float32)
+
+
+def test_out_of_vocabulary_vectors_are_bounded():
+    model = FakeModel()
+    store = EmbeddingStore(model, ['cat', 'dog'], max_extra=3)
+    for word in ['a', 'b', 'c', 'd']:
+        store.vector(word)
+    assert list(store._extra) == ['b', 'c', 'd']
+    assert len(store) == 2
+
+
+def test_out_of_vocabulary_vectors_are_reused_in_lru_order():
+    model = FakeModel()
+    store = EmbeddingStore(model, ['cat'], max_extra=2)
+    first = store.vector('a')
+    store.vector('b')
+    calls = len(model.calls)
+    assert np.array_equal(store.vector('a'), first)
+    assert len(model.calls) == calls
+    store.vector('c')
+    # 'a' was used more recently than 'b', so 'b' is the one evicted
+    assert list(store._extra) == ['a', 'c']
+
+
+def test_vocabulary_words_never_enter_the_extra_cache():
+    store = EmbeddingStore(FakeModel(), ['cat', 'dog'], max_extra=2)
+    assert np.allclose(np.linalg.norm(store.vector('cat')), 1.0)
+    assert not store._extra
+
+
+@pytest.mark.parametrize('precision', ['float32', 'int8'])
+def test_cache_round_trip(tmp_path, precision):
+    model = FakeModel()
+    cache = EmbeddingCache(str(tmp_path), 'fake', precision=precision)
+    store = EmbeddingStore(model, ['cat', 'dog', 'fish'], cache=cache)
+    reloaded = EmbeddingStore(FakeModel(), ['cat', 'dog', 'fish'],
+                              cache=EmbeddingCache(str(tmp_path), 'fake', precision=precision))
+    assert np.array_equal(np.asarray(reloaded.matrix), np.asarray(store.matrix))
+    assert reloaded.cache.hits == 3 and reloaded.cache.misses == 0
+
+
+def test_changed_vocabulary_reuses_rows_and_drops_old_files(tmp_path):
+    EmbeddingStore(FakeModel(), ['cat', 'dog'], cache=EmbeddingCache(str(tmp_path), 'fake'))
+    cache = EmbeddingCache(str(tmp_path), 'fake')
+    model = FakeModel()
+    store = EmbeddingStore(model, ['dog', 'cat', 'fish'], cache=cache)
+    assert model.calls == [['fish']]
+    assert cache.read()[0] == ['dog', 'cat', 'fish']
+    assert sorted(os.listdir(cache.path)) == ['manifest.json', f"vectors-{vocabulary_hash(store.words)}.npy"]
+
+
+def test_crash_before_the_manifest_keeps_the_old_cache(tmp_path, monkeypatch):
+    EmbeddingStore(FakeModel(), ['cat', 'dog'], cache=EmbeddingCache(str(tmp_path), 'fake'))
+    cache = EmbeddingCache(str(tmp_path), 'fake')
+    real_replace = os.replace
+
+    def crash_on_manifest(source, destination):
+        if destination == cache.manifest_path:
+            raise OSError('crashed')
+        real_replace(source, destination)
+
+    monkeypatch.setattr(os, 'replace', crash_on_manifest)
+    # Same number of rows, different words: only the manifest tells them apart
+    EmbeddingStore(FakeModel(), ['dog', 'cow'], cache=cache)
+    monkeypatch.undo()
+
+    words, matrix = EmbeddingCache(str(tmp_path), 'fake').read()
+    assert words == ['cat', 'dog']
+    assert np.array_equal(np.asarray(matrix), normalize_rows(FakeModel().encode(['cat', 'dog'])))
@@ -0,0 +1,232 @@
+import itertools
+import math
+
+import numpy as np
+import pytest
+
+import grading
+from grading import GradingKey, average_ranks, kendall_tau, spearman
+
+
+def brute_force_tau_b(x, y):
+    """Kendall's tau-b straight from the definition, over all pairs"""
+    concordant = discordant = x_only = y_only = 0
+    for i, j in itertools.combinations(range(len(x)), 2):
+        dx = np.sign(x[i] - x[j])
+        dy = np.sign(y[i] - y[j])
+        if dx and dy:
+            if dx == dy:
+                concordant += 1
+            else:
+                discordant += 1
+        elif dx:
+            x_only += 1
+        elif dy:
+            y_only += 1
+    denominator = math.sqrt((concordant + discordant + x_only) * (concordant + discordant + y_only))
+    return (concordant - discordant) / denominator if denominator else 0.0
+
+
+def brute_force_inversions(values):
+    return sum(1 for i, j in itertools.combinations(range(len(values)), 2) if values[i] > values[j])
+
+
+# (x, y, kendall tau-b, spearman) as computed by scipy.stats.kendalltau / spearmanr
+REFERENCE = [
+    ([1, 2, 3, 4, 5], [1, 2, 3, 4, 5], 1.0, 1.0),
+    ([1, 2, 3, 4, 5], [5, 4, 3, 2, 1], -1.0, -1.0),
+    ([1, 2, 3, 4, 5, 6], [2, 1, 4, 3, 6, 5], 0.6, 0.8285714285714287),
+    ([1, 2, 2, 3, 4, 4, 4, 5], [2, 1, 3, 3, 5, 4, 6, 7], 0.8249579113843055, 0.9200335844703181),
+    ([1, 1, 2, 2, 3, 3], [1, 2, 1, 2, 2, 3], 0.5222329678670936, 0.5809475019311127),
+]
+
+
+@pytest.mark.parametrize('x, y, tau, rho', REFERENCE)
+def test_reference_values(x, y, tau, rho):
+    x, y = np.array(x, dtype=np.float64), np.array(y, dtype=np.float64)
+    assert kendall_tau(x, y) == pytest.approx(tau, abs=1e-12)
+    assert spearman(x, y) == pytest.approx(rho, abs=1e-12)
+
+
+@pytest.mark.parametrize('n', [2, 3, 7, 50, grading._PAIRWISE_MAX, grading._PAIRWISE_MAX + 1, 300])
+@pytest.mark.parametrize('distinct', [2, 5, None])
+def test_kendall_tau_matches_brute_force(n, distinct):
+    # Both the pairwise and the merge-sort path, with heavy, light and no ties
+    rng = np.random.default_rng(n * 31 + (distinct or 0))
+    for _ in range(3):
+        x = rng.permutation(n).astype(np.float64) if distinct is None else \
+            rng.integers(0, distinct, n).astype(np.float64)
+        y = rng.integers(0, max(2, n // 3), n).astype(np.float64)
+        assert kendall_tau(x, y) == pytest.approx(brute_force_tau_b(x, y), abs=1e-12)
+        assert kendall_tau(y, x) == pytest.approx(brute_force_tau_b(y, x), abs=1e-12)
+
+
+def test_kendall_tau_degenerate_inputs():
+    assert kendall_tau(np.array([]), np.array([])) == 1.0
+    assert kendall_tau(np.array([3.0]), np.array([1.0])) == 1.0
+    # All x tied: no ordered pairs, so no correlation
+    for n in (5, grading._PAIRWISE_MAX + 10):
+        assert kendall_tau(np.zeros(n), np.arange(n, dtype=np.float64)) == 0.0
+
+
+@pytest.mark.parametrize('values', [
+    [], [1], [2, 1], [1, 1, 1], [3, 1, 2, 3, 1, 0, 5, 5, 4],
+    list(range(40, 0, -1)), list(np.random.default_rng(1).integers(0, 10, 257)),
+])
+def test_count_inversions(values):
+    assert grading._count_inversions(np.array(values, dtype=np.float64)) == brute_force_inversions(values)
+
+
+def test_average_ranks_share_ties():
+    np.testing.assert_array_equal(average_ranks(np.array([10, 20, 20, 30])), [1, 2.5, 2.5, 4])
+    np.testing.assert_array_equal(average_ranks(np.array([5, 5, 5])), [2, 2, 2])
+    np.testing.assert_array_equal(average_ranks(np.array([3.0, 1.0, 2.0])), [3, 1, 2])
+
+
+def test_spearman_degenerate_inputs_and_precomputed_ranks():
+    assert spearman(np.array([1.0]), np.array([2.0])) == 1.0
+    assert spearman(np.zeros(4), np.arange(4, dtype=np.float64)) == 0.0
+    rng = np.random.default_rng(2)
+    x = rng.integers(0, 20, 100).astype(np.float64)
+    y = rng.integers(0, 20, 100).astype(np.float64)
+    y_ranks = average_ranks(y)
+    assert spearman(x, y, y_ranks) == spearman(x, y)
+    np.testing.assert_array_equal(y_ranks, average_ranks(y))  # not modified in place
+
+
+def test_matches_scipy():
+    stats = pytest.importorskip('scipy.stats')
+    rng = np.random.default_rng(3)
+    for n in (10, 200, 2000):
+        x = rng.integers(0, n // 2, n).astype(np.float64)
+        y = rng.permutation(n).astype(np.float64)
+        assert kendall_tau(x, y) == pytest.approx(stats.kendalltau(x, y).statistic, abs=1e-9)
+        assert spearman(x, y) == pytest.approx(stats.spearmanr(x, y).statistic, abs=1e-9)
+
+
+def test_score_matches_per_word_loop():
+    # A duplicated word counts twice, as in the original per-word loop
+    words = ['cat', 'dog', 'car', 'orange', 'apple', 'orange', 'pear', 'plum']
+    expected = {word: rank for rank, word in enumerate(dict.fromkeys(words), start=1)}
+    student = {'cat': 2, 'dog': 1, 'car': 3, 'orange': 4, 'apple': 7, 'pear': 5, 'plum': 6}
+    metrics = GradingKey(words, expected).score(student)
+
+    exact = sum(student[word] == expected[word] for word in words) / len(words)
+    avg_diff = sum(abs(student[word] - expected[word]) for word in words) / len(words)
+    assert metrics['exact_accuracy'] == pytest.approx(exact)
+    assert metrics['avg_rank_diff'] == pytest.approx(avg_diff)
+    assert metrics['rank_closeness'] == pytest.approx(max(0, 1 - avg_diff / 50))
+    assert metrics['top_10_accuracy'] == pytest.approx(7 / 10)
+    assert metrics['student_top'] == sorted(student.items(), key=lambda item: item[1])[:5]
+    assert grading.passes(metrics)
+
+
+SOLUTION = '''def rank_words_by_similarity(target, words):
+    scores = [(word, cosine_similarity(compute_char_vector(target), compute_char_vector(word))) for word in words]
+    scores.sort(key=lambda item: item[1], reverse=True)
+    return {word: rank for rank, (word, _) in enumerate(scores, start=1)}
+'''
+
+
+def test_normalize_source_drops_comments_and_whitespace():
+    lines = SOLUTION.split('\n')
+    lines[0] += '   # step one'
+    lines[1] += '\t'
+    noisy = '# My solution  \r\n' + '\r\n'.join(lines) + '\r\n\r\n# the end\r\n'
+    clean = '\n' + SOLUTION
+    assert grading.normalize_source(noisy) == grading.normalize_source(clean)
+    # Every line stays in place, so cached tracebacks keep the right line numbers
+    assert grading.normalize_source(noisy).split('\n')[1].startswith('def rank_words_by_similarity')
+
+
+@pytest.mark.parametrize('a, b', [
+    ("s = '#' + x", "s = ''"),                                # '#' inside a string is not a comment
+    ('x = """a  \nb"""', 'x = """a\nb"""'),                   # whitespace inside a string is data
+    ('\n\nraise ValueError', 'raise ValueError'),             # leading lines shift tracebacks
+    ('if x:\n    y()\nz()', 'if x:\n    y()\n    z()'),       # indentation is code
+    ('x = 1', 'x = 2'),
+])
+def test_normalize_source_keeps_meaningful_differences(a, b):
+    assert grading.normalize_source(a) != grading.normalize_source(b)
+
+
+def test_normalize_source_untokenizable_code():
+    # Unterminated string: nothing is stripped, so nothing can collide
+    code = 'x = """never closed   \r\n# not a comment  '
+    assert grading.normalize_source(code) == 'x = """never closed   \n# not a comment  '
+
+
+def test_cache_key_ignores_formatting_only():
+    cache = grading.ResultCache('v1')
+    key = cache.key(SOLUTION)
+    assert key is not None
+    assert cache.key('# comment\n' + SOLUTION.replace('\n', '  \n')) != key  # one more line
+    assert cache.key(SOLUTION + '\n\n# done\n') == key
+    assert cache.key(SOLUTION.replace('reverse=True', 'reverse=False')) != key
+    assert cache.key(SOLUTION, variant='["cat"]') != key
+
+
+@pytest.mark.parametrize('snippet', [
+    'import random',
+    'from random import shuffle',
+    'noise = np.random.rand(3)',
+    'import time\nstarted = time.time()',
+    'from datetime import datetime',
+    'import secrets',
+    'import uuid',
+    'salt = os.urandom(4)',
+])
+def test_nondeterministic_code_is_never_cached(snippet):
+    cache = grading.ResultCache('v1')
+    key = cache.key(snippet + '\n' + SOLUTION)
+    assert key is None
+    assert cache.get(key) is None
+    cache.put(key, {'status': 'success'}, 200, 1.0)
+    assert cache.stats()['entries'] == 0
+    assert cache.stats()['uncacheable'] == 1
+
+
+@pytest.mark.parametrize('snippet', [
+    '# shuffle the words at random',          # comments are dropped before the check
+    'runtime_budget = 3',
+    'def randomize(words):\n    return words',
+    'timestamps = []',
+])
+def test_deterministic_lookalikes_are_cached(snippet):
+    assert grading.ResultCache('v1').key(snippet + '\n' + SOLUTION) is not None
+
+
+def test_cache_hit_miss_and_eviction():
+    cache = grading.ResultCache('v1', max_entries=2)
+    keys = [cache.key(f'x = {i}') for i in range(3)]
+    assert cache.get(keys[0]) is None
+    for i, key in enumerate(keys[:2]):
+        cache.put(key, {'passed': i}, 200, 0.5)
+    assert cache.get(keys[0]) == ({'passed': 0}, 200)  # now most recently used
+    cache.put(keys[2], {'passed': 2}, 200, 0.5)
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[2]) == ({'passed': 2}, 200)
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions']) == (2, 2, 1)
+    assert stats['saved_seconds'] == pytest.approx(1.0)
+
+
+def test_test_set_version_invalidates_cache():
+    words = ['cat', 'dog', 'car']
+    test_cases = [{'target': 'cat', 'expected_output': {'cat': 1, 'car': 2, 'dog': 3}}]
+    version = grading.test_set_version(test_cases, words, 'model@1')
+    assert grading.test_set_version(test_cases, list(words), 'model@1') == version
+
+    changed = [
+        grading.test_set_version(test_cases, words, 'model@2'),
+        grading.test_set_version(test_cases, words + ['cow'], 'model@1'),
+        grading.test_set_version([dict(test_cases[0], target='dog')], words, 'model@1'),
+        grading.test_set_version([dict(test_cases[0], expected_output={'cat': 1, 'car': 3, 'dog': 2})],
+                                 words, 'model@1'),
+    ]
+    assert version not in changed and len(set(changed)) == len(changed)
+
+    old, new = grading.ResultCache(version), grading.ResultCache(changed[0])
+    old.put(old.key(SOLUTION), {'status': 'success'}, 200, 1.0)
+    assert new.key(SOLUTION) != old.key(SOLUTION)
+    assert new.get(new.key(SOLUTION)) is None
@@ -0,0 +1,138 @@
+import zlib
+
+import numpy as np
+import pytest
+
+import inference
+from inference import BatchScheduler, CachingModel
+
+
+class FakeModel:
+    """Records encode calls; returns one fixed vector per text"""
+
+    def __init__(self, dim=8):
+        self.dim = dim
+        self.calls = []
+
+    def _vector(self, text, normalize):
+        vector = np.random.default_rng(zlib.crc32(text.encode())).standard_normal(self.dim).astype(np.float32)
+        return vector / np.linalg.norm(vector) if normalize else vector
+
+    def encode(self, sentences, **kwargs):
+        self.calls.append((sentences, kwargs))
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        result = np.stack([self._vector(text, kwargs.get('normalize_embeddings', False)) for text in texts])
+        return result[0] if single else result
+
+
+def test_repeated_texts_are_served_from_the_cache():
+    model = FakeModel()
+    cached = CachingModel(model)
+    first = cached.encode(['cat', 'dog'])
+    again = cached.encode(['dog', 'cat', 'cat'])
+    assert len(model.calls) == 1
+    assert np.array_equal(again, first[[1, 0, 0]])
+    assert cached.cache_info()['hits'] == 3
+
+
+def test_single_string_matches_the_model():
+    model = FakeModel()
+    cached = CachingModel(model)
+    vector = cached.encode('cat')
+    assert vector.shape == (8,)
+    assert np.array_equal(vector, model.encode('cat'))
+    assert np.array_equal(cached.encode('cat', batch_size=4, show_progress_bar=False), vector)
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'convert_to_tensor': True},
+    {'convert_to_numpy': False},
+    {'prompt': 'query: '},
+    {'precision': 'int8'},
+    {'output_value': 'token_embeddings'},
+])
+@pytest.mark.parametrize('sentences', ['cat', ['cat', 'dog']])
+def test_other_options_go_straight_to_the_model(sentences, kwargs):
+    model = FakeModel()
+    cached = CachingModel(model)
+    cached.encode(sentences)
+    cached.encode(sentences, **kwargs)
+    assert len(model.calls) == 2
+    assert model.calls[-1] == (sentences, kwargs)
+
+
+def test_normalized_and_raw_embeddings_are_cached_separately():
+    model = FakeModel()
+    cached = CachingModel(model)
+    raw = cached.encode(['cat'])
+    normalized = cached.encode(['cat'], normalize_embeddings=True)
+    assert len(model.calls) == 2
+    assert np.allclose(np.linalg.norm(normalized), 1.0)
+    assert not np.allclose(raw, normalized)
+
+
+def test_least_recently_used_texts_are_evicted():
+    model = FakeModel()
+    cached = CachingModel(model, max_size=2)
+    cached.encode(['a', 'b'])
+    cached.encode('a')
+    cached.encode('c')
+    assert [key[0] for key in cached._cache] == ['a', 'c']
+    assert len(model.calls) == 2
+
+
+def test_results_cannot_change_the_cache():
+    cached = CachingModel(FakeModel())
+    vector = cached.encode('cat')
+    expected = vector.copy()
+    vector[:] = 0
+    assert np.array_equal(cached.encode('cat'), expected)
+
+
+def test_prefetch_encodes_the_vocabulary_in_one_batch():
+    model = FakeModel()
+    cached = CachingModel(model, prefetch=['a', 'b', 'c'])
+    for word in ['a', 'b', 'c']:
+        cached.encode(word)
+    assert len(model.calls) == 1
+    assert model.calls[0][0] == ['a', 'b', 'c']
+
+
+class BrokenHistogram:
+    def observe(self, value, **labels):
+        raise ValueError('metrics broke')
+
+
+def test_scheduler_batches_and_splits_results():
+    scheduler = BatchScheduler(FakeModel(), max_wait_ms=1)
+    model = scheduler.model
+    result = scheduler.encode(['cat', 'dog'])
+    assert np.array_equal(result, model.encode(['cat', 'dog']))
+    assert scheduler.stats()['requests'] == 1
+
+
+def test_scheduler_survives_errors_outside_the_model(monkeypatch):
+    scheduler = BatchScheduler(FakeModel(), max_wait_ms=1)
+    scheduler.encode(['cat'])
+    monkeypatch.setattr(inference, 'ENCODE_QUEUE_WAIT', BrokenHistogram())
+    with pytest.raises(ValueError, match='metrics broke'):
+        scheduler.encode(['dog'])
+    monkeypatch.undo()
+    assert scheduler.encode(['dog']).shape == (1, 8)
+
+
+@pytest.mark.filterwarnings('ignore::pytest.PytestUnhandledThreadExceptionWarning')
+def test_dead_scheduler_raises_instead_of_hanging(monkeypatch):
+    scheduler = BatchScheduler(FakeModel(), max_wait_ms=1)
+    monkeypatch.setattr(inference, '_LIVENESS_INTERVAL', 0.05)
+
+    def die(batch):
+        raise SystemExit
+
+    monkeypatch.setattr(scheduler, '_collect', die)
+    with pytest.raises(RuntimeError, match='stopped'):
+        scheduler.encode(['cat'])
+    monkeypatch.undo()
+    # The next call starts a new thread, which also picks up the stranded request
+    assert scheduler.encode(['dog']).shape == (1, 8)
@@ -0,0 +1,79 @@
+import pickle
+
+import pytest
+
+from metrics import Registry
+
+
+def make_registry():
+    registry = Registry()
+    registry.counter('jobs', 'Jobs run', ['outcome'])
+    registry.histogram('job_seconds', 'Job latency', ['kind'], buckets=(0.1, 1.0))
+    return registry
+
+
+def worker_delta(observations):
+    """Delta a forked worker would ship back after running observations"""
+    worker = make_registry()
+    worker.counter('jobs', 'Jobs run', ['outcome']).inc(outcome='ok')
+    before = pickle.loads(pickle.dumps(worker.snapshot()))
+    jobs = worker.counter('jobs', 'Jobs run', ['outcome'])
+    seconds = worker.histogram('job_seconds', 'Job latency', ['kind'])
+    for outcome, kind, value in observations:
+        jobs.inc(outcome=outcome)
+        seconds.observe(value, kind=kind)
+    return pickle.loads(pickle.dumps(worker.delta(before)))
+
+
+def test_merging_sums_counters_per_label_set():
+    server = make_registry()
+    server.merge(worker_delta([('ok', 'grade', 0.05), ('error', 'grade', 0.5)]))
+    server.merge(worker_delta([('ok', 'grade', 0.05), ('ok', 'game', 2.0)]))
+    jobs = server.counter('jobs', 'Jobs run', ['outcome'])
+    # The increment before each worker's snapshot is not part of its delta
+    assert jobs.value(outcome='ok') == 3
+    assert jobs.value(outcome='error') == 1
+    assert jobs.value(outcome='timeout') == 0
+
+
+def test_merging_sums_histogram_buckets_per_label_set():
+    server = make_registry()
+    seconds = server.histogram('job_seconds', 'Job latency', ['kind'])
+    seconds.observe(0.05, kind='grade')
+    server.merge(worker_delta([('ok', 'grade', 0.05), ('ok', 'grade', 0.5)]))
+    server.merge(worker_delta([('ok', 'grade', 5.0), ('ok', 'game', 0.5)]))
+    state = server.snapshot()['job_seconds']
+    counts, total, count = state[('grade',)]
+    assert counts == [2, 1, 1]
+    assert total == pytest.approx(5.6)
+    assert count == 4
+    assert state[('game',)] == [[0, 1, 0], 0.5, 1]
+
+
+def test_delta_only_holds_changes():
+    registry = make_registry()
+    registry.counter('jobs', 'Jobs run', ['outcome']).inc(outcome='ok')
+    before = registry.snapshot()
+    assert registry.delta(before) == {}
+    registry.counter('jobs', 'Jobs run', ['outcome']).inc(2, outcome='error')
+    assert registry.delta(before) == {'jobs': {('error',): 2.0}}
+
+
+def test_merge_skips_unknown_metrics():
+    server = Registry()
+    server.counter('jobs', 'Jobs run', ['outcome'])
+    server.merge(worker_delta([('ok', 'grade', 0.05)]))
+    server.merge(None)
+    assert server.counter('jobs', 'Jobs run', ['outcome']).value(outcome='ok') == 1
+    assert 'job_seconds' not in server.snapshot()
+
+
+def test_render_after_merge():
+    server = make_registry()
+    server.merge(worker_delta([('ok', 'grade', 0.05), ('ok', 'grade', 0.5)]))
+    text = server.render()
+    assert 'jobs_total{outcome="ok"} 2' in text
+    assert 'job_seconds_bucket{kind="grade",le="0.1"} 1' in text
+    assert 'job_seconds_bucket{kind="grade",le="1"} 2' in text
+    assert 'job_seconds_bucket{kind="grade",le="+Inf"} 2' in text
+    assert 'job_seconds_count{kind="grade"} 2' in text
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from ngram_encoder import HashedNgramEncoder
+
+WORDS = ['cat', 'Cats', 'a', '', 'elephant', 'zebra', 'café', 'naïve', 'x' * 30]
+
+_MASK = (1 << 64) - 1
+_PRIME = 0x100000001B3
+
+
+def reference_vector(word, dim=64, ngram_range=(1, 3)):
+    """The hashing trick for one word, in plain Python"""
+    codes = [1] + [ord(char) + 3 for char in word.lower()] + [2]
+    vector = np.zeros(dim)
+    for n in range(ngram_range[0], ngram_range[1] + 1):
+        # Unigrams skip the boundary markers; longer n-grams include them
+        starts = range(1, len(codes) - 1) if n == 1 else range(len(codes) - n + 1)
+        for start in starts:
+            h = n
+            for code in codes[start:start + n]:
+                h = ((h ^ code) * _PRIME) & _MASK
+            h ^= h >> 29
+            h = (h * _PRIME) & _MASK
+            vector[h % dim] += 1.0 - 2.0 * (h >> 63)
+    return vector.astype(np.float32)
+
+
+def test_batched_hashing_matches_the_per_word_reference():
+    encoder = HashedNgramEncoder(dim=64)
+    expected = np.stack([reference_vector(word) for word in WORDS])
+    assert np.array_equal(encoder.encode(WORDS), expected)
+
+
+def test_results_do_not_depend_on_batch_size():
+    encoder = HashedNgramEncoder(dim=64)
+    assert np.array_equal(encoder.encode(WORDS, batch_size=1), encoder.encode(WORDS))
+    assert np.array_equal(encoder.encode(WORDS, batch_size=4), encoder.encode(WORDS))
+
+
+def test_single_string_and_empty_list():
+    encoder = HashedNgramEncoder(dim=64)
+    vector = encoder.encode('cat')
+    assert vector.shape == (64,) and vector.dtype == np.float32
+    assert np.array_equal(vector, encoder.encode(['cat'])[0])
+    assert encoder.encode([]).shape == (0, 64)
+
+
+def test_case_insensitive_and_normalised():
+    encoder = HashedNgramEncoder()
+    vectors = encoder.encode(['Cat', 'cat', ''], normalize_embeddings=True)
+    assert np.array_equal(vectors[0], vectors[1])
+    assert np.allclose(np.linalg.norm(vectors[0]), 1.0)
+    # An empty word still has its boundary bigram, so it is not a zero vector
+    assert np.allclose(np.linalg.norm(vectors[2]), 1.0)
+
+
+@pytest.mark.parametrize('word, similar, different', [
+    ('cat', 'cats', 'zebra'),
+    ('running', 'runner', 'piano'),
+])
+def test_shared_ngrams_mean_higher_similarity(word, similar, different):
+    vectors = HashedNgramEncoder().encode([word, similar, different], normalize_embeddings=True)
+    assert vectors[0] @ vectors[1] > vectors[0] @ vectors[2]
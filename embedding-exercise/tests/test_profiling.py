@@ -0,0 +1,47 @@
+import tracemalloc
+
+from profiling import SubmissionProfiler
+
+
+def allocate(megabytes):
+    return bytearray(megabytes * 2**20)
+
+
+def test_peak_memory_of_one_profiler():
+    with SubmissionProfiler(None) as profiler:
+        profiler.run('student_function', allocate, 4)
+    report = profiler.report(1)
+    assert 4 <= report['peak_memory_mb'] < 5
+    assert report['peak_memory_shared'] is False
+    assert not tracemalloc.is_tracing()
+
+
+def test_overlapping_profilers_report_a_shared_peak():
+    first = SubmissionProfiler(None).__enter__()
+    buffer = allocate(8)
+    with SubmissionProfiler(None) as second:
+        pass
+    del buffer
+    first.__exit__(None, None, None)
+    # Resetting the peak for the second profiler would have hidden the first one's 8 MB
+    assert first.report(1)['peak_memory_mb'] >= 8
+    assert first.report(1)['peak_memory_shared'] is True
+    assert second.report(1)['peak_memory_shared'] is True
+    assert not tracemalloc.is_tracing()
+
+    with SubmissionProfiler(None) as later:
+        pass
+    assert later.report(1)['peak_memory_shared'] is False
+
+
+def test_calls_while_cprofile_is_busy_run_unprofiled():
+    inner_results = []
+    with SubmissionProfiler(None) as outer, SubmissionProfiler(None) as inner:
+        # The inner call starts while the outer one is still under cProfile
+        outer.run('student_function', lambda: inner_results.append(inner.run('student_function', allocate, 1)))
+        assert inner.run('exec', allocate, 1) is not None
+    assert len(inner_results[0]) == 2**20
+    assert outer.report(1)['functions_incomplete'] is False
+    report = inner.report(1)
+    assert report['functions_incomplete'] is True
+    assert set(report['phases']) == {'student_function', 'exec'}
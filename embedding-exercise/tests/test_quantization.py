@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from grading import kendall_tau, spearman
+from quantization import CompactMatrix, append_rows, compact, quantize_rows, rank_agreement_report
+
+# precision: (min Spearman, min Kendall tau, min top-10 overlap, max similarity error)
+TOLERANCES = {
+    'float16': (0.9999, 0.999, 10, 1e-3),
+    'int8': (0.9995, 0.99, 8, 1e-2),
+}
+
+
+@pytest.fixture(scope='module')
+def matrix():
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((3000, 64)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def ranker(matrix, words):
+    """EmbeddingStore.rank over a bare matrix whose rows are words, in order"""
+    index = {word: row for row, word in enumerate(words)}
+
+    def rank(target, word_list):
+        sims = np.asarray(matrix[np.array([index[word] for word in word_list])] @ matrix[index[target]])
+        order = np.argsort(-sims, kind='stable')
+        return {word_list[position]: rank for rank, position in enumerate(order.tolist(), start=1)}
+    return rank
+
+
+@pytest.mark.parametrize('precision', sorted(TOLERANCES))
+def test_rankings_stay_close_to_float32(matrix, precision):
+    min_spearman, min_tau, min_overlap, max_error = TOLERANCES[precision]
+    stored = CompactMatrix(*quantize_rows(matrix, precision))
+    assert stored.precision == precision
+    for query in matrix[:50]:
+        exact = matrix @ query
+        approx = stored @ query
+        assert np.abs(exact - approx).max() < max_error
+        assert spearman(exact, approx) >= min_spearman
+        assert kendall_tau(exact, approx) >= min_tau
+        top_exact = set(np.argsort(-exact)[:10].tolist())
+        top_approx = set(np.argsort(-approx)[:10].tolist())
+        assert len(top_exact & top_approx) >= min_overlap
+
+
+@pytest.mark.parametrize('precision', sorted(TOLERANCES))
+def test_rank_agreement_report_keeps_grading(matrix, precision):
+    words = [f'w{row}' for row in range(500)]
+    reference = matrix[:500]
+    stored = CompactMatrix(*quantize_rows(reference, precision))
+    test_cases = [{'target': words[row]} for row in range(5)]
+    report = rank_agreement_report(words, test_cases, precision,
+                                   ranker(reference, words), ranker(stored, words))
+    assert report['precision'] == precision
+    assert len(report['test_cases']) == 5
+    assert report['grading_unchanged']
+    assert report['min_spearman'] >= TOLERANCES[precision][0]
+
+
+@pytest.mark.parametrize('precision', sorted(TOLERANCES))
+def test_views_match_dequantized_rows(matrix, precision):
+    stored = CompactMatrix(*quantize_rows(matrix[:100], precision))
+    dense = np.asarray(stored)
+    assert dense.dtype == np.float32 and dense.shape == (100, 64)
+    assert np.allclose(stored[10:20] @ matrix[0], (stored @ matrix[0])[10:20], atol=1e-6)
+    assert np.array_equal(stored[[3, 7]], dense[[3, 7]])
+    assert np.array_equal(stored[5], dense[5])
+    grown = append_rows(stored, matrix[100:110])
+    assert len(grown) == 110 and grown.precision == precision
+    assert np.allclose(grown[100:], matrix[100:110], atol=TOLERANCES[precision][3])
+
+
+def test_float32_is_not_wrapped(matrix):
+    assert compact(matrix) is matrix
+    with pytest.raises(ValueError):
+        quantize_rows(matrix[:2], 'int4')
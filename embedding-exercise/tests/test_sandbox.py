@@ -0,0 +1,131 @@
+import os
+import signal
+import threading
+import time
+
+import pytest
+
+from sandbox import (ForkServer, GradingPool, SandboxCrashed, SandboxTimeout, fork_available,
+                     retire_worker)
+
+pytestmark = pytest.mark.skipif(not fork_available(), reason='needs fork()')
+
+_lock = threading.Lock()
+
+
+def echo_job(job, emit=None):
+    if emit is not None:
+        emit(('pid', os.getpid(), os.getppid()))
+    return job
+
+
+def locking_job(job, emit=None):
+    with _lock:
+        return job
+
+
+def sleeping_job(seconds, emit=None):
+    time.sleep(seconds)
+    return seconds
+
+
+def killed_job(job, emit=None):
+    os.kill(os.getpid(), signal.SIGKILL)
+
+
+def retiring_job(job, emit=None):
+    retire_worker()
+    return os.getpid()
+
+
+@pytest.fixture
+def fork_server():
+    server = ForkServer()
+    yield server
+    server.close()
+
+
+def test_workers_are_forked_by_the_fork_server(fork_server):
+    pool = GradingPool(echo_job, size=1, timeout=5, fork_server=fork_server)
+    events = []
+    try:
+        assert pool.run('job', on_event=events.append) == 'job'
+    finally:
+        pool.close()
+    _, worker_pid, parent_pid = events[0]
+    assert parent_pid == fork_server.process.pid
+    assert worker_pid != os.getpid()
+
+
+def test_workers_do_not_inherit_locks_held_by_other_threads(fork_server):
+    held = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with _lock:
+            held.set()
+            release.wait()
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    held.wait()
+    try:
+        # Both workers are forked while another thread holds _lock; a direct
+        # fork of this process would hand them a lock that is never released
+        pool = GradingPool(locking_job, size=1, timeout=5, fork_server=fork_server)
+        try:
+            assert pool.run(1) == 1
+            pool.run(None, handler=retiring_job)
+            assert pool.run(2) == 2
+        finally:
+            pool.close()
+    finally:
+        release.set()
+        thread.join()
+
+
+def test_timed_out_worker_is_replaced(fork_server):
+    pool = GradingPool(sleeping_job, size=1, timeout=5, fork_server=fork_server)
+    try:
+        with pytest.raises(SandboxTimeout):
+            pool.run(10, timeout=0.2)
+        assert pool.recycled == 1
+        assert pool.run(0) == 0
+    finally:
+        pool.close()
+
+
+def test_killed_worker_reports_its_signal(fork_server):
+    pool = GradingPool(echo_job, size=1, timeout=5, fork_server=fork_server)
+    try:
+        with pytest.raises(SandboxCrashed, match='killed'):
+            pool.run(None, handler=killed_job)
+        assert pool.run('next') == 'next'
+    finally:
+        pool.close()
+
+
+def test_retired_worker_is_replaced(fork_server):
+    pool = GradingPool(echo_job, size=1, timeout=5, fork_server=fork_server)
+    try:
+        first = pool.run(None, handler=retiring_job)
+        second = pool.run(None, handler=retiring_job)
+        assert first != second
+        assert pool.recycled == 2
+    finally:
+        pool.close()
+
+
+def test_closing_the_fork_server_stops_busy_workers():
+    server = ForkServer()
+    pool = GradingPool(sleeping_job, size=1, timeout=30, fork_server=server)
+    worker = pool._idle.queue[0]
+    pid = worker.process.pid
+    thread = threading.Thread(target=lambda: pytest.raises(Exception, pool.run, 30))
+    thread.start()
+    time.sleep(0.2)
+    server.close()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+    with pytest.raises(OSError):
+        os.kill(pid, 0)
@@ -0,0 +1,170 @@
+import json
+import multiprocessing
+import time
+
+import pytest
+
+from sessions import GameSession, SessionServer, SessionStore
+
+
+def test_least_recently_used_session_is_evicted_first():
+    store = SessionStore(max_sessions=2)
+    first = store.create('cat')
+    second = store.create('dog')
+    assert store.get(first.session_id) is first
+    third = store.create('fish')
+    assert store.get(second.session_id) is None
+    assert store.get(first.session_id) is first
+    assert store.get(third.session_id) is third
+    assert store.stats()['evicted_lru'] == 1
+
+
+def test_idle_sessions_expire():
+    store = SessionStore(ttl_seconds=0.05)
+    idle = store.create('cat')
+    time.sleep(0.1)
+    fresh = store.create('dog')
+    assert store.get(idle.session_id) is None
+    assert store.get(fresh.session_id) is fresh
+    assert store.stats()['expired'] == 1
+
+
+def test_memory_cap_evicts_oldest_but_keeps_the_last_session():
+    store = SessionStore(max_bytes=2000)
+    old = store.create('cat')
+    busy = store.create('dog')
+    for i in range(10):
+        store.record_guess(busy, f'guess{i}', 0.5, i)
+    assert store.get(old.session_id) is None
+    assert store.get(busy.session_id) is busy
+    assert store.stats()['evicted_memory'] == 1
+    for i in range(10, 20):
+        store.record_guess(busy, f'guess{i}', 0.5, i)
+    # Over the cap on its own, but the only session is never evicted
+    assert store.stats()['estimated_bytes'] == busy.estimate_size() > store.max_bytes
+    assert store.get(busy.session_id) is busy
+
+
+def test_history_is_trimmed_to_max_history():
+    store = SessionStore(max_history=3)
+    session = store.create('cat')
+    for i in range(5):
+        assert store.record_guess(session, f'w{i}', i / 10, i + 1)
+    assert [word for word, _, _ in session.guesses] == ['w2', 'w3', 'w4']
+    assert session.attempts == 5
+
+
+def test_guess_for_a_stale_target_is_dropped():
+    store = SessionStore()
+    session = store.create('cat')
+    store.reset(session, 'dog')
+    assert not store.record_guess(session, 'kitten', 0.9, 1, target='cat')
+    assert session.guesses == [] and session.attempts == 0
+    assert store.record_guess(session, 'puppy', 0.9, 1, target='dog')
+    assert session.attempts == 1
+
+
+def test_reset_keeps_the_target_and_replaces_code():
+    store = SessionStore()
+    session = store.create('cat')
+    store.record_guess(session, 'dog', 0.5, 3)
+    store.reset(session, similarity_code='def compute_similarity(a, b): return 0')
+    assert session.target == 'cat'
+    assert session.guesses == [] and session.attempts == 0
+    assert session.similarity_code.startswith('def compute_similarity')
+    with pytest.raises(TypeError):
+        store.reset(session, target_code='x')
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / 'sessions.json')
+    store = SessionStore(snapshot_path=path)
+    session = store.create('cat')
+    store.record_guess(session, 'dog', 0.75, 2)
+    store.reset(session, filter_code='def filter_words(words): return words')
+    store.record_guess(session, 'kitten', 0.9, 1)
+    assert store.snapshot() == 1
+
+    restored = SessionStore(snapshot_path=path)
+    assert restored.restore() == 1
+    copy = restored.get(session.session_id)
+    assert copy.to_dict() == session.to_dict()
+    assert copy.guesses == [('kitten', 0.9, 1)]
+    assert restored.stats()['estimated_bytes'] == copy.estimate_size()
+
+
+def test_restore_ignores_other_versions_and_bad_records(tmp_path):
+    path = tmp_path / 'sessions.json'
+    path.write_text(json.dumps({'version': 2, 'sessions': [{'session_id': 'a', 'target': 'cat'}]}))
+    assert SessionStore(snapshot_path=str(path)).restore() == 0
+    path.write_text(json.dumps({'version': 1, 'sessions': [{'target': 'cat'},
+                                                           {'session_id': 'b', 'target': 'dog'}]}))
+    store = SessionStore(snapshot_path=str(path))
+    assert store.restore() == 1
+    assert store.get('b').target == 'dog'
+
+
+def test_from_dict_defaults_attempts_to_the_history_length():
+    session = GameSession.from_dict({'session_id': 'a', 'target': 'cat', 'guesses': [['dog', 0.5, 2]]})
+    assert session.attempts == 1 and session.guesses == [('dog', 0.5, 2)]
+
+
+needs_fork = pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(), reason='needs fork()')
+
+
+@pytest.fixture
+def session_server(tmp_path):
+    server = SessionServer(SessionStore(snapshot_path=str(tmp_path / 'sessions.json')))
+    server.start()
+    yield server
+    server.close()
+
+
+@needs_fork
+def test_sessions_are_shared_between_clients(session_server):
+    first, second = session_server.client(), session_server.client()
+    session = first.create('cat')
+    copy = second.get(session.session_id)
+    assert copy is not session and copy.target == 'cat'
+
+    assert second.record_guess(copy, 'dog', 0.5, 3, target='cat')
+    assert copy.attempts == 1
+    first.reset(session, 'fish', similarity_code='def compute_similarity(a, b): return 0')
+    assert session.target == 'fish' and session.guesses == []
+    # The guess was scored for the old target, so it is dropped
+    assert not second.record_guess(copy, 'kitten', 0.9, 1, target='cat')
+    assert second.get(session.session_id).to_dict() == session.to_dict()
+    assert first.stats()['sessions'] == len(second) == 1
+    with pytest.raises(TypeError):
+        first.reset(session, target_code='x')
+
+
+@needs_fork
+def test_forked_processes_share_the_served_store(session_server):
+    session = session_server.client().create('cat')
+
+    def guess(word):
+        client = session_server.client()
+        client.record_guess(client.get(session.session_id), word, 0.5, 1)
+
+    ctx = multiprocessing.get_context('fork')
+    processes = [ctx.Process(target=guess, args=(word,)) for word in ('dog', 'fish')]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=10)
+        assert process.exitcode == 0
+    stored = session_server.client().get(session.session_id)
+    assert stored.attempts == 2
+    assert sorted(word for word, _, _ in stored.guesses) == ['dog', 'fish']
+
+
+@needs_fork
+def test_closing_the_server_snapshots_its_sessions(session_server):
+    session = session_server.client().create('cat')
+    session_server.close()
+    restored = SessionStore(snapshot_path=session_server.store.snapshot_path)
+    assert restored.restore() == 1
+    assert restored.get(session.session_id).target == 'cat'
+    # Served in another process, so this process's copy was never touched
+    assert len(session_server.store) == 0
@@ -0,0 +1,101 @@
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from shared_arrays import SharedArrays, file_backed
+
+
+@pytest.fixture
+def arrays():
+    rng = np.random.default_rng(0)
+    return {
+        'matrix': rng.standard_normal((7, 5)).astype(np.float32),
+        'ranks': np.arange(13, dtype=np.int32),
+        'flags': np.array([True, False, True]),
+        'empty': np.zeros((0, 4), dtype=np.int8),
+    }
+
+
+@pytest.fixture
+def shared(arrays):
+    shared = SharedArrays.publish(arrays)
+    yield shared
+    shared.close()
+
+
+def test_published_arrays_are_aligned_read_only_copies(arrays, shared):
+    assert list(shared) == list(arrays) and len(shared) == 4 and 'ranks' in shared
+    for name, array in arrays.items():
+        view = shared[name]
+        assert view.dtype == array.dtype and np.array_equal(view, array)
+        assert not view.flags.writeable
+        assert shared.layout[name][0] % 64 == 0
+        assert not np.shares_memory(view, array)
+    with pytest.raises(ValueError):
+        shared['ranks'][0] = 1
+    assert shared.nbytes >= sum(array.nbytes for array in arrays.values())
+
+
+def test_attaching_by_name_and_layout(arrays, shared):
+    block = shared_memory.SharedMemory(name=shared.block.name)
+    attached = SharedArrays(block, shared.layout)
+    try:
+        assert np.array_equal(attached['matrix'], arrays['matrix'])
+    finally:
+        attached.close()
+    # Not the owner, so the block is still there
+    assert np.array_equal(shared['ranks'], arrays['ranks'])
+
+
+@pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(), reason='needs fork()')
+def test_forked_workers_read_the_same_pages(arrays, shared):
+    ctx = multiprocessing.get_context('fork')
+    receiver, sender = ctx.Pipe(duplex=False)
+
+    def worker():
+        try:
+            shared['ranks'][0] = 99
+            writable = True
+        except ValueError:
+            writable = False
+        sender.send((float(shared['matrix'].sum()), writable))
+
+    process = ctx.Process(target=worker)
+    process.start()
+    total, writable = receiver.recv()
+    process.join(timeout=10)
+    assert total == pytest.approx(float(arrays['matrix'].sum())) and not writable
+    assert process.exitcode == 0
+    # The worker exiting does not remove the block
+    block = shared_memory.SharedMemory(name=shared.block.name)
+    block.close()
+
+
+def test_close_removes_the_block(arrays):
+    shared = SharedArrays.publish(arrays)
+    name = shared.block.name
+    view = shared['matrix']
+    shared.close()
+    # A view still held elsewhere keeps the mapping alive, but the name is gone
+    assert view.shape == (7, 5)
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=name)
+
+
+def test_publishing_nothing():
+    shared = SharedArrays.publish({})
+    try:
+        assert len(shared) == 0 and shared.nbytes >= 1
+    finally:
+        shared.close()
+
+
+def test_file_backed(tmp_path):
+    path = tmp_path / 'matrix.npy'
+    np.save(path, np.ones((4, 3), dtype=np.float32))
+    mapped = np.load(path, mmap_mode='r')
+    assert file_backed(mapped) and file_backed(mapped[1:3]) and file_backed(mapped[:, 0])
+    assert not file_backed(np.array(mapped))
+    assert not file_backed(np.ones(3))
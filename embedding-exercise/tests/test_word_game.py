@@ -0,0 +1,131 @@
+import os
+import threading
+import time
+
+# Keep the model load off the import; the routes tested here do not need it
+os.environ.setdefault('FAST_START', '1')
+
+import pytest  # noqa: E402
+
+import word_game  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    return word_game.app.test_client()
+
+
+def get_page(client, **params):
+    response = client.get('/api/get_exercise', query_string=params)
+    return response.status_code, response.get_json()
+
+
+def test_pages_cover_the_word_list_in_order(client, monkeypatch):
+    monkeypatch.setattr(word_game, 'WORDS_PAGE_SIZE', 7)
+    words = []
+    offset = 0
+    while offset is not None:
+        status, body = get_page(client, offset=offset)
+        assert status == 200
+        assert body['limit'] == 7 and body['offset'] == offset
+        assert body['word_count'] == len(word_game.WORDS)
+        words += body['words']
+        offset = body['next_offset']
+    assert words == word_game.WORDS
+
+
+def test_limit_is_clamped_to_the_page_size(client, monkeypatch):
+    monkeypatch.setattr(word_game, 'WORDS_PAGE_SIZE', 10)
+    assert get_page(client, limit=1000)[1]['limit'] == 10
+    assert get_page(client, limit=0)[1]['limit'] == 1
+    assert get_page(client, limit=-5)[1]['words'] == word_game.WORDS[:1]
+
+
+def test_offsets_outside_the_list(client):
+    count = len(word_game.WORDS)
+    status, body = get_page(client, offset=-3, limit=2)
+    assert status == 200 and body['offset'] == 0 and body['words'] == word_game.WORDS[:2]
+    status, body = get_page(client, offset=count + 5)
+    assert status == 200 and body['words'] == [] and body['next_offset'] is None
+    status, body = get_page(client, offset=count - 1, limit=5)
+    assert body['words'] == word_game.WORDS[-1:] and body['next_offset'] is None
+
+
+@pytest.mark.parametrize('params', [{'offset': 'x'}, {'limit': '1.5'}])
+def test_non_integer_paging_is_rejected(client, params):
+    status, body = get_page(client, **params)
+    assert status == 400 and body['status'] == 'error'
+
+
+def fake_test_case(i, test_case, student_func, profiler=None):
+    student_func(test_case['target'], [])
+    return {'test_number': i + 1, 'passed': True}
+
+
+def make_cases(*targets):
+    return [{'target': target, 'description': target} for target in targets]
+
+
+def test_each_test_case_gets_its_own_timeout(monkeypatch):
+    monkeypatch.setattr(word_game, '_timed_test_case', fake_test_case)
+    monkeypatch.setattr(word_game, 'TEST_CASE_THREADS', 1)
+    monkeypatch.setattr(word_game, 'TEST_CASE_TIMEOUT', 0.5)
+    # Together well over the timeout, each one well within it
+    results = [result for _, _, result in word_game._run_test_cases(
+        make_cases('a', 'b', 'c', 'd'), lambda target, words: time.sleep(0.2))]
+    assert [result['passed'] for result in results] == [True] * 4
+
+
+def test_test_cases_behind_stuck_threads_are_reported_as_not_run(monkeypatch):
+    monkeypatch.setattr(word_game, '_timed_test_case', fake_test_case)
+    monkeypatch.setattr(word_game, 'TEST_CASE_THREADS', 2)
+    monkeypatch.setattr(word_game, 'TEST_CASE_TIMEOUT', 0.2)
+    release = threading.Event()
+
+    def student_func(target, words):
+        if target.startswith('hang'):
+            release.wait()
+
+    try:
+        results = [result for _, _, result in word_game._run_test_cases(
+            make_cases('fast', 'hang1', 'hang2', 'late1', 'late2'), student_func)]
+    finally:
+        release.set()
+    assert results[0]['passed']
+    assert results[1]['timed_out'] and results[2]['timed_out']
+    assert results[3]['not_run'] and results[4]['not_run']
+    assert results[3]['error'].startswith('Not run')
+
+
+PROFILED_CODE = """
+import time
+
+running = []
+
+def compute_embedding(word):
+    return None
+
+def rank_words_by_similarity(target, words):
+    running.append(target)
+    overlap = len(running)
+    time.sleep(0.05)
+    running.remove(target)
+    return overlap
+"""
+
+
+def test_profiled_submission_runs_its_test_cases_one_at_a_time(monkeypatch):
+    def fake_run_test_case(i, test_case, student_func):
+        return {'test_number': i + 1, 'passed': True, 'overlap': student_func(test_case['target'], [])}
+
+    monkeypatch.setattr(word_game, 'run_test_case', fake_run_test_case)
+    monkeypatch.setattr(word_game, 'TEST_CASE_THREADS', 4)
+    test_cases = [dict(case, expected_output={}) for case in make_cases('a', 'b', 'c', 'd')]
+    body, status = word_game.grade_submission(PROFILED_CODE, test_cases=test_cases, profile=True)
+    assert status == 200 and body['passed'] == 4
+    assert [result['overlap'] for result in body['test_results']] == [1] * 4
+    performance = body['performance']
+    assert len(performance['test_cases']) == 4
+    assert performance['functions_incomplete'] is False
+    assert performance['your_functions'][0]['function'].startswith('rank_words_by_similarity')
+    assert performance['your_functions'][0]['calls'] == 4
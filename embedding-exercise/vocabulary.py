@@ -0,0 +1,45 @@
+"""
+Word lists for the exercise.
+
+External word lists can hold hundreds of thousands of entries, so they are
+read line by line and deduplicated on the fly rather than loaded and then
+filtered. Kept free of NumPy so reading the vocabulary stays on the fast
+import path.
+"""
+import gzip
+from typing import Iterator, List, Optional
+
+
+def iter_word_list(path: str) -> Iterator[str]:
+    """
+    Stream words from a text file (optionally gzip-compressed).
+
+    One word per line; blank lines and lines starting with '#' are skipped,
+    surrounding whitespace is stripped and words are lower-cased.
+    """
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            word = line.strip().lower()
+            if word and not word.startswith('#'):
+                yield word
+
+
+def read_word_list(path: str, limit: Optional[int] = None) -> List[str]:
+    """
+    Load a word list, dropping duplicates (first occurrence wins).
+
+    Args:
+        path: Text file with one word per line (.gz allowed)
+        limit: Stop after this many unique words (None = read everything)
+    """
+    seen = set()
+    words = []
+    for word in iter_word_list(path):
+        if word in seen:
+            continue
+        seen.add(word)
+        words.append(word)
+        if limit is not None and len(words) >= limit:
+            break
+    return words
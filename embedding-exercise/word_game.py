@@ -1,28 +1,101 @@
-from flask import Flask, jsonify, request, render_template
+import time
+# Cold-start clock: reported as time-to-first-byte by /api/ready
+PROCESS_STARTED = time.perf_counter()
+
+from flask import Flask, Response, g, jsonify, request, render_template
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
-from typing import List, Dict, Tuple
+from typing import Callable, List, Dict, Optional, Tuple
+from functools import wraps
 import traceback
-import sys
-from io import StringIO
 import math
-from collections import Counter
+import heapq
+from collections import Counter, OrderedDict
+import atexit
+import json
+import os
+import queue
+import threading
+from sandbox import (ForkServer, GradingPool, OutputCapture, SandboxBusy, SandboxError, bind_capture,
+                     capture_output, fork_available, retire_worker)
+from admission import AdmissionController, AdmissionRejected
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY as METRICS
+from sessions import SessionStore
+from vocabulary import read_word_list
+
+# Served at /metrics; grading workers send theirs back with every result
+HTTP_REQUEST_SECONDS = METRICS.histogram(
+    'http_request_duration_seconds', 'Time to handle a request (until the response is returned)',
+    ['route', 'method', 'status'])
+RESPONSE_SERIALIZE_SECONDS = METRICS.histogram(
+    'http_response_serialize_seconds', 'Time spent serialising JSON response bodies', ['route'])
+GRADING_EXEC_SECONDS = METRICS.histogram('grading_exec_seconds', 'exec() of the submitted code')
+GRADING_TEST_CASE_SECONDS = METRICS.histogram(
+    'grading_test_case_seconds', "One test case: the student's function plus scoring", ['outcome'])
+GRADING_SUBMISSION_SECONDS = METRICS.histogram(
+    'grading_submission_seconds', 'Whole grading of a submission (excluding result cache hits)', ['status'])
+
+class _TimedJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider, recording serialisation time per route"""
+
+    def dumps(self, obj, **kwargs):
+        if not request:
+            return super().dumps(obj, **kwargs)
+        with RESPONSE_SERIALIZE_SECONDS.time(route=_metrics_route()):
+            return super().dumps(obj, **kwargs)
 
 app = Flask(__name__)
+app.json = _TimedJSONProvider(app)
 CORS(app)
 
-# Try to load sentence transformer model (optional advanced feature)
+def _metrics_route() -> str:
+    """Route pattern of the current request (not the raw path, to bound label cardinality)"""
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+MODEL_NAME = 'all-MiniLM-L6-v2'
+# Embeddings are cached here between restarts (memory-mapped .npy files)
+EMBEDDING_CACHE_DIR = os.environ.get(
+    'EMBEDDING_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.embedding_cache')
+)
+
+# FAST_START=1 binds the port right away and runs warm_up() in a background
+# thread; model-dependent routes answer 503 + Retry-After until it finishes
+FAST_START = os.environ.get('FAST_START', '').lower() in ('1', 'true', 'yes')
+WARM_UP_RETRY_AFTER = int(os.environ.get('WARM_UP_RETRY_AFTER', 5))
+
+# Sentence transformer model (optional advanced feature), numpy and the
+# numpy-based grading module, all imported and loaded by warm_up() so the heavy
+# imports stay off the import path
 sentence_model = None
 np = None
-try:
-    import numpy as np_import
-    from sentence_transformers import SentenceTransformer
-    print("Loading sentence transformer model...")
-    sentence_model = SentenceTransformer('all-MiniLM-L6-v2')
-    np = np_import
-    print("✓ Model loaded! Students can use 'model' and 'np' for advanced embeddings.")
-except Exception as e:
-    print(f"⚠  Sentence transformers not available (optional): {str(e)[:50]}...")
-    print("✓ Character-based embeddings will work fine!")
+grading = None
+
+MODEL_MISSING_MESSAGE = 'Sentence transformers model not loaded. Install dependencies: pip install sentence-transformers torch'
+WARMING_UP_MESSAGE = 'The model is still loading, please try again in a few seconds'
+
+# Warm-up progress: idle -> loading -> ready (or failed)
+_warm_up_state = {'state': 'idle', 'started': None, 'seconds': None, 'error': None, 'first_byte': None}
+_warm_up_lock = threading.Lock()
+
+def requires_warm_up(view):
+    """Answer 503 with Retry-After until warm_up() has finished"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        # Under a WSGI server (no __main__) the first request starts the warm-up
+        start_warm_up()
+        state = _warm_up_state['state']
+        if state == 'ready':
+            return view(*args, **kwargs)
+        if state == 'failed':
+            message = f"Warm-up failed: {_warm_up_state['error']}"
+            headers = {}
+        else:
+            message = WARMING_UP_MESSAGE
+            headers = {'Retry-After': str(WARM_UP_RETRY_AFTER)}
+        body = _error_response(message)
+        body['error'] = message
+        return jsonify(body), 503, headers
+    return wrapper
 
 # Diverse word list - different lengths and categories
 WORDS = [
@@ -48,6 +121,34 @@ WORDS = [
     "car", "bus", "train", "plane", "boat", "bicycle", "motorcycle", "truck", "subway", "helicopter"
 ]
 
+# Large-vocabulary mode: WORD_LIST_PATH replaces WORDS with an external word
+# list (one word per line, .gz allowed), streamed from disk and deduplicated
+WORD_LIST_PATH = os.environ.get('WORD_LIST_PATH')
+if WORD_LIST_PATH:
+    WORDS = read_word_list(WORD_LIST_PATH, limit=int(os.environ.get('WORD_LIST_LIMIT', 0)) or None)
+    print(f"✓ Loaded {len(WORDS)} words from {WORD_LIST_PATH}")
+
+# Vocabulary embedding: words per encode call, and words per get_exercise page
+EMBEDDING_CHUNK_SIZE = int(os.environ.get('EMBEDDING_CHUNK_SIZE', 2048))
+WORDS_PAGE_SIZE = int(os.environ.get('WORDS_PAGE_SIZE', 1000))
+# Shared encode cache behind the student-facing 'model'
+ENCODE_CACHE_SIZE = int(os.environ.get('ENCODE_CACHE_SIZE', 10000))
+# Vocabulary matrix storage: float32, float16 (half the memory) or int8 (a quarter)
+EMBEDDING_PRECISION = os.environ.get('EMBEDDING_PRECISION', 'float32').lower()
+# Largest vocabulary the float32 rank-agreement check runs on during warm-up
+PRECISION_REPORT_MAX_WORDS = int(os.environ.get('PRECISION_REPORT_MAX_WORDS', 10000))
+# Randomized grading: at most this many sampled targets per submission. The
+# targets come from the answer key when it has extra targets, otherwise up to
+# RANDOM_TARGET_POOL vocabulary words are ranked at warm-up (vocabularies of
+# at most RANDOM_POOL_MAX_WORDS words only)
+RANDOM_GRADING_MAX_K = int(os.environ.get('RANDOM_GRADING_MAX_K', 100))
+RANDOM_TARGET_POOL = int(os.environ.get('RANDOM_TARGET_POOL', 1000))
+RANDOM_POOL_MAX_WORDS = int(os.environ.get('RANDOM_POOL_MAX_WORDS', 10000))
+# Precompiled expected answers (python answer_key.py); empty = always compute them live
+ANSWER_KEY_PATH = os.environ.get(
+    'ANSWER_KEY_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'answer_key.npz')
+) or None
+
 def compute_char_vector(word: str) -> Dict[str, float]:
     """Create a character frequency vector for a word"""
     counter = Counter(word.lower())
@@ -94,6 +195,117 @@ def cosine_similarity(vec1, vec2) -> float:
             return 0.0
         return dot_product / (mag1 * mag2)
 
+def _norm(vec) -> float:
+    values = vec.values() if isinstance(vec, dict) else vec
+    return math.sqrt(sum(float(v) * float(v) for v in values))
+
+def _dot(vec1, vec2) -> float:
+    if isinstance(vec1, dict):
+        return sum(value * vec2.get(key, 0) for key, value in vec1.items())
+    return sum(float(a) * float(b) for a, b in zip(vec1, vec2))
+
+def cosine_similarities(query, vectors):
+    """
+    Cosine similarity of one vector against many, in one batched operation.
+
+    Args:
+        query: One vector (numpy array, list of numbers, or dict)
+        vectors: Many vectors of the same kind (2-D numpy array, e.g. the
+            result of model.encode(words), or a list of vectors)
+
+    Returns:
+        numpy array of similarities, one per row (a list without numpy or for dicts)
+    """
+    if np is not None and not isinstance(query, dict):
+        matrix = np.asarray(vectors)
+        query = np.asarray(query)
+        if not np.issubdtype(matrix.dtype, np.floating):
+            matrix = matrix.astype(np.float64)
+        if matrix.size == 0:
+            return np.zeros(len(matrix), dtype=matrix.dtype)
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+        dots = matrix @ query
+        return np.divide(dots, norms, out=np.zeros_like(dots), where=norms != 0)
+
+    # Pure-Python path: the query norm is computed once, not once per pair
+    query_norm = _norm(query)
+    similarities = []
+    for vec in vectors:
+        denominator = query_norm * _norm(vec)
+        similarities.append(_dot(query, vec) / denominator if denominator else 0.0)
+    return similarities
+
+def cosine_similarity_matrix(vectors1, vectors2=None):
+    """
+    Pairwise cosine similarities between two sets of vectors.
+
+    Args:
+        vectors1: Many vectors (2-D numpy array or list of vectors)
+        vectors2: Many vectors (defaults to vectors1)
+
+    Returns:
+        Matrix where [i][j] is the similarity of vectors1[i] and vectors2[j]
+        (numpy array, or list of lists without numpy or for dicts)
+    """
+    if vectors2 is None:
+        vectors2 = vectors1
+    if np is not None and not (len(vectors1) and isinstance(vectors1[0], dict)):
+        a = np.asarray(vectors1)
+        b = np.asarray(vectors2)
+        if not np.issubdtype(a.dtype, np.floating):
+            a = a.astype(np.float64)
+        if not np.issubdtype(b.dtype, np.floating):
+            b = b.astype(np.float64)
+        if a.size == 0 or b.size == 0:
+            return np.zeros((len(a), len(b)), dtype=np.result_type(a, b))
+        norms_a = np.linalg.norm(a, axis=1, keepdims=True)
+        norms_b = np.linalg.norm(b, axis=1, keepdims=True)
+        norms_a[norms_a == 0] = 1
+        norms_b[norms_b == 0] = 1
+        return (a / norms_a) @ (b / norms_b).T
+
+    norms2 = [_norm(vec) for vec in vectors2]
+    matrix = []
+    for vec1 in vectors1:
+        norm1 = _norm(vec1)
+        matrix.append([_dot(vec1, vec2) / (norm1 * norm2) if norm1 and norm2 else 0.0
+                       for vec2, norm2 in zip(vectors2, norms2)])
+    return matrix
+
+def rank_by_similarity(query, vectors, words: List[str], top_k: Optional[int] = None) -> Dict[str, int]:
+    """
+    Rank words by the cosine similarity of their vectors to query.
+
+    Ties keep their original order, exactly like sorting (word, similarity)
+    tuples with reverse=True.
+
+    Args:
+        query: Target vector
+        vectors: One vector per word (e.g. model.encode(words))
+        words: The words, in the same order as vectors
+        top_k: Only rank the k most similar words (found with argpartition)
+
+    Returns:
+        dict: {word: rank} with 1 = most similar
+    """
+    similarities = cosine_similarities(query, vectors)
+    n = len(words)
+    k = n if top_k is None else max(0, min(top_k, n))
+
+    if np is not None and hasattr(similarities, 'shape'):
+        if k < n and k > 0:
+            # Partition to the k best, keeping every word tied with the k-th
+            # so the stable sort below breaks ties by position
+            kth = similarities[np.argpartition(-similarities, k - 1)[k - 1]]
+            candidates = np.flatnonzero(similarities >= kth)
+        else:
+            candidates = np.arange(n)
+        order = candidates[np.argsort(-similarities[candidates], kind='stable')][:k].tolist()
+    else:
+        order = heapq.nsmallest(k, range(n), key=lambda i: (-similarities[i], i))
+
+    return {words[i]: rank for rank, i in enumerate(order, start=1)}
+
 # Pre-compute correct answers for test cases
 TEST_CASES = [
     {"target": "cat", "description": "Find words similar to 'cat'"},
@@ -103,10 +315,40 @@ TEST_CASES = [
     {"target": "guitar", "description": "Find words similar to 'guitar'"}
 ]
 
+# Vocabulary embedding store: WORDS and every test target encoded in one batch
+# (or loaded from the on-disk cache). Shared by every endpoint that needs similarities.
+embedding_store = None
+
+# Pool of pre-forked grading processes (see start_grading_pool) and the
+# single-threaded process that forks them (see start_fork_server)
+grading_pool = None
+fork_server = None
+
+# Rank agreement of the reduced-precision matrix with float32 on TEST_CASES
+# (see /api/precision_report); None until computed
+precision_report = None
+
+# Answer key the expected outputs were loaded from, or why grading is refused
+# because it does not match the live model / word list
+answer_key = None
+answer_key_error = None
+# Target x vocabulary expected ranks that randomized grading samples from (an AnswerKey)
+target_pool = None
+
+# Shared-memory block holding the large read-only arrays once share_state()
+# has run (multi-process server, see serve.py)
+shared_state = None
+
+# The 'model' students see: same encode() results as sentence_model, but
+# repeated words come from a shared LRU cache and misses are batched
+model_proxy = None
+# Cache misses from concurrent requests are merged into shared forward passes
+inference_scheduler = None
+
 def generate_correct_answer(target: str, word_list: List[str]) -> Dict[str, int]:
     """Generate the correct ranking using sentence transformers (semantic similarity)"""
-    if sentence_model is None or np is None:
-        # Fallback to character-based if sentence transformers not available
+    if embedding_store is None:
+        # Fallback to character-based if neither sentence transformers nor numpy is available
         print("Warning: Using character-based similarity for answers (sentence transformers not available)")
         similarities = []
         for word in word_list:
@@ -117,17 +359,9 @@ def generate_correct_answer(target: str, word_list: List[str]) -> Dict[str, int]
     else:
         # Use sentence transformers for SEMANTIC similarity
         # This captures word relationships (e.g., "mouse" + "computer")
-        target_embedding = sentence_model.encode([target])[0]
-
-        similarities = []
-        for word in word_list:
-            word_embedding = sentence_model.encode([word])[0]
-
-            # Compute cosine similarity between semantic embeddings
-            sim = np.dot(target_embedding, word_embedding) / (
-                np.linalg.norm(target_embedding) * np.linalg.norm(word_embedding)
-            )
-            similarities.append((word, float(sim)))
+        # One matrix-vector product against the precomputed vocabulary matrix
+        # (hashed character n-gram vectors when the model is not installed)
+        return embedding_store.rank(target, word_list)
 
     # Sort by similarity (descending)
     similarities.sort(key=lambda x: x[1], reverse=True)
@@ -139,9 +373,8 @@ def generate_correct_answer(target: str, word_list: List[str]) -> Dict[str, int]
 
     return ranking_dict
 
-# Pre-compute correct answers
-for test_case in TEST_CASES:
-    test_case['expected_output'] = generate_correct_answer(test_case['target'], WORDS)
+# Identical (normalised) submissions are graded once per test set + model version
+result_cache = None
 
 @app.route('/')
 def index():
@@ -149,9 +382,25 @@ def index():
 
 @app.route('/api/get_exercise', methods=['GET'])
 def get_exercise():
-    """Return the exercise details"""
+    """
+    Return the exercise details.
+
+    The word list is paged: ?offset=N&limit=M (default limit WORDS_PAGE_SIZE);
+    next_offset is null on the last page.
+    """
+    try:
+        offset = max(0, int(request.args.get('offset', 0)))
+        limit = max(1, min(int(request.args.get('limit', WORDS_PAGE_SIZE)), WORDS_PAGE_SIZE))
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'offset and limit must be integers'}), 400
+    page = WORDS[offset:offset + limit]
+    next_offset = offset + len(page)
     return jsonify({
-        'words': WORDS,
+        'words': page,
+        'word_count': len(WORDS),
+        'offset': offset,
+        'limit': limit,
+        'next_offset': next_offset if next_offset < len(WORDS) else None,
         'test_cases': [
             {
                 'target': tc['target'],
@@ -186,6 +435,9 @@ Rank words by SEMANTIC similarity to target using neural embeddings.
 - `math` - mathematical operations
 - `Counter` - from collections (if needed)
 - `cosine_similarity(vec1, vec2)` - compute similarity between vectors
+- `cosine_similarities(query, vectors)` - similarity of one vector to every row of a 2-D array
+- `cosine_similarity_matrix(vectors1, vectors2)` - all pairwise similarities at once
+- `rank_by_similarity(query, vectors, words, top_k=None)` - {word: rank} dict (optionally only the top k)
 
 ## Algorithm Steps
 1. Get target embedding: `model.encode([target])[0]`
@@ -215,218 +467,679 @@ def get_test_cases():
         ]
     })
 
-@app.route('/api/submit_solution', methods=['POST'])
-def submit_solution():
-    """Submit and grade the student's solution"""
-    data = request.json
-    code = data.get('code', '')
+# Test cases of a submission run in parallel on up to this many threads of its own
+TEST_CASE_THREADS = int(os.environ.get('TEST_CASE_THREADS', 8))
+TEST_CASE_TIMEOUT = float(os.environ.get('TEST_CASE_TIMEOUT', 8))
+# Admission control for submissions: at most ADMISSION_MAX_CONCURRENT are graded
+# at once (default: one per grading worker), up to ADMISSION_MAX_QUEUE more wait
+# for ADMISSION_QUEUE_TIMEOUT seconds, and the rest get 429 + Retry-After
+admission = AdmissionController(
+    int(os.environ.get('ADMISSION_MAX_CONCURRENT', 0))
+    or int(os.environ.get('GRADING_WORKERS', os.cpu_count() or 1)) or (os.cpu_count() or 1),
+    max_queue=int(os.environ.get('ADMISSION_MAX_QUEUE', 32)),
+    queue_timeout=float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', 30)),
+)
+# Hottest functions listed in a profiled submission's performance report
+PROFILE_TOP_N = int(os.environ.get('PROFILE_TOP_N', 10))
+
+def _run_test_cases(test_cases: List[Dict], student_func, profiler=None):
+    """
+    Run the test cases on daemon threads belonging to this submission only.
+
+    Yields (i, test_case, result) in order. Each test case gets TEST_CASE_TIMEOUT
+    seconds from the moment a thread starts it; one still running then is
+    reported with ``timed_out``. A thread stuck in student code (e.g.
+    ``while True: pass``) cannot be stopped, but it is never handed to another
+    submission and does not keep the interpreter from exiting. Once every
+    thread is stuck, the test cases nobody started are reported with
+    ``not_run`` rather than waited for. A profiled submission uses a single
+    thread, since cProfile can only follow one thread at a time.
+    """
+    pending = queue.SimpleQueue()
+    for i, test_case in enumerate(test_cases):
+        pending.put((i, test_case))
+    results = [None] * len(test_cases)
+    started_at = [None] * len(test_cases)
+    finished = [threading.Event() for _ in test_cases]
+    # Notified whenever a test case starts or finishes
+    changed = threading.Condition()
+    abandoned = False
+    run = bind_capture(_timed_test_case)
+
+    def work():
+        while True:
+            with changed:
+                if abandoned:
+                    return
+                try:
+                    i, test_case = pending.get_nowait()
+                except queue.Empty:
+                    return
+                started_at[i] = time.monotonic()
+                changed.notify_all()
+            try:
+                results[i] = run(i, test_case, student_func, profiler)
+            except BaseException as e:  # e.g. SystemExit raised inside the student's function
+                results[i] = _failed_test_case(i, test_case, f'Runtime error: {type(e).__name__}: {str(e)}')
+            with changed:
+                finished[i].set()
+                changed.notify_all()
+
+    thread_count = min(max(1, TEST_CASE_THREADS if profiler is None else 1), len(test_cases))
+    for n in range(thread_count):
+        threading.Thread(target=work, name=f'test-case-{n}', daemon=True).start()
+    timed_out = []
+    try:
+        for i, test_case in enumerate(test_cases):
+            with changed:
+                while True:
+                    if finished[i].is_set():
+                        result = results[i]
+                        break
+                    if started_at[i] is not None:
+                        remaining = started_at[i] + TEST_CASE_TIMEOUT - time.monotonic()
+                        if remaining <= 0:
+                            timed_out.append(i)
+                            result = dict(_failed_test_case(
+                                i, test_case, f'Timed out after {TEST_CASE_TIMEOUT:g} seconds'), timed_out=True)
+                            break
+                        changed.wait(remaining)
+                    elif sum(not finished[j].is_set() for j in timed_out) >= thread_count:
+                        # Test cases are started in order, so none after this one will start either
+                        abandoned = True
+                        result = dict(_failed_test_case(
+                            i, test_case, 'Not run: every test-case thread is stuck in a timed-out test case'),
+                            not_run=True)
+                        break
+                    else:
+                        changed.wait()
+            yield i, test_case, result
+    finally:
+        with changed:
+            abandoned = True
+
+def _failed_test_case(i: int, test_case: Dict, error: str) -> Dict:
+    return {
+        'test_number': i + 1,
+        'target': test_case['target'],
+        'description': test_case['description'],
+        'passed': False,
+        'error': error,
+    }
+
+def run_test_case(i: int, test_case: Dict, student_func) -> Dict:
+    """Run the student's function on one test case and score it against the expected ranking"""
+    target = test_case['target']
+    expected = test_case['expected_output']
+
+    try:
+        # Run student's function
+        student_result = student_func(target, WORDS.copy())
+
+        # Validate output type
+        if not isinstance(student_result, dict):
+            return {
+                'test_number': i + 1,
+                'target': target,
+                'description': test_case['description'],
+                'passed': False,
+                'error': f'Expected a dictionary, got {type(student_result).__name__}',
+                'expected_length': len(expected),
+                'actual_length': 0
+            }
 
-    # Capture stdout first
-    old_stdout = sys.stdout
-    sys.stdout = output = StringIO()
+        # Check if all words are present
+        if len(student_result) != len(expected):
+            return {
+                'test_number': i + 1,
+                'target': target,
+                'description': test_case['description'],
+                'passed': False,
+                'error': f'Expected {len(expected)} words in dictionary, got {len(student_result)}',
+                'expected_length': len(expected),
+                'actual_length': len(student_result)
+            }
 
+        # Check if all words from WORDS are in the result
+        missing_words = set(WORDS) - set(student_result.keys())
+        if missing_words:
+            return {
+                'test_number': i + 1,
+                'target': target,
+                'description': test_case['description'],
+                'passed': False,
+                'error': f'Missing {len(missing_words)} words from dictionary. Example: {list(missing_words)[:3]}',
+                'expected_length': len(expected),
+                'actual_length': len(student_result)
+            }
+
+        # All metrics in one vectorized pass over the aligned rank arrays
+        metrics = test_case['grading_key'].score(student_result)
+        exact_accuracy = metrics['exact_accuracy']
+        rank_closeness = metrics['rank_closeness']
+        top_10_accuracy = metrics['top_10_accuracy']
+        avg_rank_diff = metrics['avg_rank_diff']
+
+        # Pass if very close on ranks OR top 10 is mostly correct
+        passed = grading.passes(metrics)
+
+        # Top 5 words for display
+        student_top_5 = metrics['student_top']
+        expected_top_5 = metrics['expected_top']
+
+        return {
+            'test_number': i + 1,
+            'target': target,
+            'description': test_case['description'],
+            'passed': passed,
+            'exact_accuracy': round(exact_accuracy * 100, 1),
+            'rank_closeness': round(rank_closeness * 100, 1),
+            'top_10_accuracy': round(top_10_accuracy * 100, 1),
+            'avg_rank_diff': round(avg_rank_diff, 1),
+            'spearman': round(metrics['spearman'], 3),
+            'kendall_tau': round(metrics['kendall_tau'], 3),
+            'your_top_5': [f"{word} (rank {rank})" for word, rank in student_top_5],
+            'expected_top_5': [f"{word} (rank {rank})" for word, rank in expected_top_5],
+            'expected_length': len(expected),
+            'actual_length': len(student_result)
+        }
+
+    except Exception as e:
+        return {
+            'test_number': i + 1,
+            'target': target,
+            'description': test_case['description'],
+            'passed': False,
+            'error': f'Runtime error: {str(e)}',
+            'traceback': traceback.format_exc()
+        }
+
+def _timed_test_case(i: int, test_case: Dict, student_func, profiler=None) -> Dict:
+    started = time.perf_counter()
+    result = run_test_case(i, test_case, student_func)
+    elapsed = time.perf_counter() - started
+    outcome = 'passed' if result['passed'] else ('error' if 'error' in result else 'failed')
+    GRADING_TEST_CASE_SECONDS.observe(elapsed, outcome=outcome)
+    if profiler is not None:
+        profiler.record_test_case(test_case['target'], elapsed, result['passed'])
+    return result
+
+def grade_submission(code: str, emit: Optional[Callable[[Dict], None]] = None,
+                     test_cases: Optional[List[Dict]] = None, profile: bool = False) -> Tuple[Dict, int]:
+    """
+    Execute and grade a student's solution.
+
+    Runs inside a grading worker process when the pool is enabled, otherwise
+    in the calling thread. print() output is captured per thread, so
+    concurrent submissions never mix their console output.
+
+    Args:
+        code: Student source code
+        emit: Optional callback for streamed progress events
+              ({'type': 'output', 'text': ...} and {'type': 'test_result', 'result': ...})
+        test_cases: Test cases to grade against (default TEST_CASES)
+        profile: Add a 'performance' section (time per test case, encode
+                 calls, peak memory, hottest functions; see profiling.py)
+
+    Returns:
+        tuple: (JSON-serialisable response body, HTTP status code)
+    """
+    on_write = (lambda text: emit({'type': 'output', 'text': text})) if emit is not None else None
+    test_cases = TEST_CASES if test_cases is None else test_cases
+    with capture_output(on_write=on_write) as output:
+        if not profile:
+            return _grade_captured(code, output, emit, test_cases)
+        from profiling import SubmissionProfiler
+        with SubmissionProfiler(model_proxy, top_n=PROFILE_TOP_N) as profiler:
+            body, status_code = _grade_captured(code, output, emit, test_cases, profiler)
+    body['performance'] = profiler.report(len(test_cases))
+    return body, status_code
+
+def _grade_captured(code: str, output: OutputCapture, emit: Optional[Callable[[Dict], None]],
+                    test_cases: List[Dict], profiler=None) -> Tuple[Dict, int]:
+    """Body of grade_submission, run while stdout is being captured"""
     # Create a safe namespace for execution
     namespace = {
         'math': math,
         'Counter': Counter,
         'cosine_similarity': cosine_similarity,
-        'model': sentence_model,
+        'cosine_similarities': cosine_similarities,
+        'cosine_similarity_matrix': cosine_similarity_matrix,
+        'rank_by_similarity': rank_by_similarity,
+        'model': profiler.model if profiler is not None else model_proxy,
         'np': np,
     }
 
-    # Check if sentence transformers is available
-    if sentence_model is None:
-        sys.stdout = old_stdout
-        return jsonify({
-            'status': 'error',
-            'message': 'Sentence transformers model not loaded. Install dependencies: pip install sentence-transformers torch',
-            'passed': 0,
-            'total': len(TEST_CASES),
-            'test_results': []
-        }), 400
-
     try:
         # Execute the student's code
-        exec(code, namespace)
+        with GRADING_EXEC_SECONDS.time():
+            if profiler is None:
+                exec(code, namespace)
+            else:
+                profiler.run('exec', exec, code, namespace)
 
         # Check if BOTH required functions exist
         if 'compute_embedding' not in namespace:
-            sys.stdout = old_stdout
-            return jsonify({
+            return {
                 'status': 'error',
                 'message': 'Function "compute_embedding" not found in your code. You must implement this function!',
                 'passed': 0,
-                'total': len(TEST_CASES),
+                'total': len(test_cases),
                 'test_results': []
-            }), 400
+            }, 400
 
         if 'rank_words_by_similarity' not in namespace:
-            sys.stdout = old_stdout
-            return jsonify({
+            return {
                 'status': 'error',
                 'message': 'Function "rank_words_by_similarity" not found in your code',
                 'passed': 0,
-                'total': len(TEST_CASES),
+                'total': len(test_cases),
                 'test_results': []
-            }), 400
+            }, 400
 
         student_compute_embedding = namespace['compute_embedding']
         student_func = namespace['rank_words_by_similarity']
+        if profiler is not None:
+            student_func = profiler.wrap(student_func)
 
         # Add student's compute_embedding to namespace so rank_words_by_similarity can use it
         namespace['compute_embedding'] = student_compute_embedding
 
-        # Run all test cases
+        # Run all test cases concurrently (model.encode releases the GIL),
+        # or one at a time when profiled, collecting results back in order
+        for i, test_case in enumerate(test_cases):
+            if test_case.get('expected_output') is None:
+                raise ValueError(f"No expected_output for test case {i+1}: {test_case['target']}")
+
         test_results = []
         passed_count = 0
 
-        for i, test_case in enumerate(TEST_CASES):
-            target = test_case['target']
-            expected = test_case.get('expected_output')
-            if expected is None:
-                raise ValueError(f"No expected_output for test case {i+1}: {target}")
+        for i, test_case, result in _run_test_cases(test_cases, student_func, profiler):
+            if result.get('timed_out'):
+                # Its thread may still be running: in a grading worker, have
+                # the pool replace the process rather than reuse it
+                retire_worker()
+            test_results.append(result)
+            if result['passed']:
+                passed_count += 1
+            if emit is not None:
+                output.flush()
+                emit({'type': 'test_result', 'result': result})
 
-            try:
-                # Run student's function
-                student_result = student_func(target, WORDS.copy())
-
-                # Validate output type
-                if not isinstance(student_result, dict):
-                    test_results.append({
-                        'test_number': i + 1,
-                        'target': target,
-                        'description': test_case['description'],
-                        'passed': False,
-                        'error': f'Expected a dictionary, got {type(student_result).__name__}',
-                        'expected_length': len(expected),
-                        'actual_length': 0
-                    })
-                    continue
-
-                # Check if all words are present
-                if len(student_result) != len(expected):
-                    test_results.append({
-                        'test_number': i + 1,
-                        'target': target,
-                        'description': test_case['description'],
-                        'passed': False,
-                        'error': f'Expected {len(expected)} words in dictionary, got {len(student_result)}',
-                        'expected_length': len(expected),
-                        'actual_length': len(student_result)
-                    })
-                    continue
-
-                # Check if all words from WORDS are in the result
-                missing_words = set(WORDS) - set(student_result.keys())
-                if missing_words:
-                    test_results.append({
-                        'test_number': i + 1,
-                        'target': target,
-                        'description': test_case['description'],
-                        'passed': False,
-                        'error': f'Missing {len(missing_words)} words from dictionary. Example: {list(missing_words)[:3]}',
-                        'expected_length': len(expected),
-                        'actual_length': len(student_result)
-                    })
-                    continue
-
-                # Calculate ranking accuracy
-                # Count how many words have the exact correct rank
-                exact_matches = sum(1 for word in WORDS if student_result.get(word) == expected.get(word))
-                exact_accuracy = exact_matches / len(WORDS)
-
-                # Calculate how close ranks are on average
-                rank_differences = []
-                for word in WORDS:
-                    student_rank = student_result.get(word, 999)
-                    expected_rank = expected.get(word, 999)
-                    rank_differences.append(abs(student_rank - expected_rank))
-
-                avg_rank_diff = sum(rank_differences) / len(rank_differences)
-                rank_closeness = max(0, 1 - (avg_rank_diff / 50))  # 50 positions off = 0% closeness
-
-                # Check top 10
-                student_top_10 = sorted(student_result.items(), key=lambda x: x[1])[:10]
-                student_top_10_words = set([word for word, rank in student_top_10])
-
-                expected_top_10 = sorted(expected.items(), key=lambda x: x[1])[:10]
-                expected_top_10_words = set([word for word, rank in expected_top_10])
-
-                top_10_overlap = len(student_top_10_words & expected_top_10_words)
-                top_10_accuracy = top_10_overlap / 10
-
-                # Pass if very close on ranks OR top 10 is mostly correct
-                passed = exact_accuracy > 0.5 or rank_closeness > 0.8 or top_10_accuracy >= 0.8
-
-                if passed:
-                    passed_count += 1
-
-                # Get top 5 words for display
-                student_top_5 = sorted(student_result.items(), key=lambda x: x[1])[:5]
-                expected_top_5 = sorted(expected.items(), key=lambda x: x[1])[:5]
-
-                test_results.append({
-                    'test_number': i + 1,
-                    'target': target,
-                    'description': test_case['description'],
-                    'passed': passed,
-                    'exact_accuracy': round(exact_accuracy * 100, 1),
-                    'rank_closeness': round(rank_closeness * 100, 1),
-                    'top_10_accuracy': round(top_10_accuracy * 100, 1),
-                    'avg_rank_diff': round(avg_rank_diff, 1),
-                    'your_top_5': [f"{word} (rank {rank})" for word, rank in student_top_5],
-                    'expected_top_5': [f"{word} (rank {rank})" for word, rank in expected_top_5],
-                    'expected_length': len(expected),
-                    'actual_length': len(student_result)
-                })
-
-            except Exception as e:
-                test_results.append({
-                    'test_number': i + 1,
-                    'target': target,
-                    'description': test_case['description'],
-                    'passed': False,
-                    'error': f'Runtime error: {str(e)}',
-                    'traceback': traceback.format_exc()
-                })
-
-        sys.stdout = old_stdout
+        output.flush()
         console_output = output.getvalue()
 
         # Determine overall status
-        all_passed = passed_count == len(TEST_CASES)
+        all_passed = passed_count == len(test_cases)
         status = 'success' if all_passed else 'partial'
 
-        return jsonify({
+        return {
             'status': status,
             'passed': passed_count,
-            'total': len(TEST_CASES),
+            'total': len(test_cases),
             'test_results': test_results,
             'console_output': console_output,
-            'message': f'✓ Passed {passed_count}/{len(TEST_CASES)} test cases' if passed_count > 0 else 'No tests passed. Check your implementation.'
-        })
+            'message': f'✓ Passed {passed_count}/{len(test_cases)} test cases' if passed_count > 0 else 'No tests passed. Check your implementation.'
+        }, 200
 
     except SyntaxError as e:
-        sys.stdout = old_stdout
-        return jsonify({
+        return {
             'status': 'error',
             'message': f'Syntax Error: {str(e)}',
             'traceback': traceback.format_exc(),
             'passed': 0,
-            'total': len(TEST_CASES),
+            'total': len(test_cases),
             'test_results': []
-        }), 400
+        }, 400
 
     except Exception as e:
-        sys.stdout = old_stdout
-        return jsonify({
+        return {
             'status': 'error',
             'message': f'Error: {str(e)}',
             'traceback': traceback.format_exc(),
             'passed': 0,
-            'total': len(TEST_CASES),
+            'total': len(test_cases),
             'test_results': []
-        }), 400
+        }, 400
+
+def random_test_cases(targets: List[str]) -> List[Dict]:
+    """Test cases for targets sampled from target_pool, with their grading keys"""
+    test_cases = []
+    for target in targets:
+        expected = target_pool.expected(target, WORDS)
+        test_cases.append({
+            'target': target,
+            'description': f"Random target '{target}'",
+            'expected_output': expected,
+            'grading_key': grading.GradingKey(WORDS, expected),
+        })
+    return test_cases
+
+def sample_targets(k: int, seed: Optional[int] = None) -> Tuple[List[str], int]:
+    """k distinct targets drawn from target_pool; the seed (random if None) makes the draw repeatable"""
+    if seed is None:
+        seed = int(np.random.SeedSequence().entropy % 2**31)
+    rows = np.random.default_rng(seed).choice(len(target_pool.targets), size=k, replace=False)
+    return [target_pool.targets[row] for row in rows.tolist()], seed
+
+def grade_job(job: Tuple[str, Optional[List[str]], bool],
+              emit: Optional[Callable[[Dict], None]] = None) -> Tuple[Dict, int]:
+    """
+    Grade (code, targets, profile): against TEST_CASES when targets is None,
+    otherwise against the sampled targets with an aggregate accuracy summary.
+
+    In a grading worker the metrics recorded while grading are returned in
+    the body's '_metrics' entry, for dispatch_submission to merge into the
+    server's registry.
+    """
+    since = METRICS.snapshot() if _grading_worker else None
+    body, status_code = _grade_job(job, emit)
+    if since is not None:
+        body = dict(body, _metrics=METRICS.delta(since))
+    return body, status_code
+
+def _grade_job(job: Tuple[str, Optional[List[str]], bool],
+               emit: Optional[Callable[[Dict], None]]) -> Tuple[Dict, int]:
+    code, targets, profile = job
+    if targets is None:
+        return grade_submission(code, emit, profile=profile)
+    body, status_code = grade_submission(code, emit, random_test_cases(targets), profile=profile)
+    if body.get('test_results'):
+        summary = grading.summarize_results(body['test_results'])
+        body['random_grading'] = summary
+        pass_rate = summary['pass_rate']
+        body['message'] = (f"{body['message']} (pass rate {pass_rate['estimate']:.0%}, "
+                           f"{summary['confidence']:.0%} CI {pass_rate['low']:.0%}-{pass_rate['high']:.0%})")
+    return body, status_code
+
+# True in forked grading workers, whose metrics are shipped back with each result
+_grading_worker = False
+
+def _init_grading_worker():
+    """Run once in each forked grading worker: one torch thread per process"""
+    global _grading_worker
+    _grading_worker = True
+    try:
+        import torch
+        torch.set_num_threads(1)
+    except Exception:
+        pass
+
+def _grading_workers() -> int:
+    return int(os.environ.get('GRADING_WORKERS', os.cpu_count() or 1))
+
+def start_fork_server(prepare=None):
+    """
+    Start the process the grading workers are forked from.
+
+    Call while this process is still single-threaded (before the warm-up,
+    batch-scheduler and request threads exist). Does nothing when grading
+    runs in-process (GRADING_WORKERS=0 or no fork()).
+
+    Args:
+        prepare: Run in the fork server before it forks the first worker
+    """
+    global fork_server
+    if fork_server is None and _grading_workers() > 0 and fork_available():
+        fork_server = ForkServer(prepare)
+    return fork_server
+
+def _prepare_fork_server():
+    """FAST_START: the fork server loads its own copy of the model, single-threaded"""
+    warm_up()
+    if model_proxy is not None and model_proxy.prefetch:
+        model_proxy.prefill(sentence_model)
+
+def start_grading_pool():
+    """
+    Fork the grading workers (call after the model and embeddings are loaded).
+
+    Workers come from the fork server. Unless start_fork_server() already
+    ran, it is started here, so the process must still be single-threaded.
+
+    Configured with GRADING_WORKERS (0 = grade in the request thread),
+    GRADING_TIMEOUT, GRADING_CPU_SECONDS and GRADING_MEMORY_MB.
+    """
+    global grading_pool
+    workers = _grading_workers()
+    if grading_pool is not None or workers <= 0 or sentence_model is None or not fork_available():
+        return grading_pool
+    if fork_server is None:
+        # Warm the shared encode cache so every worker starts with it populated,
+        # through the bare model: the batch scheduler's thread must not exist yet
+        if model_proxy.prefetch:
+            model_proxy.prefill(sentence_model)
+        start_fork_server()
+    grading_pool = GradingPool(
+        grade_job,
+        size=workers,
+        timeout=float(os.environ.get('GRADING_TIMEOUT', 10)),
+        cpu_seconds=int(os.environ.get('GRADING_CPU_SECONDS', 20)) or None,
+        memory_mb=int(os.environ.get('GRADING_MEMORY_MB', 1024)) or None,
+        initializer=_init_grading_worker,
+        fork_server=fork_server,
+    )
+    print(f"✓ Started {workers} grading worker processes")
+    return grading_pool
+
+def _error_response(message: str) -> Dict:
+    return {
+        'status': 'error',
+        'message': message,
+        'passed': 0,
+        'total': len(TEST_CASES),
+        'test_results': []
+    }
+
+def dispatch_submission(code: str, emit: Optional[Callable[[Dict], None]] = None,
+                        targets: Optional[List[str]] = None, profile: bool = False) -> Tuple[Dict, int]:
+    """
+    Grade code, answering repeated submissions from the result cache.
+
+    Uses the worker pool if it is running, otherwise this thread. Only
+    completed gradings are cached, never timeouts, crashes or busy errors.
+    targets switches to randomized grading against those sampled targets.
+    Profiled gradings bypass the cache, since their report is about this run.
+    """
+    variant = json.dumps(targets) if targets is not None else ''
+    use_cache = result_cache is not None and not profile
+    key = result_cache.key(code, variant) if use_cache else None
+    cached = result_cache.get(key) if use_cache else None
+    if cached is not None:
+        body, status_code = cached
+        if emit is not None:
+            if body.get('console_output'):
+                emit({'type': 'output', 'text': body['console_output']})
+            for result in body.get('test_results', []):
+                emit({'type': 'test_result', 'result': result})
+        return dict(body, cached=True), status_code
+
+    started = time.perf_counter()
+    if grading_pool is None:
+        body, status_code = grade_job((code, targets, profile), emit)
+    else:
+        try:
+            body, status_code = grading_pool.run((code, targets, profile), on_event=emit)
+        except SandboxBusy as e:
+            return _error_response(str(e)), 503
+        except SandboxError as e:
+            GRADING_SUBMISSION_SECONDS.observe(time.perf_counter() - started, status='sandbox_error')
+            return _error_response(f'Error: {str(e)}'), 400
+        body = dict(body)
+        METRICS.merge(body.pop('_metrics', None))
+    GRADING_SUBMISSION_SECONDS.observe(time.perf_counter() - started, status=body.get('status', 'error'))
+
+    # A timed-out test case says nothing about the code (the machine may just
+    # have been busy), so that grading is not cached either
+    timed_out = any(result.get('timed_out') or result.get('not_run') for result in body.get('test_results', []))
+    if use_cache and not timed_out:
+        result_cache.put(key, body, status_code, time.perf_counter() - started)
+    return body, status_code
+
+def _random_grading_request(data: Dict) -> Tuple[Optional[List[str]], Optional[int], Optional[str]]:
+    """(targets, seed, error) for a request's optional random_targets / seed fields"""
+    k = data.get('random_targets')
+    if k is None:
+        return None, None, None
+    if target_pool is None:
+        return None, None, ('Randomized grading is not available: compile targets with '
+                            'python answer_key.py --extra-targets N')
+    limit = min(RANDOM_GRADING_MAX_K, len(target_pool.targets))
+    seed = data.get('seed')
+    if not isinstance(k, int) or isinstance(k, bool) or not 1 <= k <= limit:
+        return None, None, f'random_targets must be an integer between 1 and {limit}'
+    if seed is not None and (not isinstance(seed, int) or isinstance(seed, bool) or seed < 0):
+        return None, None, 'seed must be a non-negative integer'
+    targets, seed = sample_targets(k, seed)
+    return targets, seed, None
+
+def _admission_rejected(error: AdmissionRejected):
+    """429/503 response with Retry-After and the queue position for a rejected submission"""
+    body = _error_response(str(error))
+    body['queue_position'] = error.queue_position
+    body['retry_after'] = error.retry_after
+    return jsonify(body), error.status_code, {'Retry-After': str(error.retry_after)}
+
+@app.route('/api/submit_solution', methods=['POST'])
+@requires_warm_up
+def submit_solution():
+    """Submit and grade the student's solution"""
+    data = request.json
+    code = data.get('code', '')
+
+    # Check if sentence transformers is available
+    if sentence_model is None:
+        return jsonify(_error_response(MODEL_MISSING_MESSAGE)), 400
+    if answer_key_error:
+        return jsonify(_error_response(answer_key_error)), 503
+    targets, seed, error = _random_grading_request(data)
+    if error:
+        return jsonify(_error_response(error)), 400
+
+    try:
+        with admission.slot():
+            body, status_code = dispatch_submission(code, targets=targets, profile=bool(data.get('profile')))
+    except AdmissionRejected as e:
+        return _admission_rejected(e)
+    if targets is not None:
+        body = dict(body, seed=seed)
+    return jsonify(body), status_code
+
+@app.route('/api/submit_solution/stream', methods=['POST'])
+@requires_warm_up
+def submit_solution_stream():
+    """
+    Same as submit_solution, streamed as Server-Sent Events.
+
+    Emits 'queued' events with the queue position while waiting for a
+    grading slot, 'output' events with console output as it is printed, one
+    'test_result' event per finished test case, and a final 'result' event
+    carrying the usual response body and status code.
+    """
+    data = request.json
+    code = data.get('code', '')
+
+    if sentence_model is None:
+        return jsonify(_error_response(MODEL_MISSING_MESSAGE)), 400
+    if answer_key_error:
+        return jsonify(_error_response(answer_key_error)), 503
+    targets, seed, error = _random_grading_request(data)
+    if error:
+        return jsonify(_error_response(error)), 400
+
+    # A full queue is rejected before the stream starts; a queued request
+    # waits in run() and reports its position as it moves up
+    try:
+        ticket = admission.enqueue()
+    except AdmissionRejected as e:
+        return _admission_rejected(e)
+    events = queue.Queue()
+
+    def on_queued(position: int, seconds: float):
+        events.put({'type': 'queued', 'position': position, 'estimated_wait_seconds': round(seconds, 1)})
+
+    def run():
+        try:
+            admission.wait(ticket, on_queued)
+        except AdmissionRejected as e:
+            body = dict(_error_response(str(e)), queue_position=e.queue_position, retry_after=e.retry_after)
+            events.put({'type': 'result', 'status_code': e.status_code, 'body': body})
+            events.put(None)
+            return
+        except Exception as e:  # the stream must still end with a result
+            events.put({'type': 'result', 'status_code': 500, 'body': _error_response(f'Error: {str(e)}')})
+            events.put(None)
+            return
+        try:
+            body, status_code = dispatch_submission(code, emit=events.put, targets=targets,
+                                                    profile=bool(data.get('profile')))
+            if targets is not None:
+                body = dict(body, seed=seed)
+        except Exception as e:
+            body, status_code = _error_response(f'Error: {str(e)}'), 500
+        finally:
+            admission.release(ticket)
+        events.put({'type': 'result', 'status_code': status_code, 'body': body})
+        events.put(None)
+
+    threading.Thread(target=run, daemon=True).start()
+
+    def generate():
+        while True:
+            event = events.get()
+            if event is None:
+                break
+            with RESPONSE_SERIALIZE_SECONDS.time(route='/api/submit_solution/stream'):
+                data = json.dumps(event)
+            yield f"event: {event['type']}\ndata: {data}\n\n"
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/inference_stats', methods=['GET'])
+@requires_warm_up
+def inference_stats():
+    """Batching and encode-cache statistics for this process"""
+    if inference_scheduler is None:
+        return jsonify({'status': 'error', 'message': MODEL_MISSING_MESSAGE}), 400
+    return jsonify({
+        'scheduler': inference_scheduler.stats(),
+        'encode_cache': model_proxy.cache_info(),
+    })
+
+@app.route('/api/grading_stats', methods=['GET'])
+@requires_warm_up
+def grading_stats():
+    """Result cache size and hit rate"""
+    if result_cache is None:
+        return jsonify({'status': 'error', 'message': MODEL_MISSING_MESSAGE}), 400
+    return jsonify({'result_cache': result_cache.stats(), 'admission': admission.stats()})
+
+def build_precision_report() -> Dict:
+    """Compare the expected answers from the stored matrix with a float32 re-encode"""
+    from embedding_store import EmbeddingStore
+    from quantization import rank_agreement_report
+    reference = EmbeddingStore(embedding_store.model, WORDS + [tc['target'] for tc in TEST_CASES],
+                               chunk_size=EMBEDDING_CHUNK_SIZE)
+    report = rank_agreement_report(WORDS, TEST_CASES, embedding_store.precision,
+                                   reference.rank, embedding_store.rank)
+    report['matrix_mb'] = round(embedding_store.matrix.nbytes / 2**20, 2)
+    report['float32_matrix_mb'] = round(reference.matrix.nbytes / 2**20, 2)
+    return report
+
+@app.route('/api/precision_report', methods=['GET'])
+@requires_warm_up
+def get_precision_report():
+    """Rank-agreement loss of EMBEDDING_PRECISION against float32 on the test cases"""
+    global precision_report
+    if embedding_store is None:
+        return jsonify({'status': 'error', 'message': MODEL_MISSING_MESSAGE}), 400
+    if embedding_store.precision == 'float32':
+        return jsonify({'precision': 'float32', 'grading_unchanged': True,
+                        'message': 'Embeddings are stored as float32; nothing to compare'})
+    if precision_report is None:
+        precision_report = build_precision_report()
+    return jsonify(precision_report)
 
 @app.route('/api/get_hint', methods=['POST'])
 def get_hint():
@@ -446,8 +1159,822 @@ def get_hint():
         'hint': hints.get(hint_level, hints[5])
     })
 
+# ---------------------------------------------------------------------------
+# Hot/cold guessing game (templates/index.html)
+# ---------------------------------------------------------------------------
+
+DEFAULT_GAME_TARGET = 'music'
+
+# Functions the game's code editor can replace, and the session field holding each
+GAME_FUNCTIONS = {'compute_similarity': 'similarity_code', 'filter_words': 'filter_code'}
+
+# Target x vocabulary similarity/rank table, precomputed for every vocabulary word
+# (or as many targets as fit in GAME_INDEX_MAX_MB for large word lists)
+game_index = None
+
+# Approximate nearest-neighbour (IVF) index over the game vocabulary, built for
+# vocabularies of at least ANN_MIN_WORDS words and used for top-k queries.
+# n_probe is set per endpoint to trade recall for latency (see /api/ann_stats).
+game_ann = None
+ANN_MIN_WORDS = int(os.environ.get('ANN_MIN_WORDS', 20000))
+ANN_NPROBE = {
+    'nearest': int(os.environ.get('ANN_NPROBE_NEAREST', 8)),
+    'rank_words': int(os.environ.get('ANN_NPROBE_RANK_WORDS', 16)),
+}
+
+# Per-player state: target, guess history, attempts and any custom code.
+# Sessions are identified by a cookie or an explicit session_id / X-Session-Id.
+SESSION_COOKIE = 'hotcold_session'
+game_sessions = SessionStore(
+    max_sessions=int(os.environ.get('GAME_MAX_SESSIONS', 10000)),
+    ttl_seconds=float(os.environ.get('GAME_SESSION_TTL', 3600)),
+    max_bytes=int(os.environ.get('GAME_SESSION_MAX_MB', 32)) * 1024 * 1024,
+    snapshot_path=os.environ.get('GAME_SESSION_SNAPSHOT') or None,
+)
+if game_sessions.snapshot_path:
+    print(f"✓ Restored {game_sessions.restore()} game sessions")
+    atexit.register(game_sessions.snapshot)
+
+@app.before_request
+def _start_session_snapshots():
+    # Not at import: the grading fork server must be forked before any thread exists
+    game_sessions.start_snapshots()
+
+# Custom game code runs in the grading pool like submissions (in a daemon
+# thread when there is no pool), at most GAME_CODE_TIMEOUT seconds per call
+GAME_CODE_TIMEOUT = float(os.environ.get('GAME_CODE_TIMEOUT', 5))
+
+# Similarity indexes / filters over custom game code, keyed by (function name,
+# source), shared by every session that loaded the same code
+_game_function_cache = OrderedDict()
+_game_function_lock = threading.Lock()
+_GAME_FUNCTION_CACHE_SIZE = 64
+
+class GameCodeError(Exception):
+    """
+    Custom game code raised, timed out or could not be run.
+
+    Args:
+        message: Explanation for the player
+        status_code: HTTP status of the response (503 when no sandbox was free)
+        traceback: Formatted traceback of the student's exception, if any
+    """
+
+    def __init__(self, message: str, status_code: int = 400, traceback: Optional[str] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.traceback = traceback
+
+def levenshtein_distance(s1: str, s2: str) -> int:
+    """Edit distance between two strings"""
+    if len(s1) < len(s2):
+        s1, s2 = s2, s1
+    previous = list(range(len(s2) + 1))
+    for i, c1 in enumerate(s1, start=1):
+        current = [i]
+        for j, c2 in enumerate(s2, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (c1 != c2)))
+        previous = current
+    return previous[-1]
+
+def _game_session():
+    """The current player's session, created on first use"""
+    data = request.get_json(silent=True) or {}
+    session_id = (data.get('session_id') or request.headers.get('X-Session-Id')
+                  or request.cookies.get(SESSION_COOKIE))
+    return game_sessions.get_or_create(session_id, DEFAULT_GAME_TARGET)
+
+def _session_response(payload: Dict, session, status_code: int = 200):
+    payload['session_id'] = session.session_id
+    response = jsonify(payload)
+    response.status_code = status_code
+    response.set_cookie(SESSION_COOKIE, session.session_id, httponly=True, samesite='Lax',
+                        max_age=int(game_sessions.ttl_seconds))
+    return response
+
+def _compile_game_function(code: str, function_name: str):
+    """Execute editor code and return the function it defines"""
+    namespace = {
+        'math': math,
+        'Counter': Counter,
+        'WORDS': list(WORDS),
+        'word_vectors': {word: compute_char_vector(word) for word in WORDS},
+        'levenshtein_distance': levenshtein_distance,
+        'cosine_similarity': cosine_similarity,
+        'cosine_similarities': cosine_similarities,
+        'cosine_similarity_matrix': cosine_similarity_matrix,
+        'rank_by_similarity': rank_by_similarity,
+        'compute_char_vector': compute_char_vector,
+        'np': np,
+    }
+    exec(code, namespace)
+    func = namespace.get(function_name)
+    if not callable(func):
+        raise NameError(f'Function "{function_name}" not found in your code')
+    return func
+
+def game_job(job: Tuple[str, str, str, tuple], emit: Optional[Callable[[Dict], None]] = None) -> Dict:
+    """
+    Run custom game code: (code, function_name, action, args).
+
+    Actions: 'check' tries the function on a few sample words and prints the
+    results, so the student sees what their code does; 'row' (target,) and
+    'pair' (target, guess) score with compute_similarity; 'filter'
+    (target, words) applies filter_words.
+
+    Returns:
+        dict: 'value' and captured 'output', or 'error' and 'traceback'
+    """
+    code, function_name, action, args = job
+    with capture_output() as output:
+        try:
+            func = _compile_game_function(code, function_name)
+            if action == 'check' and function_name == 'compute_similarity':
+                for word in WORDS[:3]:
+                    print(f"compute_similarity({word!r}, {DEFAULT_GAME_TARGET!r}) = "
+                          f"{float(func(word, DEFAULT_GAME_TARGET)):.4f}")
+                value = None
+            elif action == 'check':
+                kept = func(list(WORDS), DEFAULT_GAME_TARGET)
+                print(f"filter_words kept {len(kept)} of {len(WORDS)} words")
+                value = None
+            elif action == 'row':
+                target, = args
+                value = [float(func(word, target)) for word in dict.fromkeys(WORDS)]
+            elif action == 'pair':
+                target, guess = args
+                value = float(func(guess, target))
+            else:
+                target, words = args
+                value = list(func(words, target))
+        except BaseException as e:  # SystemExit from student code included
+            return {'error': f'{type(e).__name__}: {str(e)}', 'traceback': traceback.format_exc()}
+    return {'value': value, 'output': output.getvalue()}
+
+def _run_game_code(code: str, function_name: str, action: str, *args) -> Dict:
+    """
+    game_job in the grading pool, or in a daemon thread without one.
+
+    Raises:
+        GameCodeError: The code raised or ran longer than GAME_CODE_TIMEOUT
+    """
+    job = (code, function_name, action, args)
+    if grading_pool is not None:
+        try:
+            result = grading_pool.run(job, handler=game_job, timeout=GAME_CODE_TIMEOUT)
+        except SandboxBusy as e:
+            raise GameCodeError(str(e), 503)
+        except SandboxError as e:
+            raise GameCodeError(f'Error: {str(e)}')
+    else:
+        # A stuck thread cannot be stopped, but it no longer holds the request
+        results = []
+        thread = threading.Thread(target=lambda: results.append(game_job(job)), name='game-code', daemon=True)
+        thread.start()
+        thread.join(GAME_CODE_TIMEOUT)
+        if not results:
+            raise GameCodeError(f'Code took longer than {GAME_CODE_TIMEOUT:g} seconds')
+        result = results[0]
+    if 'error' in result:
+        raise GameCodeError(f"Error: {result['error']}", traceback=result['traceback'])
+    return result
+
+def _custom_game_object(code: str, function_name: str):
+    """The SimilarityIndex (compute_similarity) or filter function (filter_words) for session code"""
+    key = (function_name, code)
+    with _game_function_lock:
+        cached = _game_function_cache.get(key)
+        if cached is not None:
+            _game_function_cache.move_to_end(key)
+            return cached
+
+        if function_name == 'compute_similarity':
+            from similarity_index import SimilarityIndex
+            cached = SimilarityIndex(
+                WORDS,
+                row_fn=lambda target: np.array(_run_game_code(code, function_name, 'row', target)['value']),
+                pair_fn=lambda target, guess: _run_game_code(code, function_name, 'pair', target, guess)['value'],
+            )
+        else:
+            cached = lambda words, target: _run_game_code(code, function_name, 'filter', target, words)['value']
+        _game_function_cache[key] = cached
+        while len(_game_function_cache) > _GAME_FUNCTION_CACHE_SIZE:
+            _game_function_cache.popitem(last=False)
+        return cached
+
+def _game_code_failed(error: GameCodeError, session):
+    return _session_response({'error': f'Your game code failed: {str(error)}'}, session, error.status_code)
+
+def _session_index(session):
+    if session.similarity_code:
+        return _custom_game_object(session.similarity_code, 'compute_similarity')
+    return game_index
+
+def _build_game_ann(cache_dir: Optional[str]):
+    """Load the IVF index for game_index from cache_dir, or build (and save) it"""
+    from ann_index import IVFIndex
+    from embedding_store import vocabulary_hash
+    n_lists = int(os.environ.get('ANN_LISTS', 0)) or None
+    fingerprint = f"{vocabulary_hash(game_index.words)}:{n_lists or 'auto'}"
+    path = os.path.join(cache_dir, 'ivf.npz') if cache_dir else None
+    ann = IVFIndex.load(path, game_index.vectors, fingerprint) if path else None
+    if ann is not None:
+        print(f"✓ Loaded ANN index ({ann.n_lists} lists) from {path}")
+        return ann
+    started = time.perf_counter()
+    ann = IVFIndex.build(game_index.vectors, n_lists=n_lists)
+    print(f"✓ Built ANN index ({ann.n_lists} lists) in {time.perf_counter() - started:.2f}s")
+    if path:
+        try:
+            ann.save(path, fingerprint)
+        except OSError as e:
+            print(f"⚠  Could not save ANN index: {e}")
+    return ann
+
+def _nearest_words(target: str, k: int, endpoint: str) -> Tuple[List[Dict], bool]:
+    """Top-k vocabulary words for target and whether the result is approximate"""
+    if game_ann is None:
+        return game_index.ranked(target)[:k], False
+    ids, scores = game_ann.search(embedding_store.vector(target), k, ANN_NPROBE[endpoint])
+    return [
+        {'word': game_index.words[i], 'rank': rank, 'similarity': round(score, 4)}
+        for rank, (i, score) in enumerate(zip(ids.tolist(), scores.tolist()), start=1)
+    ], True
+
+def _game_unavailable():
+    return jsonify({'error': MODEL_MISSING_MESSAGE}), 503
+
+@app.route('/game')
+def game():
+    return render_template('index.html')
+
+@app.route('/api/set_target', methods=['POST'])
+@requires_warm_up
+def set_target():
+    """Choose the word this player is trying to find"""
+    data = request.json or {}
+    target = str(data.get('target', '')).lower().strip()
+    if not target:
+        return jsonify({'error': 'Please provide a target word'}), 400
+    if game_index is None:
+        return _game_unavailable()
+
+    session = _game_session()
+    game_sessions.reset(session, target)
+    # Warm the row now so the first guess is a pure lookup
+    index = _session_index(session)
+    try:
+        index.ranked(target)
+    except GameCodeError as e:
+        return _game_code_failed(e, session)
+    return _session_response({'target': target, 'total': len(index)}, session)
+
+@app.route('/api/check_guess', methods=['POST'])
+@requires_warm_up
+def check_guess():
+    """Score a guess against the player's target using the precomputed table"""
+    data = request.json or {}
+    guess = str(data.get('guess', '')).lower().strip()
+    if not guess:
+        return jsonify({'error': 'Please provide a guess'}), 400
+    if game_index is None:
+        return _game_unavailable()
+
+    session = _game_session()
+    index = _session_index(session)
+    # Read once: a concurrent set_target may start a new round meanwhile
+    target = session.target
+    try:
+        similarity, rank = index.lookup(target, guess)
+    except GameCodeError as e:
+        return _game_code_failed(e, session)
+    game_sessions.record_guess(session, guess, similarity, rank, target=target)
+    return _session_response({
+        'guess': guess,
+        'similarity': similarity,
+        'rank': rank,
+        'total': len(index),
+        'is_correct': guess == target,
+        'attempts': session.attempts,
+    }, session)
+
+@app.route('/api/rank_words', methods=['POST'])
+@requires_warm_up
+def rank_words():
+    """
+    All words ranked by similarity to the target (cached, pre-sorted).
+
+    With top_k only the k best words are returned, from the ANN index when the
+    vocabulary is large and the player uses the built-in similarity.
+    """
+    data = request.json or {}
+    if game_index is None:
+        return _game_unavailable()
+    top_k = data.get('top_k')
+    if top_k is not None and (not isinstance(top_k, int) or top_k < 1):
+        return jsonify({'error': 'top_k must be a positive integer'}), 400
+
+    session = _game_session()
+    target = str(data.get('target') or session.target).lower().strip()
+    if top_k is not None and not session.similarity_code and not session.filter_code:
+        ranked_words, approximate = _nearest_words(target, top_k, 'rank_words')
+        return _session_response({'target': target, 'ranked_words': ranked_words,
+                                  'approximate': approximate}, session)
+
+    index = _session_index(session)
+    keep = None
+    try:
+        ranked_words = index.ranked(target)
+        if session.filter_code:
+            keep = set(_custom_game_object(session.filter_code, 'filter_words')(list(index.words), target))
+    except GameCodeError as e:
+        return _game_code_failed(e, session)
+    if keep is not None:
+        ranked_words = [
+            dict(item, rank=rank)
+            for rank, item in enumerate((item for item in ranked_words if item['word'] in keep), start=1)
+        ]
+    if top_k is not None:
+        ranked_words = ranked_words[:top_k]
+    return _session_response({'target': target, 'ranked_words': ranked_words}, session)
+
+@app.route('/api/nearest', methods=['POST'])
+@requires_warm_up
+def nearest():
+    """The k vocabulary words most similar to a word (approximate for large vocabularies)"""
+    data = request.json or {}
+    word = str(data.get('word', '')).lower().strip()
+    k = data.get('k', 10)
+    if not word:
+        return jsonify({'error': 'Please provide a word'}), 400
+    if not isinstance(k, int) or not 1 <= k <= 1000:
+        return jsonify({'error': 'k must be an integer between 1 and 1000'}), 400
+    if game_index is None:
+        return _game_unavailable()
+    neighbours, approximate = _nearest_words(word, k, 'nearest')
+    return jsonify({'word': word, 'k': k, 'neighbours': neighbours, 'approximate': approximate})
+
+@app.route('/api/ann_stats', methods=['GET'])
+@requires_warm_up
+def ann_stats():
+    """Recall@k and latency of the ANN index per n_probe, measured on sampled vocabulary words"""
+    if game_ann is None:
+        return jsonify({'status': 'error',
+                        'message': f'No ANN index (vocabulary is smaller than ANN_MIN_WORDS={ANN_MIN_WORDS})'}), 404
+    try:
+        k = max(1, min(int(request.args.get('k', 10)), 1000))
+        queries = max(1, min(int(request.args.get('queries', 100)), 1000))
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'k and queries must be integers'}), 400
+    rows = np.random.default_rng(0).choice(len(game_index), size=min(queries, len(game_index)), replace=False)
+    return jsonify({
+        'words': len(game_ann),
+        'n_lists': game_ann.n_lists,
+        'n_probe': ANN_NPROBE,
+        'k': k,
+        'queries': len(rows),
+        'report': game_ann.evaluate(game_index.vectors[np.sort(rows)], k,
+                                    n_probes=sorted({1, 2, 4, 8, 16, 32, *ANN_NPROBE.values()})),
+    })
+
+@app.route('/api/submit_code', methods=['POST'])
+@requires_warm_up
+def submit_code():
+    """Replace this player's similarity or filter function with their own code"""
+    data = request.json or {}
+    code = data.get('code', '')
+    function_name = data.get('function_name', 'compute_similarity')
+    if not isinstance(function_name, str) or function_name not in GAME_FUNCTIONS:
+        return jsonify({'status': 'error', 'message': f'Unknown function: {function_name}'}), 400
+
+    session = _game_session()
+    try:
+        output = _run_game_code(code, function_name, 'check')['output']
+    except GameCodeError as e:
+        return _session_response({
+            'status': 'error',
+            'message': str(e),
+            'traceback': e.traceback,
+        }, session, e.status_code)
+
+    game_sessions.reset(session, **{GAME_FUNCTIONS[function_name]: code})
+
+    return _session_response({
+        'status': 'success',
+        'message': f'✓ {function_name} loaded - the game now uses your function',
+        'output': output,
+    }, session)
+
+@app.route('/api/reset_code', methods=['POST'])
+def reset_code():
+    """Go back to the built-in similarity / no filtering"""
+    data = request.json or {}
+    function_name = data.get('function_name', 'compute_similarity')
+    if not isinstance(function_name, str) or function_name not in GAME_FUNCTIONS:
+        return jsonify({'status': 'error', 'message': f'Unknown function: {function_name}'}), 400
+
+    session = _game_session()
+    game_sessions.reset(session, **{GAME_FUNCTIONS[function_name]: None})
+    return _session_response({'status': 'success', 'message': f'✓ {function_name} reset to default'}, session)
+
+@app.route('/api/session_stats', methods=['GET'])
+def session_stats():
+    """Game session store size and eviction counters"""
+    return jsonify(game_sessions.stats())
+
+# ---------------------------------------------------------------------------
+# Startup: model warm-up and readiness
+# ---------------------------------------------------------------------------
+
+def answer_model_id(model=None) -> str:
+    """Identifies what the expected answers are computed with (model, revision, precision)"""
+    if model is None:
+        model = sentence_model
+    if model is not None:
+        from embedding_store import model_revision
+        model_id = f"{MODEL_NAME}@{model_revision(model)}"
+    elif embedding_store is not None:
+        model_id = f"hashed-ngrams-{embedding_store.model.dim}"
+    else:
+        return 'character-frequency'
+    if embedding_store is not None and embedding_store.precision != 'float32':
+        model_id += f"/{embedding_store.precision}"
+    return model_id
+
+def load_expected_answers(model_id: str) -> None:
+    """
+    Fill test_case['expected_output'] for every test case.
+
+    Uses the answer key at ANSWER_KEY_PATH when it exists. If it was built
+    for another model or word list, expected outputs are left empty and
+    grading is refused (answer_key_error) rather than graded against a
+    different key. Without a key file the answers are computed live.
+    """
+    global answer_key, answer_key_error
+    answer_key = answer_key_error = None
+    if ANSWER_KEY_PATH and os.path.exists(ANSWER_KEY_PATH) and np is not None:
+        from answer_key import AnswerKey, AnswerKeyMismatch
+        started = time.perf_counter()
+        try:
+            key = AnswerKey.load(ANSWER_KEY_PATH)
+            key.check(model_id, WORDS, [tc['target'] for tc in TEST_CASES])
+        except (OSError, AnswerKeyMismatch) as e:
+            answer_key_error = (f"The answer key {os.path.basename(ANSWER_KEY_PATH)} does not match this server "
+                                f"({e}); rebuild it with: python answer_key.py")
+            print(f"⚠  {answer_key_error}. Grading is disabled.")
+            for test_case in TEST_CASES:
+                test_case['expected_output'] = None
+            return
+        for test_case in TEST_CASES:
+            test_case['expected_output'] = key.expected(test_case['target'], WORDS)
+        answer_key = key
+        print(f"✓ Loaded expected answers for {len(key.targets)} targets from {ANSWER_KEY_PATH} "
+              f"in {1000 * (time.perf_counter() - started):.1f} ms")
+        return
+
+    if ANSWER_KEY_PATH:
+        print(f"⚠  No answer key at {ANSWER_KEY_PATH}; computing expected answers with {model_id} "
+              f"(python answer_key.py compiles one)")
+    for test_case in TEST_CASES:
+        test_case['expected_output'] = generate_correct_answer(test_case['target'], WORDS)
+
+def build_target_pool(model_id: str):
+    """
+    Expected ranks for the targets randomized grading samples from.
+
+    The answer key when it holds extra targets; otherwise, for small
+    vocabularies, up to RANDOM_TARGET_POOL vocabulary words ranked now.
+    """
+    from answer_key import AnswerKey
+    if answer_key is not None and len(answer_key.targets) > len(TEST_CASES):
+        pool = answer_key
+    elif len(WORDS) <= RANDOM_POOL_MAX_WORDS:
+        words = list(dict.fromkeys(WORDS))
+        if len(words) > RANDOM_TARGET_POOL:
+            rows = np.sort(np.random.default_rng(0).choice(len(words), size=RANDOM_TARGET_POOL, replace=False))
+            words = [words[row] for row in rows.tolist()]
+        pool = AnswerKey.build(model_id, WORDS, words, generate_correct_answer, embedding_store.similarities)
+    else:
+        return None
+    print(f"✓ Randomized grading can sample from {len(pool.targets)} targets")
+    return pool
+
+def warm_up(start_pool: bool = False) -> None:
+    """
+    Load the model and everything derived from it.
+
+    Imports numpy and sentence_transformers, then builds the embedding store,
+    expected answers, grading keys, result cache, inference scheduler and game
+    index. Runs at import time by default, or in a background thread when
+    FAST_START is set.
+
+    Args:
+        start_pool: Fork the grading workers once everything is loaded
+    """
+    global sentence_model, np, grading, embedding_store, inference_scheduler, model_proxy
+    global result_cache, game_index, game_ann, precision_report, target_pool
+    started = time.perf_counter()
+    _warm_up_state['started'] = started
+    _warm_up_state['state'] = 'loading'
+
+    model = None
+    try:
+        import numpy as np_import
+        import grading as grading_import
+        np = np_import
+        grading = grading_import
+        from sentence_transformers import SentenceTransformer
+        print("Loading sentence transformer model...")
+        model = SentenceTransformer(MODEL_NAME)
+        print("✓ Model loaded! Students can use 'model' and 'np' for advanced embeddings.")
+    except Exception as e:
+        print(f"⚠  Sentence transformers not available (optional): {str(e)[:50]}...")
+        print("✓ Character-based embeddings will work fine!")
+
+    try:
+        ann_dir = None
+        if model is not None:
+            from embedding_store import EmbeddingCache, EmbeddingStore, model_revision
+            from inference import BatchScheduler, CachingModel
+
+            embedding_cache = EmbeddingCache(EMBEDDING_CACHE_DIR, MODEL_NAME, model_revision(model),
+                                             precision=EMBEDDING_PRECISION)
+            ann_dir = embedding_cache.path
+            embedding_store = EmbeddingStore(
+                model, WORDS + [tc['target'] for tc in TEST_CASES], cache=embedding_cache,
+                chunk_size=EMBEDDING_CHUNK_SIZE,
+            )
+            print(f"✓ Embedding cache: {embedding_cache.hits} hits, {embedding_cache.misses} misses "
+                  f"({len(embedding_store)} unique words)")
+        elif np is not None:
+            # No model: hashed character n-gram vectors in the same store (NumPy only, no torch)
+            from embedding_store import EmbeddingStore
+            from ngram_encoder import HashedNgramEncoder
+            embedding_store = EmbeddingStore(
+                HashedNgramEncoder(dim=int(os.environ.get('NGRAM_DIM', 1024))),
+                WORDS + [tc['target'] for tc in TEST_CASES],
+                chunk_size=EMBEDDING_CHUNK_SIZE, precision=EMBEDDING_PRECISION,
+            )
+            print(f"✓ Character n-gram embeddings for {len(embedding_store)} words")
+
+        # Correct answers from the answer key (or the live model), plus their
+        # rank arrays for the vectorized grader
+        load_expected_answers(answer_model_id(model))
+        for test_case in TEST_CASES:
+            if model is not None and test_case['expected_output'] is not None:
+                test_case['grading_key'] = grading.GradingKey(WORDS, test_case['expected_output'])
+        if model is not None and answer_key_error is None:
+            target_pool = build_target_pool(answer_model_id(model))
+
+        if embedding_store is not None and embedding_store.precision != 'float32':
+            print(f"✓ Vocabulary matrix stored as {embedding_store.precision} "
+                  f"({embedding_store.matrix.nbytes / 2**20:.1f} MB)")
+            if len(WORDS) <= PRECISION_REPORT_MAX_WORDS:
+                precision_report = build_precision_report()
+                marker = '✓' if precision_report['grading_unchanged'] else '⚠ '
+                print(f"{marker} {embedding_store.precision} vs float32 on the test cases: "
+                      f"min Spearman {precision_report['min_spearman']:.4f}, "
+                      f"max rank shift {precision_report['max_rank_shift']}, "
+                      f"grading {'unchanged' if precision_report['grading_unchanged'] else 'CHANGED'}")
+
+        if model is not None:
+            # Cached results are only valid for answers computed at the same precision
+            result_cache = grading.ResultCache(
+                grading.test_set_version(TEST_CASES, WORDS, answer_model_id(model)),
+                max_entries=int(os.environ.get('RESULT_CACHE_ENTRIES', 1024)),
+                max_bytes=int(os.environ.get('RESULT_CACHE_MAX_MB', 64)) * 1024 * 1024,
+            )
+            inference_scheduler = BatchScheduler(
+                model,
+                max_batch_size=int(os.environ.get('INFERENCE_MAX_BATCH', 64)),
+                max_wait_ms=float(os.environ.get('INFERENCE_MAX_WAIT_MS', 5)),
+            )
+            # Prefetching the vocabulary only pays off while it fits in the cache
+            model_proxy = CachingModel(
+                inference_scheduler, max_size=ENCODE_CACHE_SIZE,
+                prefetch=embedding_store.words if len(embedding_store) <= ENCODE_CACHE_SIZE else None,
+            )
+            # Published last, once everything built from it exists
+            sentence_model = model
+
+        if embedding_store is not None:
+            from similarity_index import SimilarityIndex
+            game_index = SimilarityIndex.from_store(
+                embedding_store, WORDS,
+                max_bytes=int(os.environ.get('GAME_INDEX_MAX_MB', 512)) * 1024 * 1024,
+            )
+            # Small vocabularies get every row up front; large ones fill rows on demand
+            if len(game_index) <= game_index.max_targets:
+                game_index.precompute(game_index.words + [DEFAULT_GAME_TARGET])
+            else:
+                game_index.precompute([DEFAULT_GAME_TARGET])
+            if len(game_index) >= ANN_MIN_WORDS:
+                game_ann = _build_game_ann(ann_dir)
+
+        if start_pool:
+            start_grading_pool()
+    except Exception as e:
+        _warm_up_state['error'] = f'{type(e).__name__}: {e}'
+        _warm_up_state['state'] = 'failed'
+        print(f"⚠  Warm-up failed: {_warm_up_state['error']}")
+        traceback.print_exc()
+        return
+
+    _warm_up_state['seconds'] = time.perf_counter() - started
+    _warm_up_state['state'] = 'ready'
+    print(f"✓ Warm-up finished in {_warm_up_state['seconds']:.2f}s "
+          f"({time.perf_counter() - PROCESS_STARTED:.2f}s after start)")
+
+def share_state():
+    """
+    Move the large read-only arrays into one shared-memory block.
+
+    Called by serve.py in the parent process after warm_up() and before the
+    server workers are forked. The embedding matrix (unless it is already
+    memory-mapped from the cache), the precomputed game rows, the ANN lists
+    and the grading rank arrays are copied in once and every reference is
+    pointed at read-only views of the block, so the private copies are freed
+    and each worker maps the same pages.
+
+    Returns:
+        SharedArrays, or None if there is nothing to share
+    """
+    global shared_state
+    if shared_state is not None or embedding_store is None:
+        return shared_state
+    from quantization import CompactMatrix, compact
+    from shared_arrays import SharedArrays, file_backed
+
+    def stored(matrix):
+        if isinstance(matrix, CompactMatrix):
+            return {'data': matrix.data, 'scales': matrix.scales}
+        return {'data': matrix}
+
+    arrays = {}
+    matrix_parts = stored(embedding_store.matrix)
+    if not file_backed(matrix_parts['data']):
+        arrays.update({f'matrix/{key}': value for key, value in matrix_parts.items() if value is not None})
+    vectors_parts = stored(game_index.vectors) if game_index is not None else {}
+    # Usually a prefix view of the store matrix, which is re-sliced instead of copied
+    vectors_are_view = bool(vectors_parts) and np.shares_memory(vectors_parts['data'], matrix_parts['data'])
+    if vectors_parts and not vectors_are_view and not file_backed(vectors_parts['data']):
+        arrays.update({f'vectors/{key}': value for key, value in vectors_parts.items() if value is not None})
+    rows = game_index.row_arrays() if game_index is not None else {}
+    for i, target in enumerate(rows):
+        for name, value in zip(('similarities', 'order', 'ranks', 'sorted_desc'), rows[target]):
+            arrays[f'rows/{i}/{name}'] = value
+    if game_ann is not None:
+        arrays['ann/centroids'] = game_ann.centroids
+        arrays['ann/list_ids'] = game_ann.list_ids
+        arrays['ann/list_offsets'] = game_ann.list_offsets
+    if target_pool is not None:
+        arrays['target_pool/ranks'] = target_pool.ranks
+        arrays['target_pool/scores'] = target_pool.scores
+    for i, test_case in enumerate(TEST_CASES):
+        if 'grading_key' in test_case:
+            arrays[f'grading/{i}/expected_ranks'] = test_case['grading_key'].expected_ranks
+            arrays[f'grading/{i}/weights'] = test_case['grading_key'].weights
+    if not arrays:
+        return None
+
+    shared = SharedArrays.publish(arrays)
+    if 'matrix/data' in shared:
+        embedding_store.matrix = compact(shared['matrix/data'],
+                                         shared['matrix/scales'] if 'matrix/scales' in shared else None)
+    if game_index is not None:
+        if 'vectors/data' in shared:
+            game_index.vectors = compact(shared['vectors/data'],
+                                         shared['vectors/scales'] if 'vectors/scales' in shared else None)
+        elif vectors_are_view:
+            game_index.vectors = embedding_store.matrix[:len(game_index)]
+        game_index.replace_rows({
+            target: tuple(shared[f'rows/{i}/{name}'] for name in ('similarities', 'order', 'ranks', 'sorted_desc'))
+            for i, target in enumerate(rows)
+        })
+    if game_ann is not None:
+        game_ann.matrix = game_index.vectors
+        game_ann.centroids = shared['ann/centroids']
+        game_ann.list_ids = shared['ann/list_ids']
+        game_ann.list_offsets = shared['ann/list_offsets']
+    if target_pool is not None:
+        target_pool.ranks = shared['target_pool/ranks']
+        target_pool.scores = shared['target_pool/scores']
+    for i, test_case in enumerate(TEST_CASES):
+        if f'grading/{i}/expected_ranks' in shared:
+            test_case['grading_key'].expected_ranks = shared[f'grading/{i}/expected_ranks']
+            test_case['grading_key'].weights = shared[f'grading/{i}/weights']
+    shared_state = shared
+    atexit.register(shared.close)
+    print(f"✓ Shared {len(shared)} arrays ({shared.nbytes / 2**20:.1f} MB) with the server workers")
+    return shared
+
+def start_warm_up(start_pool: bool = False) -> bool:
+    """Start warm_up() in a background thread unless it already ran; True if started"""
+    with _warm_up_lock:
+        if _warm_up_state['state'] != 'idle':
+            return False
+        _warm_up_state['state'] = 'loading'
+    threading.Thread(target=warm_up, args=(start_pool,), name='warm-up', daemon=True).start()
+    return True
+
+@app.before_request
+def _start_request_timer():
+    g.metrics_started = time.perf_counter()
+
+@app.after_request
+def _record_request_metrics(response):
+    started = g.get('metrics_started')
+    if started is not None:
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, route=_metrics_route(),
+                                     method=request.method, status=str(response.status_code))
+    return response
+
+def _collect_admission_metrics():
+    stats = admission.stats()
+    return [
+        ('admission_active', 'gauge', 'Submissions holding a grading slot', [({}, stats['active'])]),
+        ('admission_queued', 'gauge', 'Submissions waiting for a grading slot', [({}, stats['queued'])]),
+    ]
+
+METRICS.add_collector(_collect_admission_metrics)
+
+def _collect_cache_metrics():
+    """Cache counters that live on the cache objects, read at scrape time"""
+    families = []
+    if result_cache is not None:
+        stats = result_cache.stats()
+        families.append(('result_cache_lookups_total', 'counter', 'Submissions looked up in the result cache',
+                         [({'result': 'hit'}, stats['hits']), ({'result': 'miss'}, stats['misses'])]))
+        families.append(('result_cache_entries', 'gauge', 'Graded submissions held in the result cache',
+                         [({}, stats['entries'])]))
+    if model_proxy is not None:
+        families.append(('encode_cache_entries', 'gauge', 'Texts held in the shared encode cache',
+                         [({}, model_proxy.cache_info()['size'])]))
+    embedding_cache = getattr(embedding_store, 'cache', None)
+    if embedding_cache is not None:
+        families.append(('embedding_cache_words_total', 'counter',
+                         'Vocabulary words read from the on-disk embedding cache (hit) or encoded (miss)',
+                         [({'result': 'hit'}, embedding_cache.hits), ({'result': 'miss'}, embedding_cache.misses)]))
+    return families
+
+METRICS.add_collector(_collect_cache_metrics)
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus text-format metrics of this process (and its grading workers)"""
+    return Response(METRICS.render(), content_type=METRICS_CONTENT_TYPE)
+
+@app.after_request
+def _record_first_byte(response):
+    if _warm_up_state['first_byte'] is None:
+        _warm_up_state['first_byte'] = time.perf_counter() - PROCESS_STARTED
+        print(f"✓ Cold start to first byte: {_warm_up_state['first_byte']:.3f}s")
+    return response
+
+@app.route('/api/ready', methods=['GET'])
+def ready():
+    """Readiness probe: 200 once warm-up has finished, 503 with Retry-After before that"""
+    start_warm_up()
+    state = _warm_up_state['state']
+    seconds = _warm_up_state['seconds']
+    if seconds is None and _warm_up_state['started'] is not None:
+        seconds = time.perf_counter() - _warm_up_state['started']
+    first_byte = _warm_up_state['first_byte']
+    body = {
+        'ready': state == 'ready',
+        'state': state,
+        'fast_start': FAST_START,
+        'model_loaded': sentence_model is not None,
+        'warm_up_seconds': round(seconds, 3) if seconds is not None else None,
+        'cold_start_to_first_byte_seconds': round(first_byte, 3) if first_byte is not None else None,
+        'uptime_seconds': round(time.perf_counter() - PROCESS_STARTED, 3),
+        'answer_key': os.path.basename(ANSWER_KEY_PATH) if answer_key is not None else None,
+        'grading_disabled': answer_key_error,
+        'pid': os.getpid(),
+        'shared_memory_mb': round(shared_state.nbytes / 2**20, 2) if shared_state is not None else None,
+    }
+    if state == 'ready':
+        return jsonify(body)
+    if state == 'failed':
+        body['error'] = _warm_up_state['error']
+        return jsonify(body), 503
+    return jsonify(body), 503, {'Retry-After': str(WARM_UP_RETRY_AFTER)}
+
+if not FAST_START:
+    warm_up()
+
 if __name__ == '__main__':
     print("Starting Word Similarity Learning Platform...")
     print(f"Loaded {len(WORDS)} words")
     print(f"Created {len(TEST_CASES)} test cases")
+    # With the debug reloader only the child process (WERKZEUG_RUN_MAIN) serves requests
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        if FAST_START:
+            print("Fast start: serving now, loading the model in the background")
+            # Forked while this process is still single-threaded; it loads the
+            # model for the grading workers itself
+            start_fork_server(prepare=_prepare_fork_server)
+            start_warm_up(start_pool=True)
+        else:
+            start_grading_pool()
     app.run(debug=True, port=5000)